@@ -0,0 +1,18 @@
+import os
+import shutil
+
+# Переменная должна быть задана до импорта prometheus_client: от неё
+# зависит, где воркеры хранят значения метрик.
+MULTIPROC_DIR = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                                      '/tmp/prometheus')
+
+from prometheus_client import multiprocess  # noqa: E402
+
+
+def on_starting(server):
+    shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(MULTIPROC_DIR)
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
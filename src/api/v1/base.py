@@ -1,19 +1,46 @@
 from typing import Any
 
-from fastapi import APIRouter, Depends, Form, UploadFile, status
+from fastapi import (APIRouter, Depends, Form, HTTPException, Path, Query,
+                     Request, UploadFile, status)
 from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.api.v1.schemas import (COMPRESSION_TYPE, FileInfo, Ping, UserFiles,
-                                UserInDB)
-from src.db.database import get_session
+from src.api.v1.schemas import (COMPRESSION_LEVEL_DESCRIPTION,
+                                COMPRESSION_TYPE, MAX_COMPRESSION_LEVEL,
+                                ArchiveRequest, BatchUploadResult, BlobInfo,
+                                BlobLink, CurrentUser, DirectoryInfo, FileInfo,
+                                FilesQuery, Ping, UserFiles)
+from src.db.database import get_pool_stats, get_session
 from src.services.auth import get_current_user
-from src.services.files import (get_archive, get_file_path, iter_file,
-                                ping_connections, retrieve_files, upload)
+from src.services.batch import upload_batch
+from src.services.blobs import get_blob
+from src.services.directories import get_tree
+from src.services.download import prepare_download
+from src.services.files import (get_archive, get_checksums, get_file,
+                                get_selection_archive, get_storage_key,
+                                link_blob, retrieve_files_response, upload,
+                                upload_stream)
+from src.services.health import health_monitor
+from src.services.listing import (NDJSON_MEDIA_TYPE, accepts_ndjson,
+                                  stream_files)
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='token')
+SHA256_PATTERN = '^[0-9a-f]{64}$'
+COMPRESSION_DESCRIPTION = (
+    'Формат архива: tar (tar.gz), tar.zst, tar.xz или zip. В режиме auto '
+    'формат выбирается по заголовку Accept-Encoding (zstd -- tar.zst, '
+    'gzip -- tar.gz, иначе zip), а уже сжатые файлы (изображения, видео, '
+    'архивы) повторно не сжимаются.'
+)
+
+
+def make_archive_headers(
+        compression: COMPRESSION_TYPE
+) -> dict[str, str] | None:
+    if compression == 'auto':
+        return {'Vary': 'Accept-Encoding'}
 
 
 @router.get('/ping',
@@ -21,20 +48,57 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl='token')
             status_code=status.HTTP_200_OK,
             summary='Статус активности связанных сервисов.',
             description='Получить информацию о времени доступа ко всем '
-                        'связанным сервисам')
+                        'связанным сервисам. Проверки выполняются в фоне, '
+                        'метод возвращает результат последней из них: время '
+                        'ответа базы данных и хранилища, время fsync и '
+                        'свободное место на диске для локального хранилища. '
+                        'Состояние пула соединений с базой данных '
+                        'возвращается на момент запроса.')
 async def ping() -> Any:
-    ping_summary = await ping_connections()
-    return ping_summary
+    return dict(await health_monitor.get_results(),
+                db_pool=get_pool_stats())
 
 
 @router.get('/files',
             response_model=UserFiles,
             status_code=status.HTTP_200_OK,
             summary='Информация о загруженных файлах.',
-            description='Вернуть информацию о ранее загруженных файлах.')
-async def get_files(current_user: UserInDB = Depends(get_current_user),
+            description='Вернуть информацию о ранее загруженных файлах. '
+                        'Список отдаётся страницами: для получения следующей '
+                        'страницы нужно передать next_cursor из ответа в '
+                        'параметре cursor, сохранив сортировку и фильтры. '
+                        f'При заголовке Accept: {NDJSON_MEDIA_TYPE} весь '
+                        'список отдаётся потоком, по файлу в строке, без '
+                        'разбиения на страницы. Страница отдаётся с '
+                        'заголовком ETag, который меняется при любом '
+                        'изменении списка файлов: с If-None-Match метод '
+                        'вернёт 304, если список не изменился.')
+async def get_files(request: Request,
+                    query: FilesQuery = Depends(),
+                    current_user: CurrentUser = Depends(get_current_user),
                     session: AsyncSession = Depends(get_session)) -> Any:
-    return await retrieve_files(current_user.uuid, session)
+    if accepts_ndjson(request.headers.get('accept')):
+        return StreamingResponse(
+            stream_files(current_user.uuid, query, session),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+    return await retrieve_files_response(current_user.uuid, query,
+                                         request.headers, session)
+
+
+@router.get('/files/tree',
+            response_model=DirectoryInfo,
+            status_code=status.HTTP_200_OK,
+            summary='Дерево директорий.',
+            description='Вернуть директорию path и её поддиректории до '
+                        'глубины depth с количеством файлов и суммарным '
+                        'размером в каждой, включая вложенные директории. '
+                        'При depth=0 возвращается только сама директория.')
+async def get_files_tree(path: str = '/',
+                         depth: int = Query(1, ge=0),
+                         current_user: CurrentUser = Depends(get_current_user),
+                         session: AsyncSession = Depends(get_session)) -> Any:
+    return await get_tree(current_user.uuid, path, depth, session)
 
 
 @router.post('/files/upload',
@@ -50,31 +114,150 @@ async def get_files(current_user: UserInDB = Depends(get_current_user),
                          'имя создаваемого файла будет создано в соответствии '
                          'с передаваемым именем файла. Если путь заканчивается'
                          'на слэш ("/"), то он считается путём до директории, '
-                         'если не заканчивается на слэш, то путём до файла.')
+                         'если не заканчивается на слэш, то путём до файла. '
+                         'Заголовки Content-MD5 или Digest части с файлом '
+                         'сверяются с содержимым.')
 async def upload_files(file: UploadFile,
                        path: str = Form(),
-                       current_user: UserInDB = Depends(get_current_user),
+                       current_user: CurrentUser = Depends(get_current_user),
                        session: AsyncSession = Depends(get_session)) -> Any:
     file_info = await upload(file, path, current_user.uuid, session)
     return file_info
 
 
+@router.post('/files/upload/batch',
+             response_model=BatchUploadResult,
+             status_code=status.HTTP_200_OK,
+             summary='Загрузить несколько файлов в хранилище.',
+             description='Пакетная загрузка файлов в директорию path (путь '
+                         'должен заканчиваться слэшем). Имена файлов могут '
+                         'содержать относительный путь внутри директории. '
+                         'При unpack=true каждый переданный файл считается '
+                         'архивом tar или zip и распаковывается. Файлы '
+                         'сохраняются параллельно, записи о них добавляются '
+                         'в базу данных одним запросом; для каждого файла '
+                         'возвращается результат загрузки.')
+async def upload_files_batch(
+        files: list[UploadFile],
+        path: str = Form(),
+        unpack: bool = Form(False),
+        current_user: CurrentUser = Depends(get_current_user),
+        session: AsyncSession = Depends(get_session)
+) -> Any:
+    return await upload_batch(files, path, unpack, current_user.uuid, session)
+
+
+@router.get('/files/blobs/{sha256}',
+            response_model=BlobInfo,
+            status_code=status.HTTP_200_OK,
+            summary='Проверить наличие содержимого в хранилище.',
+            description='Клиент передаёт SHA-256 файла до загрузки. Если '
+                        'такое содержимое уже есть в хранилище, файл можно '
+                        'создать без передачи данных.')
+async def check_blob(sha256: str = Path(regex=SHA256_PATTERN),
+                     current_user: CurrentUser = Depends(get_current_user),
+                     session: AsyncSession = Depends(get_session)) -> Any:
+    blob = await get_blob(sha256, session)
+    if blob is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail='Содержимое с таким хешем не найдено.')
+    return BlobInfo(sha256=blob.hash, size=blob.size)
+
+
+@router.post('/files/blobs/{sha256}/link',
+             response_model=FileInfo,
+             status_code=status.HTTP_201_CREATED,
+             summary='Создать файл из уже загруженного содержимого.',
+             description='Создать файл по указанному полному пути, '
+                         'ссылающийся на содержимое с переданным SHA-256.')
+async def link_file(link: BlobLink,
+                    sha256: str = Path(regex=SHA256_PATTERN),
+                    current_user: CurrentUser = Depends(get_current_user),
+                    session: AsyncSession = Depends(get_session)) -> Any:
+    return await link_blob(sha256, link.path, current_user.uuid, session)
+
+
+@router.put('/files/{path:path}',
+            response_model=FileInfo,
+            status_code=status.HTTP_201_CREATED,
+            summary='Загрузить файл в хранилище телом запроса.',
+            description='Тело запроса целиком записывается в файл по '
+                        'указанному в URL полному пути без промежуточной '
+                        'буферизации. Если нужные директории не существуют, '
+                        'то они создаются автоматически. Если переданы '
+                        'заголовки Content-MD5 или Digest (sha-256, md5, '
+                        'crc32c, xxh3), содержимое сверяется с ними и при '
+                        'несовпадении не сохраняется. Пути, начинающиеся с '
+                        '/uploads/, заняты сессиями загрузки по частям и '
+                        'этим методом не принимаются.')
+async def put_file(path: str,
+                   request: Request,
+                   current_user: CurrentUser = Depends(get_current_user),
+                   session: AsyncSession = Depends(get_session)) -> Any:
+    return await upload_stream(request.stream(), '/' + path,
+                               current_user.uuid, session, request.headers)
+
+
 @router.get('/files/download',
             status_code=status.HTTP_200_OK,
             summary='Скачать загруженный файл.',
             description='Скачивание ранее загруженного файла. Возможность '
                         'скачивания есть как по переданному пути до файла, '
-                        'так и по идентификатору.')
+                        'так и по идентификатору. С параметром compression '
+                        'путь может указывать на директорию: она '
+                        'архивируется целиком, вместе с поддиректориями. '
+                        'Файл, сжатый при хранении, отдаётся сжатым с '
+                        'заголовком Content-Encoding, если клиент указал '
+                        'этот способ сжатия в Accept-Encoding, иначе '
+                        'распаковывается на лету. Контрольные суммы '
+                        'содержимого отдаются в заголовке Digest, ETag '
+                        'строится по SHA-256 содержимого.')
 async def download_files(
+        request: Request,
         path: str,
-        compression: COMPRESSION_TYPE = None,
-        current_user: UserInDB = Depends(get_current_user),
+        compression: COMPRESSION_TYPE | None = Query(
+            None, description=COMPRESSION_DESCRIPTION
+        ),
+        level: int | None = Query(None, ge=0, le=MAX_COMPRESSION_LEVEL,
+                                  description=COMPRESSION_LEVEL_DESCRIPTION),
+        current_user: CurrentUser = Depends(get_current_user),
         session: AsyncSession = Depends(get_session)
 ) -> Any:
     if compression is None:
-        file_path = await get_file_path(path, current_user.uuid, session)
-        return StreamingResponse(iter_file(file_path))
+        file = await get_file(path, current_user.uuid, session)
+        return await prepare_download(get_storage_key(file), file.name,
+                                      request.headers, file.content_encoding,
+                                      file.size, get_checksums(file))
     archive, media_type = await get_archive(
-        path, compression, current_user.uuid, session
+        path, compression, level, request.headers.get('accept-encoding'),
+        current_user.uuid, session
+    )
+    return StreamingResponse(archive, media_type=media_type,
+                             headers=make_archive_headers(compression))
+
+
+@router.post('/files/archive',
+             status_code=status.HTTP_200_OK,
+             summary='Скачать несколько файлов одним архивом.',
+             description='Скачивание произвольного набора ранее загруженных '
+                         'файлов одним архивом tar или zip. Файлы задаются '
+                         'идентификаторами, полными путями или шаблонами '
+                         'путей, в которых * и ? совпадают с любыми '
+                         'символами, включая слэш. Если файл, указанный '
+                         'идентификатором или путём, не найден, архив не '
+                         'формируется. Файлы в архиве лежат по своим полным '
+                         'путям.')
+async def download_archive(
+        request: Request,
+        selection: ArchiveRequest,
+        current_user: CurrentUser = Depends(get_current_user),
+        session: AsyncSession = Depends(get_session)
+) -> Any:
+    archive, media_type = await get_selection_archive(
+        selection, request.headers.get('accept-encoding'), current_user.uuid,
+        session
+    )
+    return StreamingResponse(
+        archive, media_type=media_type,
+        headers=make_archive_headers(selection.compression)
     )
-    return StreamingResponse(iter([archive.getvalue()]), media_type=media_type)
@@ -2,13 +2,32 @@ import datetime
 import typing
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 
-COMPRESSION_TYPE = typing.Literal['tar', 'zip']
+COMPRESSION_TYPE = typing.Literal['tar', 'tar.zst', 'tar.xz', 'zip', 'auto']
+FILES_SORT = typing.Literal['path', '-path', 'name', '-name', 'size', '-size',
+                            'created_at', '-created_at']
+FILES_PAGE_SIZE = 100
+FILES_MAX_PAGE_SIZE = 1000
+ARCHIVE_MAX_ITEMS = 10000
+MAX_COMPRESSION_LEVEL = 9
+COMPRESSION_LEVEL_DESCRIPTION = 'Степень сжатия: 1-9, 0 -- без сжатия (store).'
+
+
+class DBPoolStats(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
 
 
 class Ping(BaseModel):
     db: float | typing.Literal['N/A']
+    db_pool: DBPoolStats
+    storage: float | typing.Literal['N/A']
+    storage_fsync: float | typing.Literal['N/A'] | None
+    disk_free: int | typing.Literal['N/A'] | None
+    checked_at: datetime.datetime
 
 
 class User(BaseModel):
@@ -23,6 +42,12 @@ class UserInDB(UserAuth):
     uuid: str
 
 
+class CurrentUser(User):
+    """Пользователь запроса, без хэша пароля: только он попадает в кэш."""
+
+    uuid: str
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -40,6 +65,91 @@ class FileInfo(BaseModel):
     size: int
 
 
+class BatchUploadItem(BaseModel):
+    name: str
+    status: typing.Literal['created', 'error']
+    file: FileInfo | None = None
+    detail: str | None = None
+
+
+class BatchUploadResult(BaseModel):
+    created: int
+    failed: int
+    items: list[BatchUploadItem]
+
+
+class DirectoryInfo(BaseModel):
+    path: str
+    name: str
+    file_count: int
+    total_size: int
+    children: list['DirectoryInfo'] = []
+
+
+DirectoryInfo.update_forward_refs()
+
+
+class BlobInfo(BaseModel):
+    sha256: str
+    size: int
+
+
+class BlobLink(BaseModel):
+    path: str
+
+
 class UserFiles(BaseModel):
     account_id: str
     files: list[FileInfo]
+    next_cursor: str | None = None
+
+
+class FilesQuery(BaseModel):
+    limit: int = Field(FILES_PAGE_SIZE, gt=0, le=FILES_MAX_PAGE_SIZE)
+    cursor: str | None = None
+    sort: FILES_SORT = 'path'
+    path_prefix: str | None = None
+    name: str | None = Field(None, description='Шаблон имени: * и ?.')
+    size_min: int | None = Field(None, ge=0)
+    size_max: int | None = Field(None, ge=0)
+    created_after: datetime.datetime | None = None
+    created_before: datetime.datetime | None = None
+
+    @validator('created_after', 'created_before')
+    def to_naive(
+            cls, value: datetime.datetime | None
+    ) -> datetime.datetime | None:
+        """files.created_at хранится без часового пояса, в локальном времени
+        сервера: значение с поясом приводится к нему же.
+        """
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone().replace(tzinfo=None)
+
+
+class ArchiveRequest(BaseModel):
+    items: list[str] = Field(
+        ..., min_items=1, max_items=ARCHIVE_MAX_ITEMS,
+        description='Идентификаторы, полные пути или шаблоны путей с * и ?.'
+    )
+    compression: COMPRESSION_TYPE = Field(
+        'zip', description='Формат архива; auto -- по Accept-Encoding.'
+    )
+    level: int | None = Field(None, ge=0, le=MAX_COMPRESSION_LEVEL,
+                              description=COMPRESSION_LEVEL_DESCRIPTION)
+
+
+class UploadSessionCreate(BaseModel):
+    path: str
+    size: int = Field(..., ge=0)
+    chunk_size: int | None = Field(None, gt=0)
+
+
+class UploadSessionInfo(BaseModel):
+    id: UUID
+    name: str
+    path: str
+    size: int
+    chunk_size: int
+    chunks_total: int
+    chunks_received: list[int]
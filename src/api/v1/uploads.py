@@ -0,0 +1,83 @@
+from typing import Any
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.api.v1.schemas import (CurrentUser, FileInfo, UploadSessionCreate,
+                                UploadSessionInfo)
+from src.db.database import get_session
+from src.services.auth import get_current_user
+from src.services.uploads import (abort_upload_session, commit_upload_session,
+                                  create_upload_session,
+                                  retrieve_upload_session, upload_chunk)
+
+router = APIRouter()
+
+
+@router.post('/files/uploads',
+             response_model=UploadSessionInfo,
+             status_code=status.HTTP_201_CREATED,
+             summary='Создать сессию загрузки файла по частям.',
+             description='Метод принимает полный путь до файла и его размер '
+                         'и резервирует место под файл в хранилище. Части '
+                         'файла затем загружаются в любом порядке, в том '
+                         'числе параллельно.')
+async def create_session(upload: UploadSessionCreate,
+                         current_user: CurrentUser = Depends(get_current_user),
+                         session: AsyncSession = Depends(get_session)) -> Any:
+    return await create_upload_session(upload, current_user.uuid, session)
+
+
+@router.get('/files/uploads/{session_id}',
+            response_model=UploadSessionInfo,
+            status_code=status.HTTP_200_OK,
+            summary='Состояние сессии загрузки.',
+            description='Вернуть информацию о сессии загрузки и номера уже '
+                        'загруженных частей.')
+async def get_upload_session(
+        session_id: UUID,
+        current_user: CurrentUser = Depends(get_current_user),
+        session: AsyncSession = Depends(get_session)
+) -> Any:
+    return await retrieve_upload_session(session_id, current_user.uuid,
+                                         session)
+
+
+@router.put('/files/uploads/{session_id}/chunks/{number}',
+            status_code=status.HTTP_204_NO_CONTENT,
+            response_class=Response,
+            summary='Загрузить часть файла.',
+            description='Тело запроса -- содержимое части с указанным '
+                        'номером (нумерация с нуля). Повторная загрузка части '
+                        'перезаписывает её.')
+async def put_chunk(session_id: UUID,
+                    number: int,
+                    request: Request,
+                    current_user: CurrentUser = Depends(get_current_user),
+                    session: AsyncSession = Depends(get_session)) -> None:
+    await upload_chunk(session_id, number, request.stream(),
+                       current_user.uuid, session)
+
+
+@router.post('/files/uploads/{session_id}/commit',
+             response_model=FileInfo,
+             status_code=status.HTTP_201_CREATED,
+             summary='Завершить загрузку файла по частям.',
+             description='Проверить, что все части загружены, перенести файл '
+                         'на место и создать запись о нём.')
+async def commit_session(session_id: UUID,
+                         current_user: CurrentUser = Depends(get_current_user),
+                         session: AsyncSession = Depends(get_session)) -> Any:
+    return await commit_upload_session(session_id, current_user.uuid, session)
+
+
+@router.delete('/files/uploads/{session_id}',
+               status_code=status.HTTP_204_NO_CONTENT,
+               response_class=Response,
+               summary='Отменить загрузку файла по частям.',
+               description='Удалить сессию загрузки и загруженные части.')
+async def abort_session(session_id: UUID,
+                        current_user: CurrentUser = Depends(get_current_user),
+                        session: AsyncSession = Depends(get_session)) -> None:
+    await abort_upload_session(session_id, current_user.uuid, session)
@@ -1,4 +1,5 @@
 import os
+import typing
 
 from dotenv import load_dotenv
 from pydantic import BaseSettings, Field, PostgresDsn
@@ -17,6 +18,71 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = Field(30,
                                              env='ACCESS_TOKEN_EXPIRE_MINUTES')
     storage_root_dir: str
+    chunk_size: int = Field(64 * 1024, env='CHUNK_SIZE')
+    upload_chunk_size: int = Field(8 * 1024 * 1024, env='UPLOAD_CHUNK_SIZE')
+    upload_session_ttl: int = Field(24 * 60 * 60, env='UPLOAD_SESSION_TTL')
+    upload_session_cleanup_interval: float = Field(
+        60 * 60, env='UPLOAD_SESSION_CLEANUP_INTERVAL'
+    )
+    batch_upload_concurrency: int = Field(8, env='BATCH_UPLOAD_CONCURRENCY')
+    archive_read_ahead: int = Field(4, env='ARCHIVE_READ_AHEAD')
+    archive_read_ahead_buffer: int = Field(16,
+                                           env='ARCHIVE_READ_AHEAD_BUFFER')
+    archive_compression_level: int = Field(6,
+                                           env='ARCHIVE_COMPRESSION_LEVEL')
+    archive_compression_workers: int = Field(
+        os.cpu_count() or 1, env='ARCHIVE_COMPRESSION_WORKERS'
+    )
+    archive_compression_block_size: int = Field(
+        128 * 1024, env='ARCHIVE_COMPRESSION_BLOCK_SIZE'
+    )
+    storage_compression: bool = Field(False, env='STORAGE_COMPRESSION')
+    storage_compression_level: int = Field(3,
+                                           env='STORAGE_COMPRESSION_LEVEL')
+    storage_compression_min_size: int = Field(
+        4096, env='STORAGE_COMPRESSION_MIN_SIZE'
+    )
+    listing_stream_batch_size: int = Field(1000,
+                                           env='LISTING_STREAM_BATCH_SIZE')
+    db_echo: bool = Field(False, env='DB_ECHO')
+    db_pool_size: int = Field(10, env='DB_POOL_SIZE')
+    db_max_overflow: int = Field(10, env='DB_MAX_OVERFLOW')
+    db_pool_timeout: float = Field(30, env='DB_POOL_TIMEOUT')
+    db_pool_recycle: int = Field(1800, env='DB_POOL_RECYCLE')
+    db_pool_pre_ping: bool = Field(True, env='DB_POOL_PRE_PING')
+    db_statement_timeout: int = Field(30000, env='DB_STATEMENT_TIMEOUT')
+    db_statement_cache_size: int = Field(500, env='DB_STATEMENT_CACHE_SIZE')
+    health_check_interval: float = Field(5, env='HEALTH_CHECK_INTERVAL')
+    health_check_timeout: float = Field(2, env='HEALTH_CHECK_TIMEOUT')
+    password_hash_rounds: int = Field(12, env='PASSWORD_HASH_ROUNDS')
+    password_hash_workers: int = Field(4, env='PASSWORD_HASH_WORKERS')
+    password_hash_queue_size: int = Field(64,
+                                          env='PASSWORD_HASH_QUEUE_SIZE')
+    user_cache_size: int = Field(10000, env='USER_CACHE_SIZE')
+    user_cache_ttl: float = Field(60, env='USER_CACHE_TTL')
+    user_cache_redis_url: str | None = Field(None,
+                                             env='USER_CACHE_REDIS_URL')
+    listing_cache_size: int = Field(1000, env='LISTING_CACHE_SIZE')
+    hot_cache_size: int = Field(64 * 1024 * 1024, env='HOT_CACHE_SIZE')
+    hot_cache_max_object_size: int = Field(
+        256 * 1024, env='HOT_CACHE_MAX_OBJECT_SIZE'
+    )
+    path_cache_size: int = Field(10000, env='PATH_CACHE_SIZE')
+    path_cache_ttl: float = Field(60, env='PATH_CACHE_TTL')
+    storage_backend: typing.Literal['local', 's3'] = Field(
+        'local', env='STORAGE_BACKEND'
+    )
+    s3_endpoint_url: str | None = Field(None, env='S3_ENDPOINT_URL')
+    s3_bucket: str | None = Field(None, env='S3_BUCKET')
+    s3_region: str | None = Field(None, env='S3_REGION')
+    s3_access_key_id: str | None = Field(None, env='S3_ACCESS_KEY_ID')
+    s3_secret_access_key: str | None = Field(None,
+                                             env='S3_SECRET_ACCESS_KEY')
+    s3_max_pool_connections: int = Field(20, env='S3_MAX_POOL_CONNECTIONS')
+    s3_part_size: int = Field(16 * 1024 * 1024, env='S3_PART_SIZE')
+    s3_copy_part_size: int = Field(512 * 1024 * 1024,
+                                   env='S3_COPY_PART_SIZE')
+    s3_upload_concurrency: int = Field(4, env='S3_UPLOAD_CONCURRENCY')
 
     class Config:
         env_file = BASE_DIR + '.env'
@@ -0,0 +1,197 @@
+import os
+import time
+from typing import AsyncIterator, Callable
+
+import anyio
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+MULTIPROC_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+ZERO_COPY_SEND = 'http.response.zerocopysend'
+UNMATCHED_ROUTE = 'unmatched'
+DB_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE'}
+BYTES_BUCKETS = (
+    1024, 16 * 1024, 256 * 1024, 1024 ** 2, 16 * 1024 ** 2, 256 * 1024 ** 2,
+    1024 ** 3, 16 * 1024 ** 3, float('inf'),
+)
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Время обработки HTTP-запроса.',
+    ['method', 'route', 'status'],
+)
+REQUEST_BYTES = Counter(
+    'http_request_bytes', 'Байт получено в телах запросов.',
+    ['method', 'route'],
+)
+RESPONSE_BYTES = Counter(
+    'http_response_bytes', 'Байт отправлено в телах ответов.',
+    ['method', 'route'],
+)
+UPLOAD_BYTES = Counter('file_upload_bytes', 'Байт загружено в хранилище.')
+DOWNLOAD_BYTES = Counter('file_download_bytes', 'Байт файлов отдано.')
+UPLOAD_STAGE_DURATION = Histogram(
+    'file_upload_stage_duration_seconds',
+    'Время этапов загрузки файла: запись содержимого и запись в БД.',
+    ['stage'],
+)
+ARCHIVE_BUILD_DURATION = Histogram(
+    'archive_build_duration_seconds',
+    'Время сборки архива без учёта ожидания клиента.',
+    ['format'],
+)
+ARCHIVE_BYTES = Histogram(
+    'archive_size_bytes', 'Размер отданных архивов.', ['format'],
+    buckets=BYTES_BUCKETS,
+)
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds', 'Время выполнения SQL-запросов.',
+    ['operation'],
+)
+STORAGE_DURATION = Histogram(
+    'storage_operation_duration_seconds',
+    'Время операций с хранилищем без учёта ожидания потребителя.',
+    ['backend', 'operation'],
+)
+STORAGE_BYTES = Counter(
+    'storage_bytes', 'Байт записано в хранилище и прочитано из него.',
+    ['backend', 'direction'],
+)
+USER_CACHE_REQUESTS = Counter(
+    'user_cache_requests', 'Обращения к кэшу пользователей.', ['result'],
+)
+HOT_CACHE_REQUESTS = Counter(
+    'hot_cache_requests', 'Обращения к кэшу содержимого небольших файлов.',
+    ['result'],
+)
+LISTING_CACHE_REQUESTS = Counter(
+    'listing_cache_requests',
+    'Запросы страниц списка файлов: not_modified, hit или miss.', ['result'],
+)
+PATH_CACHE_REQUESTS = Counter(
+    'path_cache_requests', 'Обращения к кэшу путей файлов.', ['result'],
+)
+
+
+async def measure_stream(
+        stream: AsyncIterator[bytes], observe: Callable[[float, int], None]
+) -> AsyncIterator[bytes]:
+    """Пропускает поток через себя и передаёт в observe время, потраченное
+    на получение чанков из stream, и их суммарный размер.
+    """
+    elapsed = 0.0
+    size = 0
+    iterator = stream.__aiter__()
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - start
+            size += len(chunk)
+            yield chunk
+    finally:
+        observe(elapsed, size)
+
+
+def get_route_name(scope: Scope) -> str:
+    route = scope.get('route')
+    return getattr(route, 'path', UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: длительность запросов и объём тел по маршрутам.
+
+    Написано без BaseHTTPMiddleware, чтобы не буферизовать потоковые
+    ответы и не скрывать от сервера расширение zero-copy send.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+        received = 0
+        sent = 0
+
+        async def receive_wrapper() -> Message:
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, sent
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            elif message['type'] == 'http.response.body':
+                sent += len(message.get('body', b''))
+            elif message['type'] == ZERO_COPY_SEND:
+                sent += message.get('count') or 0
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            method = scope['method']
+            route = get_route_name(scope)
+            REQUEST_DURATION.labels(method, route, str(status_code)).observe(
+                time.perf_counter() - start
+            )
+            REQUEST_BYTES.labels(method, route).inc(received)
+            RESPONSE_BYTES.labels(method, route).inc(sent)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany) -> None:
+        conn.info.setdefault('query_start_time', []).append(
+            time.perf_counter()
+        )
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context,
+                             executemany) -> None:
+        elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        if operation not in DB_OPERATIONS:
+            operation = 'OTHER'
+        DB_QUERY_DURATION.labels(operation).observe(elapsed)
+
+    @event.listens_for(sync_engine, 'handle_error')
+    def handle_error(context) -> None:
+        connection = context.connection
+        if connection is not None and connection.info.get('query_start_time'):
+            connection.info['query_start_time'].pop()
+
+
+def get_registry() -> CollectorRegistry:
+    # В режиме нескольких процессов (gunicorn) значения собираются из
+    # файлов в PROMETHEUS_MULTIPROC_DIR, общих для всех воркеров.
+    if MULTIPROC_DIR_ENV not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    data = await anyio.to_thread.run_sync(generate_latest, get_registry())
+    return Response(data, media_type=CONTENT_TYPE_LATEST)
@@ -4,14 +4,36 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from src.core.config import settings
+from src.core.metrics import instrument_engine
 
-engine = create_async_engine(settings.dsn, echo=True)
+engine = create_async_engine(
+    settings.dsn,
+    echo=settings.db_echo,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    connect_args={
+        'prepared_statement_cache_size': settings.db_statement_cache_size,
+        'server_settings': {
+            'statement_timeout': str(settings.db_statement_timeout),
+        },
+    },
+)
 async_session = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 Base = declarative_base()
+instrument_engine(engine)
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
+
+
+def get_pool_stats() -> dict[str, int]:
+    pool = engine.pool
+    return dict(size=pool.size(), checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(), overflow=pool.overflow())
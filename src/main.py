@@ -4,9 +4,14 @@ import uvicorn
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 
-from src.api.v1 import auth, base, register
+from src.api.v1 import auth, base, register, uploads
 from src.core.config import settings
 from src.core.logger import LOGGING
+from src.core.metrics import MetricsMiddleware, metrics_endpoint
+from src.services.health import health_monitor
+from src.services.uploads import upload_session_cleaner
+from src.services.user_cache import user_cache
+from src.storage.drivers import storage
 
 PREFIX = '/api/v1'
 
@@ -19,7 +24,25 @@ app = FastAPI(
 )
 app.include_router(register.router, prefix=PREFIX)
 app.include_router(auth.router, prefix=PREFIX)
+# Маршруты сессий загрузки должны идти раньше 'PUT /files/{path:path}'.
+app.include_router(uploads.router, prefix=PREFIX)
 app.include_router(base.router, prefix=PREFIX)
+app.add_route('/metrics', metrics_endpoint, include_in_schema=False)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.on_event('startup')
+async def start_background_tasks() -> None:
+    health_monitor.start()
+    upload_session_cleaner.start()
+
+
+@app.on_event('shutdown')
+async def close_connections() -> None:
+    await health_monitor.stop()
+    await upload_session_cleaner.stop()
+    await storage.close()
+    await user_cache.close()
 
 
 if __name__ == '__main__':
@@ -1,4 +1,5 @@
-from sqlalchemy import UUID, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import (UUID, BigInteger, Column, DateTime, ForeignKey, Index,
+                        Integer, String)
 from sqlalchemy.orm import relationship
 
 from src.api.v1.schemas import FileInfo
@@ -13,19 +14,44 @@ class User(Base):
         String(length=256), nullable=False, unique=True, index=True
     )
     password = Column(String(length=256), nullable=False)
+    # Версия списка файлов пользователя, растёт при каждом его изменении.
+    files_version = Column(BigInteger, nullable=False, server_default='0')
+
+
+class Blob(Base):
+    __tablename__ = 'blobs'
+
+    hash = Column(String(length=64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False)
 
 
 class File(Base):
     __tablename__ = 'files'
+    __table_args__ = (
+        Index('ix_files_user_id_path', 'user_id', 'path', unique=True),
+        Index('ix_files_user_id_name_id', 'user_id', 'name', 'id'),
+        Index('ix_files_user_id_size_id', 'user_id', 'size', 'id'),
+        Index('ix_files_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+    )
 
     id = Column(UUID, primary_key=True, unique=True, index=True)
     name = Column(String(length=256), nullable=False)
     created_at = Column(DateTime, nullable=False)
-    path = Column(String(length=256), nullable=False, index=True)
-    size = Column(Integer, nullable=False)
+    path = Column(String(length=256), nullable=False)
+    size = Column(BigInteger, nullable=False)
     user_id = Column(UUID,
                      ForeignKey('users.id', ondelete='CASCADE'),
                      nullable=False)
+    blob_hash = Column(String(length=64),
+                       ForeignKey('blobs.hash'),
+                       nullable=True,
+                       index=True)
+    # Способ сжатия содержимого при хранении, None -- без сжатия.
+    content_encoding = Column(String(length=16), nullable=True)
+    # Контрольные суммы исходного содержимого в hex; SHA-256 -- blob_hash.
+    crc32c = Column(String(length=8), nullable=True)
+    xxh3 = Column(String(length=16), nullable=True)
     relationship(User, backref='files')
 
     def as_dict(self) -> FileInfo:
@@ -36,3 +62,44 @@ class File(Base):
             path=self.path,
             size=self.size,
         )
+
+
+# Директории, в поддереве которых есть файлы, с агрегатами по всему
+# поддереву; поддерживаются вместе с таблицей files.
+class Directory(Base):
+    __tablename__ = 'directories'
+
+    user_id = Column(UUID,
+                     ForeignKey('users.id', ondelete='CASCADE'),
+                     primary_key=True)
+    path = Column(String(length=256), primary_key=True)
+    depth = Column(Integer, nullable=False)
+    file_count = Column(BigInteger, nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+
+
+class UploadSession(Base):
+    __tablename__ = 'upload_sessions'
+
+    id = Column(UUID, primary_key=True, unique=True, index=True)
+    name = Column(String(length=256), nullable=False)
+    path = Column(String(length=256), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    storage_upload_id = Column(String(length=1024), nullable=False)
+    user_id = Column(UUID,
+                     ForeignKey('users.id', ondelete='CASCADE'),
+                     nullable=False,
+                     index=True)
+
+
+class UploadChunk(Base):
+    __tablename__ = 'upload_chunks'
+
+    session_id = Column(UUID,
+                        ForeignKey('upload_sessions.id', ondelete='CASCADE'),
+                        primary_key=True)
+    number = Column(Integer, primary_key=True)
+    size = Column(Integer, nullable=False)
+    etag = Column(String(length=256), nullable=False)
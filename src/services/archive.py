@@ -0,0 +1,320 @@
+import asyncio
+import contextlib
+import logging
+import struct
+import tarfile
+import time
+import zipfile
+from collections import deque
+from mimetypes import guess_type
+from typing import AsyncIterator, NamedTuple
+
+from src.core.config import settings
+from src.services.compression import (DeflateStream, GzipStream, StoredStream,
+                                      XzStream, ZstdStream, decode_stream,
+                                      parse_accept_encoding)
+from src.storage.base import ObjectStat
+from src.storage.drivers import storage
+
+TAR_MEDIA_TYPE = 'application/x-gtar'
+PLAIN_TAR_MEDIA_TYPE = 'application/x-tar'
+ZIP_MEDIA_TYPE = 'application/x-zip-compressed'
+ARCHIVE_MEDIA_TYPES = {
+    'tar': TAR_MEDIA_TYPE,
+    'tar.zst': 'application/zstd',
+    'tar.xz': 'application/x-xz',
+    'zip': ZIP_MEDIA_TYPE,
+}
+TAR_STREAMS = {'tar': GzipStream, 'tar.zst': ZstdStream, 'tar.xz': XzStream}
+# Форматы, которые режим auto выбирает по Accept-Encoding, в порядке
+# предпочтения; xz слишком медленный для выбора по умолчанию.
+NEGOTIATED_FORMATS = (('zstd', 'tar.zst'), ('gzip', 'tar'))
+DEFAULT_NEGOTIATED_FORMAT = 'zip'
+COMPRESSED_MEDIA_TYPES = {
+    'application/epub+zip', 'application/gzip', 'application/java-archive',
+    'application/vnd.android.package-archive', 'application/vnd.rar',
+    'application/x-7z-compressed', 'application/x-bzip2', 'application/x-xz',
+    'application/zip', 'application/zstd', 'audio/aac', 'audio/flac',
+    'audio/mp4', 'audio/mpeg', 'audio/ogg', 'image/avif', 'image/gif',
+    'image/heic', 'image/jpeg', 'image/png', 'image/webp',
+}
+COMPRESSED_MEDIA_PREFIXES = ('video/', 'application/vnd.openxmlformats-')
+TAR_END_OF_ARCHIVE = tarfile.NUL * tarfile.BLOCKSIZE * 2
+ZIP64_LIMIT = zipfile.ZIP64_LIMIT
+ZIP_MAX_ENTRIES = 0xFFFF
+ZIP_VERSION = 20
+ZIP64_VERSION = 45
+ZIP_UNIX_SYSTEM = 3
+# Размеры пишутся в data descriptor после данных, имена -- в UTF-8.
+ZIP_FLAGS = 0x08 | 0x800
+ZIP_FILE_ATTRIBUTES = 0o644 << 16
+ZIP_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+ZIP_DATA_DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+ZIP_CENTRAL_HEADER_SIGNATURE = b'PK\x01\x02'
+ZIP_END_SIGNATURE = b'PK\x05\x06'
+ZIP64_END_SIGNATURE = b'PK\x06\x06'
+ZIP64_END_LOCATOR_SIGNATURE = b'PK\x06\x07'
+ZIP64_MARKER = 0xFFFFFFFF
+ZIP_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+ZIP_DATA_DESCRIPTOR = struct.Struct('<4sL2L')
+ZIP64_DATA_DESCRIPTOR = struct.Struct('<4sL2Q')
+ZIP_CENTRAL_HEADER = struct.Struct('<4s4B4HL2L5H2L')
+ZIP_END_OF_CENTRAL_DIRECTORY = struct.Struct('<4s4H2LH')
+ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct('<4sQ2H2L4Q')
+ZIP64_END_LOCATOR = struct.Struct('<4sLQL')
+
+END_OF_OBJECT = object()
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveEntry(NamedTuple):
+    key: str
+    arcname: str
+    size: int | None = None
+    encoding: str | None = None
+
+
+def make_arcname(path: str) -> str:
+    return path.lstrip('/')
+
+
+def is_compressed(name: str) -> bool:
+    media_type, encoding = guess_type(name)
+    if encoding is not None:
+        return True
+    return media_type is not None and (
+        media_type in COMPRESSED_MEDIA_TYPES
+        or media_type.startswith(COMPRESSED_MEDIA_PREFIXES)
+    )
+
+
+def negotiate_format(accept_encoding: str | None) -> str:
+    """Формат архива для режима auto: tar со сжатием, которое клиент
+    указал в Accept-Encoding с наибольшим весом, иначе zip.
+    """
+    codings = parse_accept_encoding(accept_encoding or '')
+    default_quality = codings.get('*', 0.0)
+    best_format, best_quality = DEFAULT_NEGOTIATED_FORMAT, 0.0
+    for coding, archive_format in NEGOTIATED_FORMATS:
+        quality = codings.get(coding, default_quality)
+        if quality > best_quality:
+            best_format, best_quality = archive_format, quality
+    return best_format
+
+
+async def fetch_object(entry: ArchiveEntry, queue: asyncio.Queue) -> None:
+    try:
+        object_stat = await storage.stat(entry.key)
+        if entry.encoding is not None:
+            # Сжатый при хранении объект распаковывается, в архив попадает
+            # исходное содержимое.
+            object_stat = ObjectStat(entry.size, object_stat.mtime)
+        await queue.put(object_stat)
+        async for chunk in decode_stream(storage.get(entry.key),
+                                         entry.encoding):
+            await queue.put(chunk)
+    except Exception as exc:
+        await queue.put(exc)
+    await queue.put(END_OF_OBJECT)
+
+
+async def iter_queue(queue: asyncio.Queue) -> AsyncIterator[bytes]:
+    while (item := await queue.get()) is not END_OF_OBJECT:
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+async def read_ahead(
+        entries: list[ArchiveEntry]
+) -> AsyncIterator[tuple[str, ObjectStat, AsyncIterator[bytes]]]:
+    """Отдаёт объекты по порядку, читая из хранилища одновременно до
+    settings.archive_read_ahead объектов: пока клиент получает текущий,
+    следующие уже загружаются. Для каждого объекта в памяти держится не
+    больше settings.archive_read_ahead_buffer чанков.
+
+    Отсутствующие объекты пропускаются; поток очередного объекта нужно
+    дочитать до конца, прежде чем переходить к следующему.
+    """
+    pending = iter(entries)
+    fetching: deque[tuple[ArchiveEntry, asyncio.Queue, asyncio.Task]] = (
+        deque()
+    )
+
+    def start_next() -> None:
+        entry = next(pending, None)
+        if entry is None:
+            return
+        queue = asyncio.Queue(settings.archive_read_ahead_buffer)
+        task = asyncio.create_task(fetch_object(entry, queue))
+        fetching.append((entry, queue, task))
+
+    try:
+        for _ in range(max(settings.archive_read_ahead, 1)):
+            start_next()
+        while fetching:
+            entry, queue, task = fetching[0]
+            object_stat = await queue.get()
+            if isinstance(object_stat, FileNotFoundError):
+                logger.warning('Объект %s для архива не найден.', entry.key)
+            elif isinstance(object_stat, Exception):
+                raise object_stat
+            else:
+                yield entry.arcname, object_stat, iter_queue(queue)
+            await task
+            fetching.popleft()
+            start_next()
+    finally:
+        for *_, task in fetching:
+            task.cancel()
+        for *_, task in fetching:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+
+async def tar_files(entries: list[ArchiveEntry],
+                    archive_format: str,
+                    level: int,
+                    skip_compressed: bool = False) -> AsyncIterator[bytes]:
+    """tar, сжатый потоком из TAR_STREAMS; при level=0 -- без сжатия.
+
+    При skip_compressed уже сжатые файлы (по MIME-типу) не сжимаются
+    повторно там, где это позволяет формат.
+    """
+    compressor = (TAR_STREAMS[archive_format](level) if level
+                  else StoredStream())
+    offset = 0
+    try:
+        async for arcname, object_stat, stream in read_ahead(entries):
+            store = skip_compressed and is_compressed(arcname)
+            tarinfo = tarfile.TarInfo(make_arcname(arcname))
+            tarinfo.size = object_stat.size
+            tarinfo.mtime = int(object_stat.mtime)
+            tarinfo.mode = 0o644
+            header = tarinfo.tobuf(format=tarfile.PAX_FORMAT)
+            offset += len(header)
+            if data := await compressor.compress(header):
+                yield data
+            async for chunk in stream:
+                if data := await compressor.compress(chunk, store):
+                    yield data
+            remainder = tarinfo.size % tarfile.BLOCKSIZE
+            padding = tarfile.BLOCKSIZE - remainder if remainder else 0
+            offset += tarinfo.size + padding
+            if data := await compressor.compress(tarfile.NUL * padding):
+                yield data
+        offset += len(TAR_END_OF_ARCHIVE)
+        remainder = offset % tarfile.RECORDSIZE
+        padding = tarfile.RECORDSIZE - remainder if remainder else 0
+        yield (await compressor.compress(TAR_END_OF_ARCHIVE
+                                         + tarfile.NUL * padding)
+               + await compressor.flush())
+    finally:
+        compressor.close()
+
+
+def make_dos_datetime(mtime: float) -> tuple[int, int]:
+    year, month, day, hour, minute, second = time.localtime(mtime)[:6]
+    if year < 1980:
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    return ((hour << 11) | (minute << 5) | (second // 2),
+            ((year - 1980) << 9) | (month << 5) | day)
+
+
+def make_zip64_extra(*values: int) -> bytes:
+    return struct.pack(f'<2H{len(values)}Q', 1, 8 * len(values), *values)
+
+
+def limit_zip32(value: int) -> int:
+    return value if value <= ZIP64_LIMIT else ZIP64_MARKER
+
+
+def make_central_header(name: bytes, method: int, dos_time: int,
+                        dos_date: int, compressor: StoredStream,
+                        offset: int) -> bytes:
+    zip64_values = [value for value in (compressor.size,
+                                        compressor.compressed_size, offset)
+                    if value > ZIP64_LIMIT]
+    extra = make_zip64_extra(*zip64_values) if zip64_values else b''
+    version = ZIP64_VERSION if zip64_values else ZIP_VERSION
+    return ZIP_CENTRAL_HEADER.pack(
+        ZIP_CENTRAL_HEADER_SIGNATURE, version, ZIP_UNIX_SYSTEM, version, 0,
+        ZIP_FLAGS, method, dos_time, dos_date, compressor.crc,
+        limit_zip32(compressor.compressed_size), limit_zip32(compressor.size),
+        len(name), len(extra), 0, 0, 0, ZIP_FILE_ATTRIBUTES,
+        limit_zip32(offset)
+    ) + name + extra
+
+
+def make_end_of_central_directory(count: int, size: int,
+                                  offset: int) -> bytes:
+    data = b''
+    if count >= ZIP_MAX_ENTRIES or size > ZIP64_LIMIT or offset > ZIP64_LIMIT:
+        data = ZIP64_END_OF_CENTRAL_DIRECTORY.pack(
+            ZIP64_END_SIGNATURE,
+            ZIP64_END_OF_CENTRAL_DIRECTORY.size - 12, ZIP64_VERSION,
+            ZIP64_VERSION, 0, 0, count, count, size, offset
+        ) + ZIP64_END_LOCATOR.pack(ZIP64_END_LOCATOR_SIGNATURE, 0,
+                                   offset + size, 1)
+        count = min(count, ZIP_MAX_ENTRIES)
+        size = limit_zip32(size)
+        offset = limit_zip32(offset)
+    return data + ZIP_END_OF_CENTRAL_DIRECTORY.pack(
+        ZIP_END_SIGNATURE, 0, 0, count, count, size, offset, 0
+    )
+
+
+async def zip_files(entries: list[ArchiveEntry],
+                    level: int,
+                    skip_compressed: bool = False) -> AsyncIterator[bytes]:
+    """Потоковая запись zip: размеры и CRC каждой записи известны только
+    после её сжатия и пишутся в data descriptor. Запись сжимается
+    параллельным DeflateStream; при level=0, а при skip_compressed и для
+    уже сжатых файлов, хранится без сжатия.
+
+    Параллельно сжимаются блоки внутри записи, а не сами записи: архив
+    отдаётся потоком, и смещение следующей записи известно только после
+    сжатия предыдущей.
+    """
+    central_directory = []
+    offset = 0
+    async for arcname, object_stat, stream in read_ahead(entries):
+        store = not level or skip_compressed and is_compressed(arcname)
+        method = zipfile.ZIP_STORED if store else zipfile.ZIP_DEFLATED
+        name = make_arcname(arcname).encode()
+        dos_time, dos_date = make_dos_datetime(object_stat.mtime)
+        # Как и ZipFile, ZIP64 включается по известному заранее размеру с
+        # запасом на случай, если сжатые данные окажутся больше исходных.
+        zip64 = object_stat.size * 1.05 > ZIP64_LIMIT
+        extra = make_zip64_extra(0, 0) if zip64 else b''
+        header = ZIP_LOCAL_HEADER.pack(
+            ZIP_LOCAL_HEADER_SIGNATURE,
+            ZIP64_VERSION if zip64 else ZIP_VERSION, 0, ZIP_FLAGS, method,
+            dos_time, dos_date, 0,
+            ZIP64_MARKER if zip64 else 0, ZIP64_MARKER if zip64 else 0,
+            len(name), len(extra)
+        ) + name + extra
+        yield header
+        compressor = StoredStream() if store else DeflateStream(level)
+        try:
+            async for chunk in stream:
+                if data := await compressor.compress(chunk):
+                    yield data
+            if data := await compressor.flush():
+                yield data
+        finally:
+            compressor.close()
+        descriptor = (ZIP64_DATA_DESCRIPTOR if zip64
+                      else ZIP_DATA_DESCRIPTOR).pack(
+            ZIP_DATA_DESCRIPTOR_SIGNATURE, compressor.crc,
+            compressor.compressed_size, compressor.size
+        )
+        yield descriptor
+        central_directory.append(make_central_header(
+            name, method, dos_time, dos_date, compressor, offset
+        ))
+        offset += len(header) + compressor.compressed_size + len(descriptor)
+    data = b''.join(central_directory)
+    yield data + make_end_of_central_directory(len(central_directory),
+                                               len(data), offset)
@@ -1,27 +1,72 @@
 from datetime import datetime, timedelta
+from typing import Any, Callable
 
+import anyio
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql.expression import select
+from sqlalchemy.sql.expression import select, update
 
-from src.api.v1.schemas import TokenData, UserInDB
+from src.api.v1.schemas import CurrentUser, TokenData, UserInDB
 from src.core.config import settings
 from src.db.database import get_session
 from src.models.base import User
+from src.services.user_cache import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='token')
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto',
+                           bcrypt__rounds=settings.password_hash_rounds)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+class PasswordHashPool:
+    """Ограниченный пул потоков для bcrypt, который отпускает GIL.
 
+    Одновременно считается не больше workers хэшей, ещё queue_size
+    вызовов ждут в очереди; остальные сразу получают 429.
+    """
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self.workers = workers
+        self.max_pending = workers + queue_size
+        self.pending = 0
+        self._limiter: anyio.CapacityLimiter | None = None
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail='Слишком много одновременных запросов авторизации, '
+                       'повторите попытку позже.',
+                headers={'Retry-After': '1'},
+            )
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.workers)
+        self.pending += 1
+        try:
+            return await anyio.to_thread.run_sync(func, *args,
+                                                  limiter=self._limiter)
+        finally:
+            self.pending -= 1
+
+
+password_hash_pool = PasswordHashPool(settings.password_hash_workers,
+                                      settings.password_hash_queue_size)
+
+
+async def verify_password(
+        plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """Проверяет пароль и возвращает новый хэш, если сохранённый посчитан
+    с другой стоимостью.
+    """
+    return await password_hash_pool.run(pwd_context.verify_and_update,
+                                        plain_password, hashed_password)
+
+
+async def get_password_hash(password: str) -> str:
+    return await password_hash_pool.run(pwd_context.hash, password)
 
 
 async def get_user(session: AsyncSession, username: str) -> UserInDB | None:
@@ -36,14 +81,33 @@ async def get_user(session: AsyncSession, username: str) -> UserInDB | None:
                     password=user.password)
 
 
+async def get_current_user_info(session: AsyncSession,
+                                username: str) -> CurrentUser | None:
+    result = await session.execute(
+        select(User.id, User.username).where(User.username == username)
+    )
+    row = result.first()
+    if row is None:
+        return
+    return CurrentUser(username=row.username, uuid=str(row.id))
+
+
 async def authenticate_user(
         session: AsyncSession, username: str, password: str
 ) -> UserInDB | bool:
     user = await get_user(session, username)
     if not user:
         return False
-    if not verify_password(password, user.password):
+    is_valid, new_hash = await verify_password(password, user.password)
+    if not is_valid:
         return False
+    if new_hash is not None:
+        await session.execute(
+            update(User).where(User.username == username)
+            .values(password=new_hash)
+        )
+        await session.commit()
+        user.password = new_hash
     return user
 
 
@@ -65,7 +129,7 @@ def create_access_token(
 async def get_current_user(
         token: str = Depends(oauth2_scheme),
         session: AsyncSession = Depends(get_session)
-) -> UserInDB:
+) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail='Could not validate credentials',
@@ -81,7 +145,11 @@ async def get_current_user(
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = await get_user(session, username=token_data.username)
+    user = await user_cache.get(token_data.username)
+    if user is not None:
+        return user
+    user = await get_current_user_info(session, token_data.username)
     if user is None:
         raise credentials_exception
+    await user_cache.set(user)
     return user
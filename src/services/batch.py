@@ -0,0 +1,244 @@
+import datetime
+import logging
+import tarfile
+import zipfile
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from typing import IO, AsyncIterator, Callable
+from uuid import uuid4
+
+import anyio
+from fastapi import HTTPException, UploadFile, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import insert, select
+
+from src.api.v1.schemas import BatchUploadItem, BatchUploadResult, FileInfo
+from src.core.config import settings
+from src.core.metrics import UPLOAD_BYTES
+from src.models.base import Directory, File
+from src.services.blobs import acquire_blobs, write_blob
+from src.services.checksums import Checksums
+from src.services.directories import add_to_directories
+from src.services.files import (DIRECTORY_EXISTS_DETAIL, FILE_EXISTS_DETAIL,
+                                PARENT_IS_FILE_DETAIL, iter_upload_file)
+from src.services.listing import bump_listing_version
+from src.services.path_cache import path_cache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchItem:
+    name: str
+    path: str | None
+    open_stream: Callable[[], AsyncIterator[bytes]]
+    detail: str | None = None
+    file_info: FileInfo | None = None
+    checksums: Checksums | None = None
+    encoding: str | None = None
+
+
+@dataclass
+class BatchSource:
+    """Загружаемый файл или архив; элементы одного архива читаются из общего
+    файла и поэтому записываются последовательно.
+    """
+
+    items: list[BatchItem] = field(default_factory=list)
+    close: Callable[[], None] | None = None
+
+
+def make_item_path(folder: str, name: str) -> str | None:
+    relative = PurePosixPath(name)
+    if (not name or relative.is_absolute() or '..' in relative.parts
+            or name.endswith('/')):
+        return None
+    return str(PurePosixPath(folder).joinpath(relative))
+
+
+def make_item(folder: str, name: str,
+              open_stream: Callable[[], AsyncIterator[bytes]]) -> BatchItem:
+    path = make_item_path(folder, name)
+    return BatchItem(name=name, path=path, open_stream=open_stream,
+                     detail=None if path else 'Некорректное имя файла.')
+
+
+async def iter_member(open_member: Callable[[], IO[bytes]]
+                      ) -> AsyncIterator[bytes]:
+    member_file = await anyio.to_thread.run_sync(open_member)
+    try:
+        while chunk := await anyio.to_thread.run_sync(member_file.read,
+                                                      settings.chunk_size):
+            yield chunk
+    finally:
+        member_file.close()
+
+
+def open_archive(file_obj: IO[bytes]) -> tarfile.TarFile | zipfile.ZipFile:
+    if zipfile.is_zipfile(file_obj):
+        file_obj.seek(0)
+        return zipfile.ZipFile(file_obj)
+    file_obj.seek(0)
+    try:
+        return tarfile.open(fileobj=file_obj, mode='r:*')
+    except tarfile.TarError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='Файл не является архивом tar или zip.')
+
+
+def list_archive(archive: tarfile.TarFile | zipfile.ZipFile
+                 ) -> list[tuple[str, Callable[[], IO[bytes]]]]:
+    if isinstance(archive, zipfile.ZipFile):
+        return [(info.filename, lambda info=info: archive.open(info))
+                for info in archive.infolist() if not info.is_dir()]
+    return [(member.name, lambda member=member: archive.extractfile(member))
+            for member in archive.getmembers() if member.isfile()]
+
+
+async def make_source(file: UploadFile, folder: str,
+                      unpack: bool) -> BatchSource:
+    if not unpack:
+        return BatchSource(items=[make_item(
+            folder, file.filename, lambda: iter_upload_file(file)
+        )])
+    archive = await anyio.to_thread.run_sync(open_archive, file.file)
+    members = await anyio.to_thread.run_sync(list_archive, archive)
+    return BatchSource(
+        items=[make_item(folder, name,
+                         lambda open_member=open_member: iter_member(
+                             open_member))
+               for name, open_member in members],
+        close=archive.close,
+    )
+
+
+async def find_conflicts(items: list[BatchItem], user_uuid: str,
+                         session: AsyncSession) -> None:
+    """Проверяет пути всех элементов двумя запросами (к файлам и к
+    директориям) и отмечает конфликты как с уже загруженными файлами, так
+    и внутри самой пачки.
+    """
+    candidates = [item for item in items if item.detail is None]
+    if not candidates:
+        return
+    paths = Counter(item.path for item in candidates)
+    parents = {str(parent) for path in paths
+               for parent in PurePosixPath(path).parents}
+    statement = select(File.path).where(
+        File.user_id == user_uuid,
+        File.path.in_(paths.keys() | parents)
+    )
+    existing_files = set((await session.execute(statement)).scalars())
+    statement = select(Directory.path).where(
+        Directory.user_id == user_uuid,
+        Directory.path.in_(paths.keys())
+    )
+    existing_dirs = set((await session.execute(statement)).scalars())
+    for item in candidates:
+        item_parents = {str(parent)
+                        for parent in PurePosixPath(item.path).parents}
+        if item.path in existing_files:
+            item.detail = FILE_EXISTS_DETAIL
+        elif item.path in existing_dirs:
+            item.detail = DIRECTORY_EXISTS_DETAIL
+        elif item_parents & existing_files:
+            item.detail = PARENT_IS_FILE_DETAIL
+        elif paths[item.path] > 1 or item.path in parents:
+            item.detail = 'Путь повторяется в загружаемой пачке файлов.'
+
+
+async def write_source(source: BatchSource,
+                       limiter: anyio.CapacityLimiter) -> None:
+    for item in source.items:
+        if item.detail is not None:
+            continue
+        async with limiter:
+            try:
+                item.checksums, size, item.encoding = await write_blob(
+                    item.open_stream(), uuid4().hex
+                )
+            except Exception:
+                logger.exception('Не удалось сохранить файл %s.', item.path)
+                item.detail = 'Не удалось сохранить файл.'
+                continue
+        UPLOAD_BYTES.inc(size)
+        item.file_info = FileInfo(
+            id=uuid4(),
+            name=PurePosixPath(item.path).name,
+            created_at=datetime.datetime.now(),
+            path=item.path,
+            size=size,
+        )
+
+
+async def write_items(created: list[BatchItem], user_uuid: str,
+                      session: AsyncSession) -> None:
+    blobs: dict[str, tuple[int, int]] = {}
+    for item in created:
+        digest = item.checksums.sha256
+        _, count = blobs.get(digest, (0, 0))
+        blobs[digest] = (item.file_info.size, count + 1)
+    await acquire_blobs(blobs, session)
+    await session.execute(insert(File), [
+        dict(user_id=user_uuid, blob_hash=item.checksums.sha256,
+             crc32c=item.checksums.crc32c, xxh3=item.checksums.xxh3,
+             content_encoding=item.encoding,
+             **item.file_info.dict())
+        for item in created
+    ])
+    await add_to_directories(
+        user_uuid, [(item.path, item.file_info.size) for item in created],
+        session
+    )
+    await bump_listing_version(user_uuid, session)
+    await session.commit()
+
+
+async def upload_batch(files: list[UploadFile],
+                       user_path: str,
+                       unpack: bool,
+                       user_uuid: str,
+                       session: AsyncSession) -> BatchUploadResult:
+    if not user_path.startswith('/') or not user_path.endswith('/'):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='Для пакетной загрузки нужно указать путь '
+                                   'до директории, начинающийся и '
+                                   'заканчивающийся слэшем.')
+    sources: list[BatchSource] = []
+    try:
+        for file in files:
+            sources.append(await make_source(file, user_path, unpack))
+        items = [item for source in sources for item in source.items]
+        await find_conflicts(items, user_uuid, session)
+        limiter = anyio.CapacityLimiter(settings.batch_upload_concurrency)
+        async with anyio.create_task_group() as task_group:
+            for source in sources:
+                task_group.start_soon(write_source, source, limiter)
+    finally:
+        for source in sources:
+            if source.close is not None:
+                source.close()
+
+    created = [item for item in items if item.file_info is not None]
+    if created:
+        try:
+            await write_items(created, user_uuid, session)
+        except IntegrityError:
+            # Один из путей успели занять параллельной загрузкой после
+            # find_conflicts; откат возвращает и счётчики ссылок блобов.
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=FILE_EXISTS_DETAIL)
+        path_cache.invalidate(user_uuid, [item.path for item in created])
+    return BatchUploadResult(
+        created=len(created),
+        failed=len(items) - len(created),
+        items=[BatchUploadItem(
+            name=item.name,
+            status='created' if item.file_info else 'error',
+            file=item.file_info,
+            detail=item.detail,
+        ) for item in items],
+    )
@@ -0,0 +1,187 @@
+from typing import AsyncIterator, Mapping
+from uuid import uuid4
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import select
+
+from src.core.config import settings
+from src.models.base import Blob
+from src.services.checksums import MD5, ChecksumCalculator, Checksums
+from src.services.compression import (SAMPLE_SIZE, ZSTD_ENCODING,
+                                      encode_stream, make_storage_stream,
+                                      should_compress)
+from src.services.object_cache import hot_cache
+from src.storage.drivers import storage
+
+BLOBS_DIR = 'blobs'
+TEMP_DIR = 'tmp'
+FIRST_LEVEL_SLICE = slice(0, 2)
+SECOND_LEVEL_SLICE = slice(2, 4)
+# Сжатый при хранении блоб лежит под своим ключом, поэтому способ
+# хранения объекта однозначно определяется ключом.
+ENCODING_SUFFIXES = {None: '', ZSTD_ENCODING: '.zst'}
+
+
+def get_blob_key(digest: str, encoding: str | None = None) -> str:
+    return '/'.join((BLOBS_DIR, digest[FIRST_LEVEL_SLICE],
+                     digest[SECOND_LEVEL_SLICE],
+                     digest + ENCODING_SUFFIXES[encoding]))
+
+
+def make_temp_blob_key(token: str) -> str:
+    return '/'.join((BLOBS_DIR, TEMP_DIR, token))
+
+
+async def rechunk(stream: AsyncIterator[bytes],
+                  chunk_size: int) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    async for data in stream:
+        buffer += data
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def peek(stream: AsyncIterator[bytes],
+               size: int) -> tuple[bytes, AsyncIterator[bytes]]:
+    """Читает из потока не меньше size байт (или весь поток) и возвращает
+    их вместе с потоком, который начинается с прочитанного.
+    """
+    buffer = bytearray()
+    iterator = stream.__aiter__()
+    async for data in iterator:
+        buffer += data
+        if len(buffer) >= size:
+            break
+    head = bytes(buffer)
+
+    async def restore() -> AsyncIterator[bytes]:
+        if head:
+            yield head
+        async for data in iterator:
+            yield data
+
+    return head, restore()
+
+
+async def hash_stream(stream: AsyncIterator[bytes],
+                      calculator: ChecksumCalculator) -> AsyncIterator[bytes]:
+    async for data in stream:
+        calculator.update(data)
+        yield data
+
+
+async def hash_object(key: str) -> Checksums:
+    calculator = ChecksumCalculator()
+    async for _ in hash_stream(storage.get(key), calculator):
+        pass
+    return calculator.result()
+
+
+async def move_to_blob_store(temp_key: str, digest: str,
+                             encoding: str | None = None) -> None:
+    blob_key = get_blob_key(digest, encoding)
+    if await storage.exists(blob_key):
+        await storage.delete(temp_key)
+    else:
+        await storage.move(temp_key, blob_key)
+        hot_cache.invalidate(blob_key)
+
+
+async def write_blob(
+        stream: AsyncIterator[bytes], token: str,
+        expected: Mapping[str, bytes] | None = None
+) -> tuple[Checksums, int, str | None]:
+    """Записывает поток во временный объект, одновременно считая
+    контрольные суммы, и переносит его в хранилище блобов, если такого
+    содержимого там ещё нет. Если суммы не совпали с переданными клиентом
+    (expected), объект удаляется.
+
+    При включённом STORAGE_COMPRESSION содержимое, которое хорошо
+    сжимается, записывается сжатым zstd. Возвращает контрольные суммы и
+    размер исходного содержимого и способ сжатия (None -- без сжатия).
+    """
+    temp_key = make_temp_blob_key(token)
+    expected = expected or {}
+    calculator = ChecksumCalculator(md5=MD5 in expected)
+    stream = rechunk(stream, settings.chunk_size)
+    encoding = None
+    if settings.storage_compression:
+        sample, stream = await peek(
+            stream, max(settings.storage_compression_min_size, SAMPLE_SIZE)
+        )
+        if should_compress(sample):
+            encoding = ZSTD_ENCODING
+    compressor = make_storage_stream(encoding)
+    try:
+        await storage.put(
+            temp_key,
+            encode_stream(hash_stream(stream, calculator), compressor)
+        )
+        calculator.verify(expected)
+        checksums = calculator.result()
+        await move_to_blob_store(temp_key, checksums.sha256, encoding)
+    except BaseException:
+        await storage.delete(temp_key)
+        raise
+    return checksums, compressor.size, encoding
+
+
+async def store_temp_blob(temp_key: str) -> tuple[Checksums, str | None]:
+    """Переносит собранный из частей объект в хранилище блобов.
+
+    Части сессии загрузки приходят в любом порядке и параллельно, а SHA-256
+    и XXH3 считаются только последовательно, поэтому контрольные суммы
+    считаются здесь, повторным чтением собранного объекта. Если при этом
+    содержимое стоит сжать при хранении, оно в том же проходе
+    переписывается через write_blob. Возвращает контрольные суммы и способ
+    сжатия.
+    """
+    if settings.storage_compression:
+        sample = b''.join([chunk async for chunk in storage.get_range(
+            temp_key, 0,
+            max(settings.storage_compression_min_size, SAMPLE_SIZE)
+        )])
+        if should_compress(sample):
+            checksums, _, encoding = await write_blob(storage.get(temp_key),
+                                                      uuid4().hex)
+            await storage.delete(temp_key)
+            return checksums, encoding
+    checksums = await hash_object(temp_key)
+    await move_to_blob_store(temp_key, checksums.sha256)
+    return checksums, None
+
+
+async def acquire_blob(digest: str, size: int, session: AsyncSession) -> None:
+    await acquire_blobs({digest: (size, 1)}, session)
+
+
+async def acquire_blobs(blobs: dict[str, tuple[int, int]],
+                        session: AsyncSession) -> None:
+    """Увеличивает счётчики ссылок сразу для нескольких блобов:
+    blobs -- словарь {хеш: (размер, число новых ссылок)}.
+    """
+    statement = insert(Blob)
+    await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[Blob.hash],
+            set_={'ref_count': Blob.ref_count + statement.excluded.ref_count},
+        ),
+        [dict(hash=digest, size=size, ref_count=count)
+         for digest, (size, count) in blobs.items()]
+    )
+
+
+async def find_blob_encoding(digest: str) -> str | None:
+    for encoding in ENCODING_SUFFIXES:
+        if await storage.exists(get_blob_key(digest, encoding)):
+            return encoding
+    return None
+
+
+async def get_blob(digest: str, session: AsyncSession) -> Blob | None:
+    result = await session.execute(select(Blob).where(Blob.hash == digest))
+    return result.scalar()
@@ -0,0 +1,118 @@
+import base64
+import binascii
+import hashlib
+from typing import Mapping, NamedTuple
+
+import crc32c
+import xxhash
+from fastapi import HTTPException, status
+
+MD5 = 'md5'
+SHA256 = 'sha-256'
+CRC32C = 'crc32c'
+XXH3 = 'xxh3'
+# Алгоритм заголовка Digest: способ записи значения и длина в байтах.
+DIGEST_ALGORITHMS = {
+    MD5: ('base64', 16),
+    SHA256: ('base64', 32),
+    CRC32C: ('hex', 4),
+    XXH3: ('hex', 8),
+}
+
+checksum_mismatch_exception = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail='Контрольная сумма не совпадает с загруженным содержимым.'
+)
+invalid_checksum_exception = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail='Некорректная контрольная сумма в заголовке Content-MD5 или '
+           'Digest.'
+)
+
+
+class Checksums(NamedTuple):
+    sha256: str
+    crc32c: str | None = None
+    xxh3: str | None = None
+
+
+class ChecksumCalculator:
+    """SHA-256, CRC32C и XXH3-64 содержимого, которые считаются в том же
+    проходе, что и запись. MD5 считается, только если клиент передал его
+    для проверки.
+    """
+
+    def __init__(self, md5: bool = False) -> None:
+        self._sha256 = hashlib.sha256()
+        self._xxh3 = xxhash.xxh3_64()
+        self._crc32c = 0
+        self._md5 = hashlib.md5() if md5 else None
+
+    def update(self, data: bytes) -> None:
+        self._sha256.update(data)
+        self._xxh3.update(data)
+        self._crc32c = crc32c.crc32c(data, self._crc32c)
+        if self._md5 is not None:
+            self._md5.update(data)
+
+    def result(self) -> Checksums:
+        return Checksums(sha256=self._sha256.hexdigest(),
+                         crc32c=f'{self._crc32c:08x}',
+                         xxh3=self._xxh3.hexdigest())
+
+    def verify(self, expected: Mapping[str, bytes]) -> None:
+        actual = {
+            SHA256: self._sha256.digest(),
+            CRC32C: self._crc32c.to_bytes(4, 'big'),
+            XXH3: self._xxh3.digest(),
+        }
+        if self._md5 is not None:
+            actual[MD5] = self._md5.digest()
+        for algorithm, value in expected.items():
+            if actual[algorithm] != value:
+                raise checksum_mismatch_exception
+
+
+def decode_checksum(algorithm: str, value: str) -> bytes:
+    encoding, length = DIGEST_ALGORITHMS[algorithm]
+    try:
+        if encoding == 'hex':
+            data = bytes.fromhex(value)
+        else:
+            data = base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise invalid_checksum_exception
+    if len(data) != length:
+        raise invalid_checksum_exception
+    return data
+
+
+def parse_expected_checksums(headers: Mapping[str, str]) -> dict[str, bytes]:
+    """Контрольные суммы, переданные клиентом в заголовках Content-MD5 и
+    Digest (RFC 3230). Неизвестные алгоритмы пропускаются.
+    """
+    expected = {}
+    content_md5 = headers.get('content-md5')
+    if content_md5 is not None:
+        expected[MD5] = decode_checksum(MD5, content_md5.strip())
+    digest = headers.get('digest')
+    for item in (digest or '').split(','):
+        if not item.strip():
+            continue
+        algorithm, separator, value = item.strip().partition('=')
+        algorithm = algorithm.lower()
+        if not separator:
+            raise invalid_checksum_exception
+        if algorithm in DIGEST_ALGORITHMS:
+            expected[algorithm] = decode_checksum(algorithm, value)
+    return expected
+
+
+def make_digest_header(checksums: Checksums) -> str:
+    sha256 = base64.b64encode(bytes.fromhex(checksums.sha256)).decode()
+    values = [f'{SHA256}={sha256}']
+    if checksums.crc32c is not None:
+        values.append(f'{CRC32C}={checksums.crc32c}')
+    if checksums.xxh3 is not None:
+        values.append(f'{XXH3}={checksums.xxh3}')
+    return ','.join(values)
@@ -0,0 +1,353 @@
+import asyncio
+import lzma
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, AsyncIterator, Callable
+
+import anyio
+import zstandard
+
+from src.core.config import settings
+
+DICTIONARY_SIZE = 32 * 1024
+# Заголовок gzip без имени файла и времени изменения (RFC 1952).
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+GZIP_TRAILER = struct.Struct('<II')
+XZ_BLOCK_SIZE = 4 * 1024 * 1024
+XZ_MAGIC = b'\xfd7zXZ\x00'
+XZ_FOOTER_MAGIC = b'YZ'
+XZ_CHECK_CRC32 = b'\x00\x01'
+# Словарь LZMA2 в 1 МБ: для несжатых чанков размер не важен.
+XZ_DICTIONARY_PROPS = b'\x10'
+XZ_STORED_CHUNK_SIZE = 64 * 1024
+XZ_CRC32 = struct.Struct('<I')
+XZ_CHUNK_SIZE = struct.Struct('>H')
+ZSTD_ENCODING = 'zstd'
+# По началу содержимого, которое уже сжато и повторно не сжимается:
+# gzip, zip, zstd, xz, bzip2, 7z, rar, png, jpeg, gif, ogg, flac, mp3,
+# matroska/webm.
+COMPRESSED_SIGNATURES = (
+    b'\x1f\x8b', b'PK\x03\x04', b'\x28\xb5\x2f\xfd', b'\xfd7zXZ\x00',
+    b'BZh', b'7z\xbc\xaf\x27\x1c', b'Rar!', b'\x89PNG', b'\xff\xd8\xff',
+    b'GIF8', b'OggS', b'fLaC', b'ID3', b'\x1a\x45\xdf\xa3',
+)
+SAMPLE_SIZE = 64 * 1024
+SAMPLE_MAX_RATIO = 0.9
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    codings = {}
+    for item in header.split(','):
+        coding, *params = item.split(';')
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding := coding.strip().lower():
+            codings[coding] = quality
+    return codings
+
+
+def accepts_encoding(accept_encoding: str | None, coding: str) -> bool:
+    codings = parse_accept_encoding(accept_encoding or '')
+    return codings.get(coding, codings.get('*', 0.0)) > 0
+
+
+def looks_compressed(sample: bytes) -> bool:
+    return (sample.startswith(COMPRESSED_SIGNATURES)
+            or sample[4:8] == b'ftyp'
+            or sample[:4] == b'RIFF' and sample[8:12] == b'WEBP')
+
+
+def should_compress(sample: bytes) -> bool:
+    """Решает по началу содержимого, стоит ли сжимать его при хранении:
+    файл не меньше порога, не похож на уже сжатый формат, и пробное
+    быстрое сжатие начала действительно уменьшает размер.
+    """
+    if len(sample) < settings.storage_compression_min_size:
+        return False
+    if looks_compressed(sample):
+        return False
+    sample = sample[:SAMPLE_SIZE]
+    trial = zstandard.ZstdCompressor(level=1).compress(sample)
+    return len(trial) <= len(sample) * SAMPLE_MAX_RATIO
+
+
+class CompressionPool:
+    """Общий для всех запросов пул потоков сжатия. zlib отпускает GIL,
+    поэтому блоки сжимаются на разных ядрах.
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self._limiter: anyio.CapacityLimiter | None = None
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.workers)
+        return await anyio.to_thread.run_sync(func, *args,
+                                              limiter=self._limiter)
+
+
+compression_pool = CompressionPool(settings.archive_compression_workers)
+
+
+def deflate_block(block: bytes, dictionary: bytes, level: int,
+                  last: bool) -> bytes:
+    options = dict(zdict=dictionary) if dictionary else {}
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS,
+                                  **options)
+    data = compressor.compress(block)
+    return data + compressor.flush(zlib.Z_FINISH if last
+                                   else zlib.Z_SYNC_FLUSH)
+
+
+class StoredStream:
+    """Поток без сжатия. Общий интерфейс потоков сжатия: compress
+    возвращает готовую часть результата, flush -- остаток; store
+    означает, что данные уже сжаты и тратить на них время не нужно.
+    """
+
+    def __init__(self) -> None:
+        self.crc = 0
+        self.size = 0
+        self.compressed_size = 0
+
+    async def compress(self, data: bytes, store: bool = False) -> bytes:
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        self.compressed_size += len(data)
+        return data
+
+    async def flush(self) -> bytes:
+        return b''
+
+    def close(self) -> None:
+        pass
+
+
+class BlockStream(StoredStream, ABC):
+    """Сжатие независимыми блоками в пуле потоков, как в pigz.
+
+    Одновременно в работе не больше window блоков одного потока, готовые
+    блоки отдаются строго по порядку. Данные с флагом store не смешиваются
+    в одном блоке с остальными и сжимаются с уровнем 0.
+    """
+
+    def __init__(self, level: int, block_size: int, window: int) -> None:
+        super().__init__()
+        self.level = level
+        self.block_size = block_size
+        self.window = max(window, 1)
+        self._buffer = bytearray()
+        self._store = False
+        self._pending: deque[asyncio.Task] = deque()
+
+    @abstractmethod
+    def make_job(self, block: bytes, level: int,
+                 last: bool) -> tuple[Callable[..., bytes], ...]:
+        """Функция сжатия блока и её аргументы для пула потоков."""
+
+    def _submit(self, block: bytes, last: bool) -> None:
+        level = 0 if self._store else self.level
+        self._pending.append(asyncio.create_task(
+            compression_pool.run(*self.make_job(block, level, last))
+        ))
+
+    async def _collect(self, max_pending: int) -> bytes:
+        output = []
+        while self._pending and (len(self._pending) > max_pending
+                                 or self._pending[0].done()):
+            output.append(await self._pending.popleft())
+        data = b''.join(output)
+        self.compressed_size += len(data)
+        return data
+
+    async def compress(self, data: bytes, store: bool = False) -> bytes:
+        if store != self._store:
+            if self._buffer:
+                self._submit(bytes(self._buffer), last=False)
+                self._buffer.clear()
+            self._store = store
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[:self.block_size]), last=False)
+            del self._buffer[:self.block_size]
+        return await self._collect(self.window)
+
+    async def flush(self) -> bytes:
+        self._submit(bytes(self._buffer), last=True)
+        self._buffer.clear()
+        return await self._collect(0)
+
+    def close(self) -> None:
+        # Уже запущенные в потоках блоки досчитываются, но их результат
+        # отбрасывается.
+        for task in self._pending:
+            task.cancel()
+        self._pending.clear()
+
+
+class DeflateStream(BlockStream):
+    """raw deflate из независимых блоков. Каждый блок завершается
+    Z_SYNC_FLUSH, поэтому результаты просто склеиваются, а словарём блока
+    служат последние 32 КБ предыдущего, так что степень сжатия почти не
+    отличается от последовательной.
+    """
+
+    def __init__(self, level: int,
+                 block_size: int = settings.archive_compression_block_size,
+                 window: int = settings.archive_compression_workers) -> None:
+        super().__init__(level, block_size, window)
+        self._dictionary = b''
+
+    def make_job(self, block: bytes, level: int,
+                 last: bool) -> tuple[Callable[..., bytes], ...]:
+        dictionary = self._dictionary
+        self._dictionary = (dictionary + block)[-DICTIONARY_SIZE:]
+        return deflate_block, block, dictionary, level, last
+
+
+class GzipStream(DeflateStream):
+    """DeflateStream в обёртке gzip."""
+
+    def __init__(self, level: int) -> None:
+        super().__init__(level)
+        self._header = GZIP_HEADER
+
+    async def compress(self, data: bytes, store: bool = False) -> bytes:
+        header, self._header = self._header, b''
+        return header + await super().compress(data, store)
+
+    async def flush(self) -> bytes:
+        header, self._header = self._header, b''
+        return (header + await super().flush()
+                + GZIP_TRAILER.pack(self.crc, self.size & 0xFFFFFFFF))
+
+
+def xz_varint(value: int) -> bytes:
+    data = bytearray()
+    while value >= 0x80:
+        data.append(value & 0x7F | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def xz_pad(data: bytes) -> bytes:
+    return data + b'\0' * (-len(data) % 4)
+
+
+def xz_stored_block(block: bytes) -> bytes:
+    """Поток xz из одного блока LZMA2 с несжатыми чанками: lzma не умеет
+    записывать данные без сжатия, поэтому поток собирается вручную по
+    спецификации формата, с проверкой CRC32.
+    """
+    stream_flags = XZ_CHECK_CRC32
+    records = b''
+    blocks = b''
+    if block:
+        header = xz_pad(b'\x02\x00\x21\x01' + XZ_DICTIONARY_PROPS)
+        header += XZ_CRC32.pack(zlib.crc32(header))
+        chunks = bytearray()
+        for offset in range(0, len(block), XZ_STORED_CHUNK_SIZE):
+            chunk = block[offset:offset + XZ_STORED_CHUNK_SIZE]
+            chunks += b'\x02' if offset else b'\x01'
+            chunks += XZ_CHUNK_SIZE.pack(len(chunk) - 1) + chunk
+        chunks += b'\x00'
+        blocks = (header + xz_pad(bytes(chunks))
+                  + XZ_CRC32.pack(zlib.crc32(block)))
+        records = (xz_varint(len(header) + len(chunks) + XZ_CRC32.size)
+                   + xz_varint(len(block)))
+    index = xz_pad(b'\x00' + xz_varint(1 if block else 0) + records)
+    index += XZ_CRC32.pack(zlib.crc32(index))
+    backward_size = XZ_CRC32.pack(len(index) // 4 - 1) + stream_flags
+    return (XZ_MAGIC + stream_flags + XZ_CRC32.pack(zlib.crc32(stream_flags))
+            + blocks + index + XZ_CRC32.pack(zlib.crc32(backward_size))
+            + backward_size + XZ_FOOTER_MAGIC)
+
+
+def xz_block(block: bytes, level: int) -> bytes:
+    if not level:
+        return xz_stored_block(block)
+    return lzma.compress(block, format=lzma.FORMAT_XZ, preset=level)
+
+
+class XzStream(BlockStream):
+    """xz из независимых потоков по XZ_BLOCK_SIZE: формат допускает
+    склейку потоков, и её понимают xz и tarfile. Как и в DeflateStream,
+    при level=0 и для данных с флагом store блоки не сжимаются.
+    """
+
+    def __init__(self, level: int) -> None:
+        super().__init__(level, XZ_BLOCK_SIZE,
+                         settings.archive_compression_workers)
+
+    def make_job(self, block: bytes, level: int,
+                 last: bool) -> tuple[Callable[..., bytes], ...]:
+        return xz_block, block, level
+
+
+class ZstdStream(StoredStream):
+    """zstd с собственными потоками библиотеки. Флаг store не нужен:
+    несжимаемые блоки zstd сам сохраняет как есть.
+    """
+
+    def __init__(self, level: int) -> None:
+        super().__init__()
+        self._compressor = zstandard.ZstdCompressor(
+            level=level, threads=settings.archive_compression_workers
+        ).compressobj()
+
+    async def compress(self, data: bytes, store: bool = False) -> bytes:
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        output = await compression_pool.run(self._compressor.compress, data)
+        self.compressed_size += len(output)
+        return output
+
+    async def flush(self) -> bytes:
+        output = await compression_pool.run(
+            self._compressor.flush, zstandard.COMPRESSOBJ_FLUSH_FINISH
+        )
+        self.compressed_size += len(output)
+        return output
+
+
+def make_storage_stream(encoding: str | None) -> StoredStream:
+    if encoding == ZSTD_ENCODING:
+        return ZstdStream(settings.storage_compression_level)
+    return StoredStream()
+
+
+async def encode_stream(stream: AsyncIterator[bytes],
+                        compressor: StoredStream) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in stream:
+            if data := await compressor.compress(chunk):
+                yield data
+        if data := await compressor.flush():
+            yield data
+    finally:
+        compressor.close()
+
+
+async def decode_stream(stream: AsyncIterator[bytes],
+                        encoding: str | None) -> AsyncIterator[bytes]:
+    if encoding is None:
+        async for chunk in stream:
+            yield chunk
+        return
+    decompressor = zstandard.ZstdDecompressor().decompressobj()
+    async for chunk in stream:
+        if data := await anyio.to_thread.run_sync(decompressor.decompress,
+                                                  chunk):
+            yield data
@@ -0,0 +1,98 @@
+from collections import defaultdict
+from pathlib import PurePosixPath
+from typing import Iterable
+
+from fastapi import HTTPException, status
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import delete, select
+
+from src.api.v1.schemas import DirectoryInfo
+from src.models.base import Directory
+
+ROOT_PATH = '/'
+
+
+def get_parent_path(path: str) -> str | None:
+    if path == ROOT_PATH:
+        return None
+    return str(PurePosixPath(path).parent)
+
+
+def get_depth(path: str) -> int:
+    return len(PurePosixPath(path).parts) - 1
+
+
+async def add_to_directories(user_uuid: str,
+                             files: Iterable[tuple[str, int]],
+                             session: AsyncSession,
+                             sign: int = 1) -> None:
+    """Обновляет агрегаты всех директорий-предков файлов: files -- пары
+    (путь, размер), sign=-1 -- файлы удаляются. Коммит остаётся за
+    вызывающим, чтобы дерево менялось в одной транзакции с files.
+    """
+    aggregates: dict[str, list[int]] = defaultdict(lambda: [0, 0])
+    for path, size in files:
+        for parent in PurePosixPath(path).parents:
+            aggregate = aggregates[str(parent)]
+            aggregate[0] += sign
+            aggregate[1] += sign * size
+    if not aggregates:
+        return
+    statement = insert(Directory)
+    # Строки обновляются в порядке путей, чтобы параллельные загрузки
+    # блокировали их в одном порядке.
+    await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[Directory.user_id, Directory.path],
+            set_={
+                'file_count': (Directory.file_count
+                               + statement.excluded.file_count),
+                'total_size': (Directory.total_size
+                               + statement.excluded.total_size),
+            },
+        ),
+        [dict(user_id=user_uuid, path=path, depth=get_depth(path),
+              file_count=file_count, total_size=total_size)
+         for path, (file_count, total_size) in sorted(aggregates.items())]
+    )
+    if sign < 0:
+        await session.execute(delete(Directory).where(
+            Directory.user_id == user_uuid,
+            Directory.path.in_(aggregates),
+            Directory.file_count <= 0,
+        ))
+
+
+async def get_tree(user_uuid: str, path: str, depth: int,
+                   session: AsyncSession) -> DirectoryInfo:
+    """Поддерево директорий глубиной depth, начиная с path, одним
+    запросом по первичному ключу (user_id, path).
+    """
+    path = str(PurePosixPath(ROOT_PATH, path))
+    prefix = path.rstrip('/') + '/'
+    statement = select(Directory).where(
+        Directory.user_id == user_uuid,
+        Directory.path >= path,
+        Directory.path.startswith(path, autoescape=True),
+        Directory.depth <= get_depth(path) + depth,
+    ).order_by(Directory.path)
+    result = await session.execute(statement)
+    nodes: dict[str, DirectoryInfo] = {}
+    for directory, in result.all():
+        if directory.path != path and not directory.path.startswith(prefix):
+            continue
+        node = DirectoryInfo(
+            path=directory.path,
+            name=PurePosixPath(directory.path).name,
+            file_count=directory.file_count,
+            total_size=directory.total_size,
+        )
+        nodes[directory.path] = node
+        parent = nodes.get(get_parent_path(directory.path))
+        if parent is not None and directory.path != path:
+            parent.children.append(node)
+    if path not in nodes:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail='Директория не найдена.')
+    return nodes[path]
@@ -0,0 +1,320 @@
+import secrets
+from email.utils import formatdate
+from mimetypes import guess_type
+from pathlib import Path
+from typing import AsyncIterator, Mapping
+from urllib.parse import quote
+
+import anyio
+from fastapi import HTTPException, status
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from src.core.metrics import DOWNLOAD_BYTES, ZERO_COPY_SEND
+from src.services.checksums import Checksums, make_digest_header
+from src.services.compression import accepts_encoding, decode_stream
+from src.services.object_cache import read_object
+from src.storage.base import ObjectStat
+from src.storage.drivers import storage
+
+DEFAULT_MEDIA_TYPE = 'application/octet-stream'
+RANGE_UNIT = 'bytes'
+MAX_RANGES = 64
+
+Segment = bytes | tuple[int, int]
+
+
+async def slice_stream(stream: AsyncIterator[bytes], offset: int,
+                       count: int) -> AsyncIterator[bytes]:
+    position = 0
+    end = offset + count
+    async for chunk in stream:
+        chunk_end = position + len(chunk)
+        if chunk_end > offset:
+            yield chunk[max(offset - position, 0):end - position]
+        position = chunk_end
+        if position >= end:
+            break
+
+
+async def iter_content(content: bytes) -> AsyncIterator[bytes]:
+    yield content
+
+
+def make_etag(object_stat: ObjectStat) -> str:
+    mtime_ns = int(object_stat.mtime * 1_000_000_000)
+    return f'"{mtime_ns:x}-{object_stat.size:x}"'
+
+
+def make_validator_headers(object_stat: ObjectStat,
+                           checksums: Checksums | None,
+                           content_encoding: str | None) -> dict[str, str]:
+    """ETag и Digest ответа. Если контрольные суммы известны, ETag не
+    зависит от того, где и когда записан объект.
+    """
+    if checksums is None:
+        return {'etag': make_etag(object_stat)}
+    if content_encoding is not None:
+        # Digest описывает исходное содержимое, а не сжатое.
+        return {'etag': f'"{checksums.sha256}-{content_encoding}"'}
+    return {'etag': f'"{checksums.sha256}"',
+            'digest': make_digest_header(checksums)}
+
+
+def make_content_disposition(filename: str) -> str:
+    quoted_filename = quote(filename)
+    if quoted_filename != filename:
+        return f"attachment; filename*=utf-8''{quoted_filename}"
+    return f'attachment; filename="{filename}"'
+
+
+def is_not_modified(request_headers: Headers, etag: str) -> bool:
+    if_none_match = request_headers.get('if-none-match')
+    if if_none_match is None:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags
+
+
+def is_range_fresh(request_headers: Headers, etag: str,
+                   last_modified: str) -> bool:
+    if_range = request_headers.get('if-range')
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return if_range == last_modified
+
+
+def parse_range(range_header: str, size: int) -> list[tuple[int, int]] | None:
+    """Разбирает заголовок Range в список пар (начало, конец) включительно.
+
+    None означает, что заголовок некорректен и должен игнорироваться,
+    пустой список -- что ни один диапазон не попадает в файл.
+    """
+    unit, _, ranges_spec = range_header.partition('=')
+    if unit.strip().lower() != RANGE_UNIT:
+        return None
+    ranges = []
+    for spec in ranges_spec.split(','):
+        first, separator, last = spec.strip().partition('-')
+        if not separator or not (first or last):
+            return None
+        if (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+        if not first:
+            suffix_length = int(last)
+            if suffix_length > 0 and size > 0:
+                ranges.append((max(size - suffix_length, 0), size - 1))
+            continue
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and start > end:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+    return ranges
+
+
+class FileDownloadResponse(Response):
+    """Отдача объекта хранилища или его диапазонов фиксированными
+    асинхронными чанками.
+
+    Если объект лежит на локальном диске, а ASGI-сервер поддерживает
+    расширение zero-copy send, куски файла передаются ему напрямую и
+    отправляются через sendfile. Содержимое из кэша горячих файлов
+    (content) отдаётся из памяти.
+    """
+
+    def __init__(self,
+                 key: str,
+                 object_stat: ObjectStat,
+                 filename: str,
+                 ranges: list[tuple[int, int]] | None = None,
+                 headers: Mapping[str, str] | None = None,
+                 content: bytes | None = None) -> None:
+        self.key = key
+        self.object_stat = object_stat
+        self.content = content
+        self.background = None
+        media_type = guess_type(filename)[0] or DEFAULT_MEDIA_TYPE
+        size = object_stat.size
+        if not ranges:
+            self.status_code = status.HTTP_200_OK
+            self.media_type = media_type
+            self.segments: list[Segment] = [(0, size)]
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.status_code = status.HTTP_206_PARTIAL_CONTENT
+            self.media_type = media_type
+            self.segments = [(start, end - start + 1)]
+        else:
+            boundary = secrets.token_hex(16)
+            self.status_code = status.HTTP_206_PARTIAL_CONTENT
+            self.media_type = f'multipart/byteranges; boundary={boundary}'
+            self.segments = []
+            for start, end in ranges:
+                self.segments.append(
+                    f'--{boundary}\r\n'
+                    f'Content-Type: {media_type}\r\n'
+                    f'Content-Range: {RANGE_UNIT} {start}-{end}/{size}\r\n'
+                    f'\r\n'.encode('latin-1')
+                )
+                self.segments.append((start, end - start + 1))
+                self.segments.append(b'\r\n')
+            self.segments.append(f'--{boundary}--\r\n'.encode('latin-1'))
+        self.init_headers(headers)
+        self.content_length = sum(
+            len(segment) if isinstance(segment, bytes) else segment[1]
+            for segment in self.segments
+        )
+        self.headers.setdefault('content-length', str(self.content_length))
+        if ranges and len(ranges) == 1:
+            start, end = ranges[0]
+            self.headers.setdefault(
+                'content-range', f'{RANGE_UNIT} {start}-{end}/{size}'
+            )
+        self.headers.setdefault('accept-ranges', RANGE_UNIT)
+        self.headers.setdefault(
+            'last-modified', formatdate(object_stat.mtime, usegmt=True)
+        )
+        self.headers.setdefault('etag', make_etag(object_stat))
+        self.headers.setdefault('content-disposition',
+                                make_content_disposition(filename))
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        local_path = storage.get_local_path(self.key)
+        if (ZERO_COPY_SEND in scope.get('extensions', {})
+                and local_path is not None and self.content is None):
+            await self.send_zero_copy(local_path, send)
+        else:
+            await self.send_chunks(send)
+        DOWNLOAD_BYTES.inc(self.content_length)
+
+    def read_object(self) -> AsyncIterator[bytes]:
+        if self.content is not None:
+            return iter_content(self.content)
+        return storage.get(self.key)
+
+    def read_segment(self, offset: int, count: int) -> AsyncIterator[bytes]:
+        if self.content is not None:
+            return iter_content(self.content[offset:offset + count])
+        return storage.get_range(self.key, offset, count)
+
+    async def send_chunks(self, send: Send) -> None:
+        await send({'type': 'http.response.start',
+                    'status': self.status_code,
+                    'headers': self.raw_headers})
+        for segment in self.segments:
+            if isinstance(segment, bytes):
+                await send({'type': 'http.response.body',
+                            'body': segment,
+                            'more_body': True})
+                continue
+            async for chunk in self.read_segment(*segment):
+                await send({'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'',
+                    'more_body': False})
+
+    async def send_zero_copy(self, path: Path, send: Send) -> None:
+        try:
+            file_obj = await anyio.open_file(path, mode='rb')
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        async with file_obj:
+            await send({'type': 'http.response.start',
+                        'status': self.status_code,
+                        'headers': self.raw_headers})
+            last_index = len(self.segments) - 1
+            for index, segment in enumerate(self.segments):
+                more_body = index < last_index
+                if isinstance(segment, bytes):
+                    await send({'type': 'http.response.body',
+                                'body': segment,
+                                'more_body': more_body})
+                    continue
+                offset, count = segment
+                await send({'type': ZERO_COPY_SEND,
+                            'file': file_obj.wrapped,
+                            'offset': offset,
+                            'count': count,
+                            'more_body': more_body})
+
+
+class DecodedDownloadResponse(FileDownloadResponse):
+    """Отдача сжатого при хранении объекта с распаковкой на лету.
+
+    Диапазоны отдаются распаковкой с начала объекта и пропуском лишнего.
+    """
+
+    def __init__(self, key: str, object_stat: ObjectStat, encoding: str,
+                 *args, **kwargs) -> None:
+        self.encoding = encoding
+        super().__init__(key, object_stat, *args, **kwargs)
+
+    def read_segment(self, offset: int, count: int) -> AsyncIterator[bytes]:
+        return slice_stream(decode_stream(self.read_object(), self.encoding),
+                            offset, count)
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        await self.send_chunks(send)
+        DOWNLOAD_BYTES.inc(self.content_length)
+
+
+async def prepare_download(key: str, filename: str,
+                           request_headers: Headers,
+                           encoding: str | None = None,
+                           size: int | None = None,
+                           checksums: Checksums | None = None) -> Response:
+    """Готовит ответ со скачиванием объекта. Объект, сжатый при хранении
+    (encoding), отдаётся как есть с Content-Encoding, если клиент его
+    принимает, иначе распаковывается на лету; size -- исходный размер.
+    Известные контрольные суммы содержимого задают ETag и Digest.
+    """
+    try:
+        object_stat, content = await read_object(key)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    headers = {}
+    decode = False
+    if encoding is not None:
+        headers['vary'] = 'Accept-Encoding'
+        if accepts_encoding(request_headers.get('accept-encoding'), encoding):
+            headers['content-encoding'] = encoding
+        else:
+            decode = True
+            object_stat = ObjectStat(size, object_stat.mtime)
+    headers.update(make_validator_headers(object_stat, checksums,
+                                          headers.get('content-encoding')))
+    etag = headers['etag']
+    if is_not_modified(request_headers, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers=headers)
+    ranges = None
+    range_header = request_headers.get('range')
+    last_modified = formatdate(object_stat.mtime, usegmt=True)
+    if range_header is not None and is_range_fresh(request_headers, etag,
+                                                   last_modified):
+        ranges = parse_range(range_header, object_stat.size)
+        if ranges == []:
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail='Запрошенный диапазон недоступен.',
+                headers={'content-range':
+                         f'{RANGE_UNIT} */{object_stat.size}'}
+            )
+    if decode:
+        return DecodedDownloadResponse(key, object_stat, encoding, filename,
+                                       ranges, headers, content)
+    return FileDownloadResponse(key, object_stat, filename, ranges, headers,
+                                content)
@@ -1,84 +1,206 @@
-import contextlib
 import datetime
-import os
-import tarfile
-import time
-import zipfile
-from io import BytesIO
 from pathlib import Path
-from typing import BinaryIO, TextIO
+from typing import AsyncIterator, Mapping
 from uuid import UUID, uuid4
 
-import psycopg2
-from aioshutil import copyfileobj
 from fastapi import HTTPException, UploadFile, status
-from sqlalchemy import create_engine
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import literal, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.expression import select
+from starlette.datastructures import Headers
 
-from src.api.v1.schemas import COMPRESSION_TYPE, FileInfo
+from src.api.v1.schemas import (COMPRESSION_TYPE, ArchiveRequest, FileInfo,
+                                FilesQuery, UserFiles)
 from src.core.config import settings
-from src.models.base import File
+from src.core.metrics import (ARCHIVE_BUILD_DURATION, ARCHIVE_BYTES,
+                              UPLOAD_BYTES, UPLOAD_STAGE_DURATION,
+                              measure_stream)
+from src.models.base import Directory, File
+from src.services.archive import (ARCHIVE_MEDIA_TYPES, PLAIN_TAR_MEDIA_TYPE,
+                                  ZIP_MEDIA_TYPE, ArchiveEntry,
+                                  negotiate_format, tar_files, zip_files)
+from src.services.blobs import (acquire_blob, find_blob_encoding, get_blob,
+                                get_blob_key, write_blob)
+from src.services.checksums import Checksums, parse_expected_checksums
+from src.services.directories import add_to_directories
+from src.services.download import is_not_modified
+from src.services.listing import (LIKE_ESCAPE, bump_listing_version,
+                                  get_listing_version, glob_to_like,
+                                  listing_cache, make_listing_etag,
+                                  make_listing_statement, make_next_cursor)
+from src.services.path_cache import path_cache
 
 FIRST_LEVEL_SLICE = slice(0, 2)
 SECOND_LEVEL_SLICE = slice(2, 4)
 THIRD_LEVEL_SLICE = slice(4, None)
+FILE_EXISTS_DETAIL = 'По указанному пути файл с таким именем уже загружен.'
+DIRECTORY_EXISTS_DETAIL = ('По указанному пути имя файла совпадает с '
+                           'существующей директорией.')
+PARENT_IS_FILE_DETAIL = ('По указанному пути имя конечной папки совпадает с '
+                         'именем существующего файла.')
+FILE_NOT_FOUND_DETAIL = 'Файл не найден.'
+GLOB_CHARS = ('*', '?')
+# URL PUT /files/uploads/... заняты сессиями загрузки по частям.
+RESERVED_PUT_PREFIX = '/uploads/'
+ARCHIVE_COLUMNS = (File.user_id, File.path, File.size, File.blob_hash,
+                   File.content_encoding)
+RESOLVE_COLUMNS = (File.id, File.user_id, File.name, File.path, File.size,
+                   File.blob_hash, File.content_encoding, File.crc32c,
+                   File.xxh3)
 
 
-async def ping_connections() -> dict[str, float]:
-    db_state = ping_database()
-    return dict(db='N/A' if db_state is None else db_state)
+async def retrieve_files(
+        user_uuid: str, query: FilesQuery, session: AsyncSession
+) -> dict[str, str | list[FileInfo] | None]:
+    statement = make_listing_statement(user_uuid, query)
+    result = await session.execute(statement.limit(query.limit + 1))
+    rows = result.all()
+    files = [FileInfo(**row._mapping) for row in rows[:query.limit]]
+    return dict(account_id=user_uuid, files=files,
+                next_cursor=make_next_cursor(rows, query))
+
+
+async def retrieve_files_response(user_uuid: str, query: FilesQuery,
+                                  request_headers: Headers,
+                                  session: AsyncSession) -> Response:
+    """Страница списка файлов с ETag по версии списка пользователя.
+    Неизменившийся список стоит одного запроса версии: 304 без тела или
+    готовое тело из кэша.
+    """
+    # Версия читается до списка: закэшированная под ней страница может
+    # оказаться новее версии, но не старее.
+    version = await get_listing_version(user_uuid, session)
+    etag = make_listing_etag(version, query)
+    headers = {'etag': etag, 'cache-control': 'private, no-cache'}
+    if is_not_modified(request_headers, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers=headers)
+    body = listing_cache.get(user_uuid, etag)
+    if body is None:
+        files = await retrieve_files(user_uuid, query, session)
+        body = JSONResponse(jsonable_encoder(UserFiles(**files))).body
+        listing_cache.set(user_uuid, etag, body)
+    return Response(body, media_type='application/json', headers=headers)
 
 
-def ping_database() -> float | None:
-    sync_dsn = settings.dsn.replace('asyncpg', 'psycopg2', 1)
-    sync_engine = create_engine(sync_dsn)
-    try:
-        start = time.monotonic()
-        with contextlib.closing(sync_engine.raw_connection()) as conn:
-            if sync_engine.dialect.do_ping(conn):
-                return round(time.monotonic() - start, ndigits=6)
-    except psycopg2.OperationalError:
-        return
+async def upload(
+        file: UploadFile, user_path: str, user_uuid: str, session: AsyncSession
+) -> FileInfo:
+    path_tail = make_path_tail(file.filename, user_path)
+    # Content-MD5 и Digest берутся из заголовков части с файлом.
+    return await store_file(iter_upload_file(file), file.filename, path_tail,
+                            user_uuid, session, file.headers)
 
 
-async def retrieve_files(
-        user_uuid: str, session: AsyncSession
-) -> dict[str, str | list[FileInfo]]:
-    statement = select(File).where(File.user_id == user_uuid)
-    result = await session.execute(statement)
-    files = [file.as_dict() for file, in result.all()]
-    return dict(account_id=user_uuid, files=files)
+async def iter_upload_file(file: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await file.read(settings.chunk_size):
+        yield chunk
 
 
-async def upload(
-        file: UploadFile, user_path: str, user_uuid: str, session: AsyncSession
+async def upload_stream(
+        stream: AsyncIterator[bytes],
+        user_path: str,
+        user_uuid: str,
+        session: AsyncSession,
+        headers: Mapping[str, str] | None = None
 ) -> FileInfo:
-    full_path, path_tail = make_full_path(file.filename, user_path, user_uuid)
-    created_ts = await write_to_file_system(file, full_path)
+    if user_path.endswith('/'):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='Для загрузки нужно указать полный путь до '
+                                   'файла.')
+    path_tail = make_path_tail(Path(user_path).name, user_path)
+    if str(path_tail).startswith(RESERVED_PUT_PREFIX):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f'Путь {RESERVED_PUT_PREFIX} занят '
+                                   f'сессиями загрузки: такой файл можно '
+                                   f'загрузить через POST /files/upload.')
+    return await store_file(stream, path_tail.name, path_tail, user_uuid,
+                            session, headers)
+
+
+async def store_file(stream: AsyncIterator[bytes],
+                     name: str,
+                     path_tail: Path,
+                     user_uuid: str,
+                     session: AsyncSession,
+                     headers: Mapping[str, str] | None = None) -> FileInfo:
+    """Записывает файл, сверяя его содержимое с контрольными суммами из
+    заголовков Content-MD5 и Digest, если клиент их передал.
+    """
+    expected = parse_expected_checksums(headers or {})
+    await check_path(path_tail, user_uuid, session)
+    with UPLOAD_STAGE_DURATION.labels('storage').time():
+        checksums, size, encoding = await write_blob(stream, uuid4().hex,
+                                                     expected)
+    UPLOAD_BYTES.inc(size)
     file_info = FileInfo(
         id=uuid4(),
-        name=file.filename,
-        created_at=datetime.datetime.fromtimestamp(created_ts),
+        name=name,
+        created_at=datetime.datetime.now(),
         path=str(path_tail),
-        size=file.size
+        size=size
     )
-    await write_to_database(file_info, user_uuid, session)
+    with UPLOAD_STAGE_DURATION.labels('database').time():
+        await acquire_blob(checksums.sha256, size, session)
+        await write_to_database(file_info, user_uuid, session, checksums,
+                                content_encoding=encoding)
     return file_info
 
 
-async def write_to_file_system(file: UploadFile, full_path: Path) -> float:
-    check_path(full_path)
-    os.makedirs(full_path.parent, exist_ok=True)
-    with open(full_path, 'wb') as file_obj:
-        await copyfileobj(file.file, file_obj)
-    created_ts: float = os.path.getctime(full_path)
-    return created_ts
+async def link_blob(digest: str,
+                    user_path: str,
+                    user_uuid: str,
+                    session: AsyncSession) -> FileInfo:
+    blob = await get_blob(digest, session)
+    if blob is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail='Содержимое с таким хешем не найдено.')
+    if user_path.endswith('/'):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='Для загрузки нужно указать полный путь до '
+                                   'файла.')
+    path_tail = make_path_tail(Path(user_path).name, user_path)
+    await check_path(path_tail, user_uuid, session)
+    file_info = FileInfo(
+        id=uuid4(),
+        name=path_tail.name,
+        created_at=datetime.datetime.now(),
+        path=str(path_tail),
+        size=blob.size
+    )
+    await acquire_blob(blob.hash, blob.size, session)
+    await write_to_database(file_info, user_uuid, session,
+                            await find_blob_checksums(blob.hash, session),
+                            content_encoding=await find_blob_encoding(
+                                blob.hash
+                            ))
+    return file_info
+
+
+async def find_blob_checksums(digest: str,
+                              session: AsyncSession) -> Checksums:
+    """Контрольные суммы содержимого из любого файла с тем же блобом;
+    для блобов, записанных до их появления, известен только SHA-256.
+    """
+    statement = select(File.crc32c, File.xxh3).where(
+        File.blob_hash == digest, File.crc32c.is_not(None)
+    ).limit(1)
+    row = (await session.execute(statement)).first()
+    if row is None:
+        return Checksums(digest)
+    return Checksums(digest, row.crc32c, row.xxh3)
+
 
+def get_checksums(file: File) -> Checksums | None:
+    if file.blob_hash is None:
+        return None
+    return Checksums(file.blob_hash, file.crc32c, file.xxh3)
 
-def make_full_path(
-        file_name: str, user_path: str, user_uuid: str
-) -> tuple[Path, Path]:
+
+def make_path_tail(file_name: str, user_path: str) -> Path:
     if not user_path.startswith('/'):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail='Путь до файла должен начинаться со слэша.')
@@ -88,61 +210,116 @@ def make_full_path(
         path_obj = Path(user_path)
         folder = path_obj.parent
         file_name = path_obj.name
-    path_tail = Path(folder).joinpath(file_name)
-    user_dir = get_user_dir(user_uuid)
-    full_path = Path(user_dir + str(path_tail))
-    return full_path, path_tail
+    return Path(folder).joinpath(file_name)
 
 
-def get_user_dir(user_uuid: str) -> str:
-    user_base_dir = '/'.join(
+def get_user_key(user_uuid: str) -> str:
+    return '/'.join(
         (user_uuid[FIRST_LEVEL_SLICE],
          user_uuid[SECOND_LEVEL_SLICE],
          user_uuid[THIRD_LEVEL_SLICE])
     )
-    return settings.storage_root_dir + user_base_dir
 
 
-def check_path(path: Path) -> None:
-    if path.is_file():
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail='По указанному пути файл с таким именем '
-                                   'уже загружен.')
-    if path.is_dir():
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail='По указанному пути имя файла совпадает с '
-                                   'существующей директорией.')
-    if Path(path.parent).is_file():
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail='По указанному пути имя конечной папки '
-                                   'совпадает с именем существующего файла.')
+def get_user_dir(user_uuid: str) -> str:
+    return settings.storage_root_dir + get_user_key(user_uuid)
 
 
-async def write_to_database(
-        file_info: FileInfo, user_uuid: str, session: AsyncSession
+def make_archive_entry(file: File) -> ArchiveEntry:
+    return ArchiveEntry(get_storage_key(file), file.path, file.size,
+                        file.content_encoding)
+
+
+def get_storage_key(file: File) -> str:
+    if file.blob_hash is None:
+        return get_user_key(str(file.user_id)) + file.path
+    return get_blob_key(file.blob_hash, file.content_encoding)
+
+
+async def check_path(
+        path_tail: Path, user_uuid: str, session: AsyncSession
 ) -> None:
-    record = File(user_id=user_uuid, **file_info.dict())
-    session.add(record)
-    await session.commit()
+    path = str(path_tail)
+    parents = [str(parent) for parent in path_tail.parents]
+    statement = select(File.path, literal(False).label('is_directory')).where(
+        File.user_id == user_uuid,
+        or_(File.path == path, File.path.in_(parents))
+    ).union_all(
+        select(Directory.path, literal(True)).where(
+            Directory.user_id == user_uuid, Directory.path == path
+        )
+    ).limit(1)
+    result = await session.execute(statement)
+    existing = result.first()
+    if existing is None:
+        return
+    if existing.path != path:
+        detail = PARENT_IS_FILE_DETAIL
+    elif existing.is_directory:
+        detail = DIRECTORY_EXISTS_DETAIL
+    else:
+        detail = FILE_EXISTS_DETAIL
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=detail)
+
+
+async def write_to_database(file_info: FileInfo,
+                            user_uuid: str,
+                            session: AsyncSession,
+                            checksums: Checksums,
+                            content_encoding: str | None = None) -> None:
+    record = File(user_id=user_uuid, blob_hash=checksums.sha256,
+                  crc32c=checksums.crc32c, xxh3=checksums.xxh3,
+                  content_encoding=content_encoding, **file_info.dict())
+    try:
+        session.add(record)
+        await add_to_directories(user_uuid,
+                                 [(file_info.path, file_info.size)], session)
+        await bump_listing_version(user_uuid, session)
+        await session.commit()
+    except IntegrityError:
+        # Тот же путь успели записать параллельным запросом после
+        # check_path; файл вставляется уже при flush, а не при коммите.
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=FILE_EXISTS_DETAIL)
+    path_cache.invalidate(user_uuid, [file_info.path])
 
 
-async def get_file_path(
+async def get_file(
         file_path_or_id: str, user_uuid: str, session: AsyncSession
-) -> Path:
+) -> File:
     uuid_string = get_valid_uuid(file_path_or_id)
     if uuid_string is None:
-        file_path = file_path_or_id
-        statement = select(File).where(File.path == file_path)
-    else:
-        statement = select(File).where(File.id == uuid_string)
+        return await get_file_by_path(file_path_or_id, user_uuid, session)
+    statement = select(File).where(File.id == uuid_string,
+                                   File.user_id == user_uuid)
     result = await session.execute(statement)
     file = result.scalar()
     if file is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail='Файл не найден.')
-    user_dir = get_user_dir(user_uuid)
-    full_path = Path(user_dir + file.path)
-    return full_path
+                            detail=FILE_NOT_FOUND_DETAIL)
+    return file
+
+
+async def get_file_by_path(path: str, user_uuid: str,
+                           session: AsyncSession) -> File:
+    """Файл по пути: сначала кэш путей, затем одна проба уникального
+    индекса (user_id, path). Возвращённый из кэша объект не привязан к
+    сессии и годится только для чтения.
+    """
+    values = path_cache.get(user_uuid, path)
+    if values is None:
+        statement = select(*RESOLVE_COLUMNS).where(
+            File.user_id == user_uuid, File.path == path
+        ).limit(1)
+        row = (await session.execute(statement)).first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=FILE_NOT_FOUND_DETAIL)
+        values = row._asdict()
+        path_cache.set(user_uuid, path, values)
+    return File(**values)
 
 
 def get_valid_uuid(string):
@@ -152,63 +329,113 @@ def get_valid_uuid(string):
         return
 
 
-def iter_file(file_path: Path) -> BinaryIO | TextIO:
-    try:
-        with open(file_path, mode='rb') as file_like:
-            yield from file_like
-    except FileNotFoundError:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+def measure_archive(archive: AsyncIterator[bytes],
+                    archive_format: str) -> AsyncIterator[bytes]:
+    def observe(elapsed: float, size: int) -> None:
+        ARCHIVE_BUILD_DURATION.labels(archive_format).observe(elapsed)
+        ARCHIVE_BYTES.labels(archive_format).observe(size)
+
+    return measure_stream(archive, observe)
 
 
-async def get_archive(path_or_id: str,
-                      compression_type: COMPRESSION_TYPE,
-                      user_uuid: str,
-                      session: AsyncSession) -> tuple[BytesIO, str]:
+async def get_archive(
+        path_or_id: str,
+        compression_type: COMPRESSION_TYPE,
+        level: int | None,
+        accept_encoding: str | None,
+        user_uuid: str,
+        session: AsyncSession
+) -> tuple[AsyncIterator[bytes], str]:
     not_found_exception = HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                                         detail='Путь не найден.')
     uuid_string = get_valid_uuid(path_or_id)
     if uuid_string is None:
         path = path_or_id
     else:
-        statement = select(File.path).where(File.id == uuid_string)
+        statement = select(File.path).where(File.id == uuid_string,
+                                            File.user_id == user_uuid)
         result = await session.execute(statement)
         path = result.scalar()
         if path is None:
             raise not_found_exception
-    user_dir = get_user_dir(user_uuid)
-    full_path = Path(user_dir + path)
-    if not full_path.exists():
+    # Директория архивируется рекурсивно: все файлы поддерева берутся из
+    # таблицы files одним запросом в порядке путей.
+    folder = path.rstrip('/') + '/'
+    statement = select(*ARCHIVE_COLUMNS).where(
+        File.user_id == user_uuid,
+        or_(File.path == path,
+            File.path.startswith(folder, autoescape=True))
+    ).order_by(File.path)
+    result = await session.execute(statement)
+    entries = [make_archive_entry(file) for file in result.all()]
+    if not entries:
         raise not_found_exception
-    if full_path.is_file():
-        paths = [full_path]
+    return make_archive(entries, compression_type, level, accept_encoding)
+
+
+async def get_selection_archive(
+        selection: ArchiveRequest,
+        accept_encoding: str | None,
+        user_uuid: str,
+        session: AsyncSession
+) -> tuple[AsyncIterator[bytes], str]:
+    """Архив из произвольного набора файлов: все идентификаторы, пути и
+    шаблоны разрешаются одним запросом к базе данных.
+    """
+    ids, paths, patterns = set(), set(), set()
+    for item in selection.items:
+        uuid_string = get_valid_uuid(item)
+        if uuid_string is not None:
+            ids.add(uuid_string)
+        elif any(char in item for char in GLOB_CHARS):
+            patterns.add(glob_to_like(item))
+        else:
+            paths.add(item)
+    conditions = []
+    if ids:
+        conditions.append(File.id.in_(ids))
+    if paths:
+        conditions.append(File.path.in_(paths))
+    if patterns:
+        # LIKE ANY (...) не допускает ESCAPE, поэтому каждый шаблон
+        # сравнивается отдельно с явным экранированием, как в glob_to_like.
+        conditions.extend(File.path.like(pattern, escape=LIKE_ESCAPE)
+                          for pattern in sorted(patterns))
+    statement = select(File.id, *ARCHIVE_COLUMNS).where(
+        File.user_id == user_uuid, or_(*conditions)
+    ).order_by(File.path)
+    files = (await session.execute(statement)).all()
+    missing = ((ids - {str(file.id) for file in files})
+               | (paths - {file.path for file in files}))
+    if missing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail='Файлы не найдены: '
+                                   f'{", ".join(sorted(missing))}.')
+    if not files:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail='Файлы не найдены.')
+    return make_archive([make_archive_entry(file) for file in files],
+                        selection.compression, selection.level,
+                        accept_encoding)
+
+
+def make_archive(
+        entries: list[ArchiveEntry],
+        compression_type: COMPRESSION_TYPE,
+        level: int | None,
+        accept_encoding: str | None = None
+) -> tuple[AsyncIterator[bytes], str]:
+    if level is None:
+        level = settings.archive_compression_level
+    skip_compressed = compression_type == 'auto'
+    if skip_compressed:
+        compression_type = negotiate_format(accept_encoding)
+    if compression_type == 'zip':
+        archive = zip_files(entries, level, skip_compressed)
+        media_type = ZIP_MEDIA_TYPE
     else:
-        paths = [path for path in full_path.iterdir() if path.is_file()]
-
-    if compression_type == 'tar':
-        return tar_files(paths, user_dir)
-    elif compression_type == 'zip':
-        return zip_files(paths, user_dir)
-
-
-def tar_files(paths: list[Path], user_dir: str) -> tuple[BytesIO, str]:
-    buffer = BytesIO()
-    with tarfile.open(fileobj=buffer, mode='w:gz') as file_obj:
-        for path in paths:
-            file_obj.add(
-                path,
-                arcname=str(path).replace(user_dir, '')
-            )
-    return buffer, 'application/x-gtar'
-
-
-def zip_files(paths: list[Path], user_dir: str) -> tuple[BytesIO, str]:
-    buffer = BytesIO()
-    with zipfile.ZipFile(
-            buffer, mode='w', compression=zipfile.ZIP_DEFLATED
-    ) as file_obj:
-        for path in paths:
-            file_obj.write(
-                path,
-                arcname=str(path).replace(user_dir, '')
-            )
-    return buffer, 'application/x-zip-compressed'
+        archive = tar_files(entries, compression_type, level,
+                            skip_compressed)
+        media_type = (ARCHIVE_MEDIA_TYPES[compression_type] if level
+                      else PLAIN_TAR_MEDIA_TYPE)
+    return measure_archive(archive, compression_type), media_type
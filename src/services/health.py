@@ -0,0 +1,164 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+import os
+import shutil
+import socket
+import time
+from typing import Any, AsyncIterator
+
+import anyio
+from sqlalchemy import text
+
+from src.core.config import settings
+from src.db.database import engine
+from src.storage.drivers import storage
+
+HEALTH_PREFIX = 'health/'
+PROBE_PAYLOAD = b'health probe'
+NOT_AVAILABLE = 'N/A'
+
+logger = logging.getLogger(__name__)
+
+
+def make_probe_key() -> str:
+    return f'{HEALTH_PREFIX}{socket.gethostname()}-{os.getpid()}'
+
+
+def measure_fsync(path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+    try:
+        os.write(fd, PROBE_PAYLOAD)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.remove(path)
+
+
+async def iter_payload() -> AsyncIterator[bytes]:
+    yield PROBE_PAYLOAD
+
+
+async def probe_database() -> float:
+    start = time.monotonic()
+    async with engine.connect() as connection:
+        await connection.execute(text('SELECT 1'))
+    return time.monotonic() - start
+
+
+async def probe_storage() -> float:
+    key = make_probe_key()
+    start = time.monotonic()
+    try:
+        await storage.put(key, iter_payload())
+        async for _ in storage.get(key):
+            pass
+    finally:
+        await storage.delete(key)
+    return time.monotonic() - start
+
+
+async def probe_storage_fsync() -> float | None:
+    path = storage.get_local_path(make_probe_key() + '.fsync')
+    if path is None:
+        return None
+    start = time.monotonic()
+    await anyio.to_thread.run_sync(measure_fsync, str(path))
+    return time.monotonic() - start
+
+
+async def probe_disk_free() -> int | None:
+    path = storage.get_local_path('')
+    if path is None:
+        return None
+    usage = await anyio.to_thread.run_sync(shutil.disk_usage, path)
+    return usage.free
+
+
+class HealthMonitor:
+    """Периодически проверяет связанные сервисы и хранит последний результат.
+
+    /ping отдаёт сохранённый результат; если фоновая проверка не запущена
+    или результат устарел, проверка выполняется прямо в запросе.
+    """
+
+    probes = {
+        'db': probe_database,
+        'storage': probe_storage,
+        'storage_fsync': probe_storage_fsync,
+        'disk_free': probe_disk_free,
+    }
+
+    def __init__(self, interval: float, timeout: float) -> None:
+        self.interval = interval
+        self.timeout = timeout
+        self.results: dict[str, Any] | None = None
+        self.checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def run_probe(self, name: str) -> Any:
+        try:
+            with anyio.fail_after(self.timeout):
+                result = await self.probes[name]()
+        except Exception:
+            logger.warning('Проверка %s завершилась ошибкой.', name,
+                           exc_info=True)
+            return NOT_AVAILABLE
+        if isinstance(result, float):
+            return round(result, ndigits=6)
+        return result
+
+    def is_fresh(self) -> bool:
+        return (self.results is not None
+                and time.monotonic() - self.checked_at <= 2 * self.interval)
+
+    async def _probe(self) -> dict[str, Any]:
+        results: dict[str, Any] = {}
+
+        async def run(name: str) -> None:
+            results[name] = await self.run_probe(name)
+
+        async with anyio.create_task_group() as task_group:
+            for name in self.probes:
+                task_group.start_soon(run, name)
+        results['checked_at'] = datetime.datetime.now(datetime.timezone.utc)
+        self.results = results
+        self.checked_at = time.monotonic()
+        return results
+
+    async def check(self) -> dict[str, Any]:
+        async with self._lock:
+            return await self._probe()
+
+    async def get_results(self) -> dict[str, Any]:
+        if self.is_fresh():
+            return self.results
+        async with self._lock:
+            # Пока ждали блокировку, результат мог обновить другой запрос.
+            if self.is_fresh():
+                return self.results
+            return await self._probe()
+
+    async def _run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+
+health_monitor = HealthMonitor(settings.health_check_interval,
+                               settings.health_check_timeout)
@@ -0,0 +1,221 @@
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, AsyncIterator
+from uuid import UUID
+
+import orjson
+from fastapi import HTTPException, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import select, update
+
+from src.api.v1.schemas import FilesQuery
+from src.core.config import settings
+from src.core.metrics import LISTING_CACHE_REQUESTS
+from src.models.base import File, User
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+LIKE_ESCAPE = '\\'
+SORT_COLUMNS = {
+    'path': File.path,
+    'name': File.name,
+    'size': File.size,
+    'created_at': File.created_at,
+}
+LISTING_COLUMNS = (File.id, File.name, File.created_at, File.path, File.size)
+
+invalid_cursor_exception = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail='Некорректный курсор.'
+)
+
+
+def glob_to_like(pattern: str) -> str:
+    like = []
+    for char in pattern:
+        if char in ('%', '_', LIKE_ESCAPE):
+            like.append(LIKE_ESCAPE + char)
+        elif char == '*':
+            like.append('%')
+        elif char == '?':
+            like.append('_')
+        else:
+            like.append(char)
+    return ''.join(like)
+
+
+def encode_value(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def decode_value(sort_field: str, value: Any) -> Any:
+    if sort_field == 'created_at':
+        return datetime.datetime.fromisoformat(value)
+    if sort_field == 'size' and not isinstance(value, int):
+        raise ValueError(value)
+    if sort_field in ('path', 'name') and not isinstance(value, str):
+        raise ValueError(value)
+    return value
+
+
+def encode_cursor(sort: str, value: Any, file_id: UUID) -> str:
+    data = json.dumps([sort, encode_value(value), str(file_id)],
+                      separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple[Any, UUID]:
+    """Курсор -- позиция последнего выданного файла в порядке сортировки;
+    курсор, выданный для другой сортировки, не принимается.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, file_id = json.loads(data)
+        if cursor_sort != sort:
+            raise ValueError(cursor_sort)
+        return decode_value(sort.lstrip('-'), value), UUID(file_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise invalid_cursor_exception
+
+
+def apply_filters(statement: Select, query: FilesQuery) -> Select:
+    if query.path_prefix:
+        # Нижняя граница позволяет начать обход индекса (user_id, path)
+        # сразу с нужного места.
+        statement = statement.where(
+            File.path >= query.path_prefix,
+            File.path.startswith(query.path_prefix, autoescape=True)
+        )
+    if query.name:
+        statement = statement.where(
+            File.name.like(glob_to_like(query.name), escape=LIKE_ESCAPE)
+        )
+    if query.size_min is not None:
+        statement = statement.where(File.size >= query.size_min)
+    if query.size_max is not None:
+        statement = statement.where(File.size <= query.size_max)
+    if query.created_after is not None:
+        statement = statement.where(File.created_at >= query.created_after)
+    if query.created_before is not None:
+        statement = statement.where(File.created_at < query.created_before)
+    return statement
+
+
+def make_listing_statement(user_uuid: str, query: FilesQuery) -> Select:
+    """Запрос страницы списка файлов с keyset-пагинацией: порядок задаётся
+    парой (поле сортировки, id), по которой построены составные индексы
+    files(user_id, <поле>, id).
+    """
+    descending = query.sort.startswith('-')
+    column = SORT_COLUMNS[query.sort.lstrip('-')]
+    statement = apply_filters(
+        select(*LISTING_COLUMNS).where(File.user_id == user_uuid), query
+    )
+    if query.cursor is not None:
+        value, file_id = decode_cursor(query.cursor, query.sort)
+        key = tuple_(column, File.id)
+        statement = statement.where(
+            key < (value, file_id) if descending else key > (value, file_id)
+        )
+    if descending:
+        return statement.order_by(column.desc(), File.id.desc())
+    return statement.order_by(column, File.id)
+
+
+def make_next_cursor(rows: list[Any], query: FilesQuery) -> str | None:
+    if len(rows) <= query.limit:
+        return None
+    last_row = rows[query.limit - 1]
+    sort_field = query.sort.lstrip('-')
+    return encode_cursor(query.sort, getattr(last_row, sort_field),
+                         last_row.id)
+
+
+class ListingCache:
+    """LRU-кэш сериализованных страниц списка файлов по (пользователь,
+    ETag). ETag включает версию списка пользователя, поэтому записи не
+    инвалидируются: после изменения списка старые просто вытесняются.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+
+    def get(self, user_uuid: str, etag: str) -> bytes | None:
+        key = (str(user_uuid), etag)
+        body = self._entries.get(key)
+        if body is None:
+            LISTING_CACHE_REQUESTS.labels('miss').inc()
+            return None
+        self._entries.move_to_end(key)
+        LISTING_CACHE_REQUESTS.labels('hit').inc()
+        return body
+
+    def set(self, user_uuid: str, etag: str, body: bytes) -> None:
+        if self.max_size <= 0:
+            return
+        key = (str(user_uuid), etag)
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+listing_cache = ListingCache(settings.listing_cache_size)
+
+
+async def bump_listing_version(user_uuid: str, session: AsyncSession) -> None:
+    """Увеличивает версию списка файлов пользователя. Коммит остаётся за
+    вызывающим, вместе с изменением самого списка.
+    """
+    await session.execute(
+        update(User).where(User.id == user_uuid)
+        .values(files_version=User.files_version + 1)
+    )
+
+
+async def get_listing_version(user_uuid: str, session: AsyncSession) -> int:
+    statement = select(User.files_version).where(User.id == user_uuid)
+    return (await session.execute(statement)).scalar_one()
+
+
+def make_listing_etag(version: int, query: FilesQuery) -> str:
+    digest = hashlib.sha256(query.json().encode()).hexdigest()[:16]
+    return f'"{version:x}-{digest}"'
+
+
+def accepts_ndjson(accept_header: str | None) -> bool:
+    if accept_header is None:
+        return False
+    return any(media_range.split(';')[0].strip() == NDJSON_MEDIA_TYPE
+               for media_range in accept_header.split(','))
+
+
+async def stream_files(user_uuid: str, query: FilesQuery,
+                       session: AsyncSession) -> AsyncIterator[bytes]:
+    """Полный список файлов в формате NDJSON без ограничения limit.
+
+    Строки читаются через серверный курсор пачками по
+    settings.listing_stream_batch_size и сразу отдаются клиенту.
+    """
+    statement = make_listing_statement(user_uuid, query).execution_options(
+        yield_per=settings.listing_stream_batch_size
+    )
+    result = await session.stream(statement)
+    async for rows in result.partitions():
+        # asyncpg возвращает собственный подкласс UUID, который orjson
+        # сериализует только через default.
+        yield b''.join(
+            orjson.dumps(row._asdict(), default=str,
+                         option=orjson.OPT_APPEND_NEWLINE)
+            for row in rows
+        )
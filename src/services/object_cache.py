@@ -0,0 +1,158 @@
+import hashlib
+from collections import OrderedDict
+
+from src.core.config import settings
+from src.core.metrics import HOT_CACHE_REQUESTS
+from src.storage.base import ObjectStat
+from src.storage.drivers import storage
+
+SKETCH_DEPTH = 4
+SKETCH_MIN_WIDTH = 1024
+SKETCH_MAX_WIDTH = 1 << 20
+MAX_FREQUENCY = 15
+# Ожидаемый средний размер объекта в кэше: по нему оценивается число
+# записей и ширина счётчика частот.
+AVERAGE_OBJECT_SIZE = 4096
+
+
+class FrequencySketch:
+    """Count-min sketch частот обращений для допуска в кэш (TinyLFU).
+
+    Счётчики ограничены MAX_FREQUENCY и делятся пополам каждые
+    sample_size обращений, чтобы давние обращения постепенно забывались.
+    """
+
+    def __init__(self, width: int) -> None:
+        self.width = width
+        self.sample_size = width * 10
+        self._rows = [[0] * width for _ in range(SKETCH_DEPTH)]
+        self._additions = 0
+
+    def _indexes(self, key: str) -> list[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=4 * SKETCH_DEPTH)
+        data = digest.digest()
+        return [int.from_bytes(data[i * 4:i * 4 + 4], 'little') % self.width
+                for i in range(SKETCH_DEPTH)]
+
+    def increment(self, key: str) -> None:
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < MAX_FREQUENCY:
+                row[index] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._reset()
+
+    def frequency(self, key: str) -> int:
+        return min(row[index]
+                   for row, index in zip(self._rows, self._indexes(key)))
+
+    def _reset(self) -> None:
+        for row in self._rows:
+            for index, value in enumerate(row):
+                row[index] = value >> 1
+        self._additions //= 2
+
+
+class HotObjectCache:
+    """Кэш содержимого небольших объектов хранилища в памяти процесса.
+
+    Объём ограничен max_size байт, вытесняются давно не запрошенные
+    объекты (LRU), но новый объект вытесняет их, только если запрашивается
+    чаще каждого из них (TinyLFU). Объекты больше max_object_size не
+    кэшируются.
+    """
+
+    def __init__(self, max_size: int, max_object_size: int) -> None:
+        self.max_size = max_size
+        self.max_object_size = min(max_object_size, max_size)
+        width = 1 << max(max_size // AVERAGE_OBJECT_SIZE, 1).bit_length()
+        self.sketch = FrequencySketch(
+            min(max(width, SKETCH_MIN_WIDTH), SKETCH_MAX_WIDTH)
+        )
+        self._entries: OrderedDict[str, tuple[ObjectStat, bytes]] = (
+            OrderedDict()
+        )
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict[str, int | float]:
+        return dict(size=len(self._entries), bytes=self.used, hits=self.hits,
+                    misses=self.misses, hit_ratio=self.hit_ratio)
+
+    def get(self, key: str) -> tuple[ObjectStat, bytes] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        self.sketch.increment(key)
+        self.hits += 1
+        HOT_CACHE_REQUESTS.labels('hit').inc()
+        return entry
+
+    def record_miss(self, key: str, size: int) -> bool:
+        """Учитывает промах и решает, стоит ли читать объект в кэш."""
+        self.misses += 1
+        HOT_CACHE_REQUESTS.labels('miss').inc()
+        if self.max_size <= 0 or size > self.max_object_size:
+            return False
+        self.sketch.increment(key)
+        return self._find_victims(key, size) is not None
+
+    def _find_victims(self, key: str, size: int) -> list[str] | None:
+        free = self.max_size - self.used
+        victims = []
+        frequency = self.sketch.frequency(key)
+        for victim, (_, content) in self._entries.items():
+            if free >= size:
+                break
+            if self.sketch.frequency(victim) >= frequency:
+                return None
+            victims.append(victim)
+            free += len(content)
+        return victims if free >= size else None
+
+    def set(self, key: str, object_stat: ObjectStat, content: bytes) -> None:
+        self.invalidate(key)
+        victims = self._find_victims(key, len(content))
+        if victims is None:
+            return
+        for victim in victims:
+            self.invalidate(victim)
+        self._entries[key] = (object_stat, content)
+        self.used += len(content)
+
+    def invalidate(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.used -= len(entry[1])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.used = 0
+
+
+hot_cache = HotObjectCache(settings.hot_cache_size,
+                           settings.hot_cache_max_object_size)
+
+
+async def read_object(key: str) -> tuple[ObjectStat, bytes | None]:
+    """Описание объекта и, если объект в кэше или допущен в него, его
+    содержимое. Горячий объект отдаётся без обращения к хранилищу.
+    """
+    entry = hot_cache.get(key)
+    if entry is not None:
+        return entry
+    object_stat = await storage.stat(key)
+    if not hot_cache.record_miss(key, object_stat.size):
+        return object_stat, None
+    content = b''.join([chunk async for chunk in storage.get(key)])
+    if len(content) != object_stat.size:
+        return object_stat, None
+    hot_cache.set(key, object_stat, content)
+    return object_stat, content
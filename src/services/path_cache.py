@@ -0,0 +1,65 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from src.core.config import settings
+from src.core.metrics import PATH_CACHE_REQUESTS
+
+PathKey = tuple[str, str]
+
+
+class PathCache:
+    """TTL/LRU-кэш в памяти процесса: (пользователь, путь) -> значения
+    колонок найденного файла.
+
+    Отсутствующие пути не кэшируются. Запись файла по пути инвалидирует
+    запись в текущем процессе; в остальных процессах она живёт не дольше
+    ttl секунд.
+    """
+
+    def __init__(self,
+                 max_size: int,
+                 ttl: float,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: OrderedDict[PathKey, tuple[float, dict[str, Any]]] = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_uuid: str, path: str) -> dict[str, Any] | None:
+        key = (str(user_uuid), path)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, values = entry
+            if expires_at > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                PATH_CACHE_REQUESTS.labels('hit').inc()
+                return values
+            del self._entries[key]
+        self.misses += 1
+        PATH_CACHE_REQUESTS.labels('miss').inc()
+        return None
+
+    def set(self, user_uuid: str, path: str, values: dict[str, Any]) -> None:
+        if self.max_size <= 0:
+            return
+        key = (str(user_uuid), path)
+        self._entries[key] = (self.clock() + self.ttl, values)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_uuid: str, paths: Any) -> None:
+        for path in paths:
+            self._entries.pop((str(user_uuid), path), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+path_cache = PathCache(settings.path_cache_size, settings.path_cache_ttl)
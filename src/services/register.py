@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.api.v1.schemas import UserAuth
 from src.models.base import User as UserDB
 from src.services.auth import get_password_hash
+from src.services.user_cache import user_cache
 
 
 async def create_user(
@@ -14,9 +15,10 @@ async def create_user(
     try:
         new_user = UserDB(id=uuid4(),
                           username=user.username,
-                          password=get_password_hash(user.password))
+                          password=await get_password_hash(user.password))
         session.add(new_user)
         await session.commit()
+        await user_cache.invalidate(new_user.username)
         return {'username': new_user.username}
     except IntegrityError:
         return
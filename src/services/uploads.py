@@ -0,0 +1,292 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+from pathlib import Path
+from typing import AsyncIterator
+from uuid import UUID, uuid4
+
+from fastapi import HTTPException, status
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import delete, select
+
+from src.api.v1.schemas import FileInfo, UploadSessionCreate, UploadSessionInfo
+from src.core.config import settings
+from src.core.metrics import UPLOAD_BYTES
+from src.db.database import async_session
+from src.models.base import File, UploadChunk, UploadSession
+from src.services.blobs import (acquire_blob, make_temp_blob_key, rechunk,
+                                store_temp_blob)
+from src.services.directories import add_to_directories
+from src.services.files import FILE_EXISTS_DETAIL, check_path, make_path_tail
+from src.services.listing import bump_listing_version
+from src.services.path_cache import path_cache
+from src.storage.drivers import storage
+
+logger = logging.getLogger(__name__)
+
+not_found_exception = HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                    detail='Сессия загрузки не найдена.')
+
+
+def make_chunk_size_exception(expected_size: int) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                         detail=f'Размер части должен быть {expected_size} '
+                                f'байт.')
+
+
+def count_chunks(size: int, chunk_size: int) -> int:
+    return -(-size // chunk_size)
+
+
+def get_partial_key(upload_session: UploadSession) -> str:
+    return make_temp_blob_key(upload_session.id.hex)
+
+
+def check_chunk_size(size: int, chunk_size: int) -> None:
+    if count_chunks(size, chunk_size) <= 1:
+        return
+    max_part_size = storage.max_part_size
+    if chunk_size < storage.min_part_size or (
+            max_part_size is not None and chunk_size > max_part_size):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Размер части должен быть от {storage.min_part_size} '
+                   f'до {max_part_size} байт.'
+        )
+
+
+async def make_session_info(upload_session: UploadSession,
+                            session: AsyncSession) -> UploadSessionInfo:
+    result = await session.execute(
+        select(UploadChunk.number)
+        .where(UploadChunk.session_id == upload_session.id)
+        .order_by(UploadChunk.number)
+    )
+    return UploadSessionInfo(
+        id=upload_session.id,
+        name=upload_session.name,
+        path=upload_session.path,
+        size=upload_session.size,
+        chunk_size=upload_session.chunk_size,
+        chunks_total=count_chunks(upload_session.size,
+                                  upload_session.chunk_size),
+        chunks_received=result.scalars().all(),
+    )
+
+
+async def create_upload_session(
+        upload: UploadSessionCreate, user_uuid: str, session: AsyncSession
+) -> UploadSessionInfo:
+    if upload.path.endswith('/'):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='Для сессии загрузки нужно указать полный '
+                                   'путь до файла.')
+    chunk_size = upload.chunk_size or settings.upload_chunk_size
+    check_chunk_size(upload.size, chunk_size)
+    path_tail = make_path_tail(Path(upload.path).name, upload.path)
+    await check_path(path_tail, user_uuid, session)
+    upload_session = UploadSession(
+        id=uuid4(),
+        name=path_tail.name,
+        path=str(path_tail),
+        size=upload.size,
+        chunk_size=chunk_size,
+        created_at=datetime.datetime.now(),
+        user_id=user_uuid,
+    )
+    upload_session.storage_upload_id = await storage.create_multipart(
+        get_partial_key(upload_session), upload.size
+    )
+    session.add(upload_session)
+    await session.commit()
+    return await make_session_info(upload_session, session)
+
+
+async def get_upload_session(
+        session_id: UUID, user_uuid: str, session: AsyncSession
+) -> UploadSession:
+    result = await session.execute(
+        select(UploadSession).where(UploadSession.id == session_id,
+                                    UploadSession.user_id == user_uuid)
+    )
+    upload_session = result.scalar()
+    if upload_session is None:
+        raise not_found_exception
+    return upload_session
+
+
+async def retrieve_upload_session(
+        session_id: UUID, user_uuid: str, session: AsyncSession
+) -> UploadSessionInfo:
+    upload_session = await get_upload_session(session_id, user_uuid, session)
+    return await make_session_info(upload_session, session)
+
+
+async def limit_chunk_data(stream: AsyncIterator[bytes],
+                           expected_size: int) -> AsyncIterator[bytes]:
+    written = 0
+    async for data in rechunk(stream, settings.chunk_size):
+        written += len(data)
+        if written > expected_size:
+            raise make_chunk_size_exception(expected_size)
+        yield data
+    if written != expected_size:
+        raise make_chunk_size_exception(expected_size)
+
+
+async def upload_chunk(session_id: UUID,
+                       number: int,
+                       stream: AsyncIterator[bytes],
+                       user_uuid: str,
+                       session: AsyncSession) -> None:
+    upload_session = await get_upload_session(session_id, user_uuid, session)
+    chunks_total = count_chunks(upload_session.size, upload_session.chunk_size)
+    if not 0 <= number < chunks_total:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='Неверный номер части.')
+    offset = number * upload_session.chunk_size
+    expected_size = min(upload_session.chunk_size,
+                        upload_session.size - offset)
+    try:
+        etag = await storage.put_part(
+            get_partial_key(upload_session), upload_session.storage_upload_id,
+            number, offset, limit_chunk_data(stream, expected_size)
+        )
+    except FileNotFoundError:
+        raise not_found_exception
+    UPLOAD_BYTES.inc(expected_size)
+    statement = insert(UploadChunk).values(
+        session_id=upload_session.id, number=number, size=expected_size,
+        etag=etag
+    )
+    await session.execute(statement.on_conflict_do_update(
+        index_elements=[UploadChunk.session_id, UploadChunk.number],
+        set_={'etag': etag},
+    ))
+    await session.commit()
+
+
+async def commit_upload_session(
+        session_id: UUID, user_uuid: str, session: AsyncSession
+) -> FileInfo:
+    upload_session = await get_upload_session(session_id, user_uuid, session)
+    session_info = await make_session_info(upload_session, session)
+    if len(session_info.chunks_received) != session_info.chunks_total:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail='Загружены не все части файла.')
+    path_tail = Path(upload_session.path)
+    await check_path(path_tail, user_uuid, session)
+    result = await session.execute(
+        select(UploadChunk.number, UploadChunk.etag)
+        .where(UploadChunk.session_id == upload_session.id)
+        .order_by(UploadChunk.number)
+    )
+    partial_key = get_partial_key(upload_session)
+    await storage.complete_multipart(partial_key,
+                                     upload_session.storage_upload_id,
+                                     [tuple(row) for row in result])
+    checksums, encoding = await store_temp_blob(partial_key)
+    file_info = FileInfo(
+        id=uuid4(),
+        name=upload_session.name,
+        created_at=datetime.datetime.now(),
+        path=upload_session.path,
+        size=upload_session.size,
+    )
+    try:
+        await acquire_blob(checksums.sha256, upload_session.size, session)
+        session.add(File(user_id=user_uuid, blob_hash=checksums.sha256,
+                         crc32c=checksums.crc32c, xxh3=checksums.xxh3,
+                         content_encoding=encoding, **file_info.dict()))
+        await add_to_directories(user_uuid,
+                                 [(file_info.path, file_info.size)], session)
+        await bump_listing_version(user_uuid, session)
+        await delete_upload_session(upload_session.id, session)
+    except IntegrityError:
+        # Тот же путь успели записать параллельным запросом после
+        # check_path; файл вставляется уже при flush, а не при коммите.
+        # Ссылку на блоб откатывает rollback, а собранный объект уже
+        # перенесён из частичного ключа, поэтому продолжить сессию нельзя
+        # и она удаляется отдельной транзакцией.
+        await session.rollback()
+        await delete_upload_session(session_id, session)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=FILE_EXISTS_DETAIL)
+    path_cache.invalidate(user_uuid, [file_info.path])
+    return file_info
+
+
+async def delete_upload_session(session_id: UUID,
+                                session: AsyncSession) -> None:
+    await session.execute(
+        delete(UploadSession).where(UploadSession.id == session_id)
+    )
+    await session.commit()
+
+
+async def abort_upload_session(
+        session_id: UUID, user_uuid: str, session: AsyncSession
+) -> None:
+    upload_session = await get_upload_session(session_id, user_uuid, session)
+    await delete_upload_session(upload_session.id, session)
+    await storage.abort_multipart(get_partial_key(upload_session),
+                                  upload_session.storage_upload_id)
+
+
+async def expire_upload_sessions(session: AsyncSession) -> int:
+    """Удаляет сессии загрузки старше settings.upload_session_ttl секунд
+    и их незавершённые загрузки в хранилище. Возвращает число удалённых
+    сессий.
+    """
+    expired_before = datetime.datetime.now() - datetime.timedelta(
+        seconds=settings.upload_session_ttl
+    )
+    result = await session.execute(
+        delete(UploadSession)
+        .where(UploadSession.created_at < expired_before)
+        .returning(UploadSession.id, UploadSession.storage_upload_id)
+    )
+    expired = result.all()
+    await session.commit()
+    for session_id, upload_id in expired:
+        await storage.abort_multipart(make_temp_blob_key(session_id.hex),
+                                      upload_id)
+    return len(expired)
+
+
+class UploadSessionCleaner:
+    """Периодически удаляет брошенные сессии загрузки."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with async_session() as session:
+                    await expire_upload_sessions(session)
+            except Exception:
+                logger.warning('Не удалось удалить устаревшие сессии '
+                               'загрузки.', exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+
+upload_session_cleaner = UploadSessionCleaner(
+    settings.upload_session_cleanup_interval
+)
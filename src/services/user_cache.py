@@ -0,0 +1,123 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from src.api.v1.schemas import CurrentUser
+from src.core.config import settings
+from src.core.metrics import USER_CACHE_REQUESTS
+
+SHARED_KEY_PREFIX = 'user:'
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """Кэш пользователей, найденных по subject токена (имени пользователя).
+
+    Первый уровень -- TTL/LRU-словарь в памяти процесса, второй
+    (необязательный) -- общее для всех процессов Redis-совместимое
+    хранилище с методами get, set(ex=...) и delete. Инвалидация очищает
+    оба уровня в текущем процессе; в остальных процессах запись живёт не
+    дольше ttl секунд.
+    """
+
+    def __init__(self,
+                 max_size: int,
+                 ttl: float,
+                 shared: Any | None = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[float, CurrentUser]] = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.shared_hits + self.misses
+        return (self.hits + self.shared_hits) / total if total else 0.0
+
+    def stats(self) -> dict[str, int | float]:
+        return dict(size=len(self._entries), hits=self.hits,
+                    shared_hits=self.shared_hits, misses=self.misses,
+                    hit_ratio=self.hit_ratio)
+
+    def _store(self, user: CurrentUser) -> None:
+        self._entries[user.username] = (self.clock() + self.ttl, user)
+        self._entries.move_to_end(user.username)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, username: str) -> CurrentUser | None:
+        entry = self._entries.get(username)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > self.clock():
+                self._entries.move_to_end(username)
+                self.hits += 1
+                USER_CACHE_REQUESTS.labels('hit').inc()
+                return user
+            del self._entries[username]
+        if self.shared is not None:
+            try:
+                data = await self.shared.get(SHARED_KEY_PREFIX + username)
+            except Exception:
+                logger.warning('Общий кэш пользователей недоступен.',
+                               exc_info=True)
+                data = None
+            if data is not None:
+                user = CurrentUser.parse_raw(data)
+                self._store(user)
+                self.shared_hits += 1
+                USER_CACHE_REQUESTS.labels('shared_hit').inc()
+                return user
+        self.misses += 1
+        USER_CACHE_REQUESTS.labels('miss').inc()
+        return None
+
+    async def set(self, user: CurrentUser) -> None:
+        self._store(user)
+        if self.shared is None:
+            return
+        try:
+            await self.shared.set(SHARED_KEY_PREFIX + user.username,
+                                  user.json(), ex=max(int(self.ttl), 1))
+        except Exception:
+            logger.warning('Общий кэш пользователей недоступен.',
+                           exc_info=True)
+
+    async def invalidate(self, username: str) -> None:
+        self._entries.pop(username, None)
+        if self.shared is None:
+            return
+        try:
+            await self.shared.delete(SHARED_KEY_PREFIX + username)
+        except Exception:
+            logger.warning('Общий кэш пользователей недоступен.',
+                           exc_info=True)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def close(self) -> None:
+        if self.shared is not None:
+            await self.shared.close()
+
+
+def create_user_cache() -> UserCache:
+    shared = None
+    if settings.user_cache_redis_url:
+        import redis.asyncio
+
+        shared = redis.asyncio.from_url(settings.user_cache_redis_url)
+    return UserCache(settings.user_cache_size, settings.user_cache_ttl,
+                     shared)
+
+
+user_cache = create_user_cache()
@@ -0,0 +1,80 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator
+
+
+@dataclass(frozen=True)
+class ObjectStat:
+    size: int
+    mtime: float
+
+
+class StorageDriver(ABC):
+    """Хранилище объектов, адресуемых ключами вида 'blobs/ab/cd/<sha256>'.
+
+    Отсутствующий объект во всех методах обозначается FileNotFoundError.
+    """
+
+    min_part_size: int = 1
+    max_part_size: int | None = None
+
+    @abstractmethod
+    async def put(self, key: str, stream: AsyncIterator[bytes]) -> int:
+        """Записать поток в объект и вернуть его размер."""
+
+    @abstractmethod
+    def get_range(self, key: str, offset: int,
+                  count: int | None = None) -> AsyncIterator[bytes]:
+        """Прочитать count байт объекта, начиная с offset."""
+
+    def get(self, key: str) -> AsyncIterator[bytes]:
+        return self.get_range(key, 0)
+
+    @abstractmethod
+    async def stat(self, key: str) -> ObjectStat:
+        pass
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await self.stat(key)
+        except FileNotFoundError:
+            return False
+        return True
+
+    @abstractmethod
+    def list_keys(self, prefix: str) -> AsyncIterator[str]:
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Удалить объект; отсутствие объекта ошибкой не считается."""
+
+    @abstractmethod
+    async def move(self, source_key: str, target_key: str) -> None:
+        pass
+
+    @abstractmethod
+    async def create_multipart(self, key: str, size: int) -> str:
+        """Начать загрузку объекта по частям и вернуть её идентификатор."""
+
+    @abstractmethod
+    async def put_part(self, key: str, upload_id: str, number: int,
+                       offset: int, stream: AsyncIterator[bytes]) -> str:
+        """Записать часть с номером number (с нуля) и вернуть её ETag."""
+
+    @abstractmethod
+    async def complete_multipart(self, key: str, upload_id: str,
+                                 parts: list[tuple[int, str]]) -> None:
+        pass
+
+    @abstractmethod
+    async def abort_multipart(self, key: str, upload_id: str) -> None:
+        pass
+
+    def get_local_path(self, key: str) -> Path | None:
+        """Путь к объекту на локальном диске, если он там есть."""
+        return None
+
+    async def close(self) -> None:
+        pass
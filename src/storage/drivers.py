@@ -0,0 +1,19 @@
+from src.core.config import settings
+from src.storage.base import StorageDriver
+from src.storage.instrumented import InstrumentedStorage
+from src.storage.local import LocalStorage
+
+
+def create_driver() -> StorageDriver:
+    if settings.storage_backend == 's3':
+        # aiobotocore нужен только для S3, поэтому импортируется лениво.
+        from src.storage.s3 import S3Storage
+        return S3Storage()
+    return LocalStorage(settings.storage_root_dir)
+
+
+def create_storage() -> StorageDriver:
+    return InstrumentedStorage(create_driver(), settings.storage_backend)
+
+
+storage = create_storage()
@@ -0,0 +1,119 @@
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from src.core.metrics import STORAGE_BYTES, STORAGE_DURATION, measure_stream
+from src.storage.base import ObjectStat, StorageDriver
+
+
+class InstrumentedStorage(StorageDriver):
+    """Обёртка над драйвером, которая замеряет время операций и объём
+    переданных данных. Время ожидания производителя или потребителя потока
+    в замер не входит.
+    """
+
+    def __init__(self, driver: StorageDriver, backend: str) -> None:
+        self.driver = driver
+        self.backend = backend
+
+    @property
+    def min_part_size(self) -> int:
+        return self.driver.min_part_size
+
+    @property
+    def max_part_size(self) -> int | None:
+        return self.driver.max_part_size
+
+    def observe(self, operation: str, elapsed: float) -> None:
+        STORAGE_DURATION.labels(self.backend, operation).observe(elapsed)
+
+    def measure_read(self, operation: str,
+                     stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        def observe(elapsed: float, size: int) -> None:
+            self.observe(operation, elapsed)
+            STORAGE_BYTES.labels(self.backend, 'read').inc(size)
+
+        return measure_stream(stream, observe)
+
+    async def measure_write(
+            self,
+            operation: str,
+            write: Callable[[AsyncIterator[bytes]], Awaitable[Any]],
+            stream: AsyncIterator[bytes]
+    ) -> Any:
+        producer_time = 0.0
+
+        def observe(elapsed: float, size: int) -> None:
+            nonlocal producer_time
+            producer_time = elapsed
+            STORAGE_BYTES.labels(self.backend, 'write').inc(size)
+
+        start = time.perf_counter()
+        try:
+            return await write(measure_stream(stream, observe))
+        finally:
+            self.observe(operation,
+                         time.perf_counter() - start - producer_time)
+
+    async def put(self, key: str, stream: AsyncIterator[bytes]) -> int:
+        return await self.measure_write(
+            'put', lambda measured: self.driver.put(key, measured), stream
+        )
+
+    def get_range(self, key: str, offset: int,
+                  count: int | None = None) -> AsyncIterator[bytes]:
+        return self.measure_read('get',
+                                 self.driver.get_range(key, offset, count))
+
+    async def stat(self, key: str) -> ObjectStat:
+        start = time.perf_counter()
+        try:
+            return await self.driver.stat(key)
+        finally:
+            self.observe('stat', time.perf_counter() - start)
+
+    def list_keys(self, prefix: str) -> AsyncIterator[str]:
+        return self.driver.list_keys(prefix)
+
+    async def delete(self, key: str) -> None:
+        start = time.perf_counter()
+        try:
+            await self.driver.delete(key)
+        finally:
+            self.observe('delete', time.perf_counter() - start)
+
+    async def move(self, source_key: str, target_key: str) -> None:
+        start = time.perf_counter()
+        try:
+            await self.driver.move(source_key, target_key)
+        finally:
+            self.observe('move', time.perf_counter() - start)
+
+    async def create_multipart(self, key: str, size: int) -> str:
+        return await self.driver.create_multipart(key, size)
+
+    async def put_part(self, key: str, upload_id: str, number: int,
+                       offset: int, stream: AsyncIterator[bytes]) -> str:
+        return await self.measure_write(
+            'put_part',
+            lambda measured: self.driver.put_part(key, upload_id, number,
+                                                  offset, measured),
+            stream
+        )
+
+    async def complete_multipart(self, key: str, upload_id: str,
+                                 parts: list[tuple[int, str]]) -> None:
+        start = time.perf_counter()
+        try:
+            await self.driver.complete_multipart(key, upload_id, parts)
+        finally:
+            self.observe('complete_multipart', time.perf_counter() - start)
+
+    async def abort_multipart(self, key: str, upload_id: str) -> None:
+        await self.driver.abort_multipart(key, upload_id)
+
+    def get_local_path(self, key: str) -> Path | None:
+        return self.driver.get_local_path(key)
+
+    async def close(self) -> None:
+        await self.driver.close()
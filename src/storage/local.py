@@ -0,0 +1,135 @@
+import contextlib
+import os
+from pathlib import Path
+from typing import AsyncIterator
+
+import anyio
+
+from src.core.config import settings
+from src.storage.base import ObjectStat, StorageDriver
+
+
+def make_parent_dirs(path: Path) -> None:
+    os.makedirs(path.parent, exist_ok=True)
+
+
+def pwrite_all(fd: int, data: bytes, offset: int) -> None:
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def allocate_file(path: Path, size: int) -> None:
+    make_parent_dirs(path)
+    with open(path, 'wb') as file_obj:
+        file_obj.truncate(size)
+
+
+def remove_file(path: Path) -> None:
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+def move_file(source: Path, target: Path) -> None:
+    make_parent_dirs(target)
+    os.replace(source, target)
+
+
+def list_files(root: Path, prefix: str) -> list[str]:
+    base = root.joinpath(prefix)
+    search_dir = base if base.is_dir() else base.parent
+    keys = []
+    for dir_path, _, file_names in os.walk(search_dir):
+        for file_name in file_names:
+            key = Path(dir_path, file_name).relative_to(root).as_posix()
+            if key.startswith(prefix):
+                keys.append(key)
+    return sorted(keys)
+
+
+class LocalStorage(StorageDriver):
+    """Объекты хранятся файлами в каталоге settings.storage_root_dir."""
+
+    def __init__(self, root_dir: str) -> None:
+        self.root = Path(root_dir)
+
+    def get_local_path(self, key: str) -> Path:
+        return self.root.joinpath(key)
+
+    async def put(self, key: str, stream: AsyncIterator[bytes]) -> int:
+        path = self.get_local_path(key)
+        await anyio.to_thread.run_sync(make_parent_dirs, path)
+        size = 0
+        async with await anyio.open_file(path, 'wb') as file_obj:
+            async for data in stream:
+                await file_obj.write(data)
+                size += len(data)
+        return size
+
+    async def get_range(self, key: str, offset: int,
+                        count: int | None = None) -> AsyncIterator[bytes]:
+        async with await anyio.open_file(self.get_local_path(key),
+                                         mode='rb') as file_obj:
+            await file_obj.seek(offset)
+            remaining = count
+            while remaining is None or remaining > 0:
+                size = settings.chunk_size
+                if remaining is not None:
+                    size = min(size, remaining)
+                    remaining -= size
+                chunk = await file_obj.read(size)
+                if not chunk:
+                    return
+                yield chunk
+
+    async def stat(self, key: str) -> ObjectStat:
+        stat_result = await anyio.to_thread.run_sync(
+            os.stat, self.get_local_path(key)
+        )
+        return ObjectStat(size=stat_result.st_size,
+                          mtime=stat_result.st_mtime)
+
+    async def list_keys(self, prefix: str) -> AsyncIterator[str]:
+        for key in await anyio.to_thread.run_sync(list_files, self.root,
+                                                  prefix):
+            yield key
+
+    async def delete(self, key: str) -> None:
+        await anyio.to_thread.run_sync(remove_file, self.get_local_path(key))
+
+    async def move(self, source_key: str, target_key: str) -> None:
+        await anyio.to_thread.run_sync(move_file,
+                                       self.get_local_path(source_key),
+                                       self.get_local_path(target_key))
+
+    async def create_multipart(self, key: str, size: int) -> str:
+        # Части пишутся сразу на своё место в заранее выделенный файл,
+        # поэтому отдельный идентификатор загрузки не нужен.
+        await anyio.to_thread.run_sync(allocate_file,
+                                       self.get_local_path(key), size)
+        return key
+
+    async def put_part(self, key: str, upload_id: str, number: int,
+                       offset: int, stream: AsyncIterator[bytes]) -> str:
+        fd = await anyio.to_thread.run_sync(
+            os.open, self.get_local_path(key), os.O_WRONLY
+        )
+        try:
+            written = 0
+            async for data in stream:
+                await anyio.to_thread.run_sync(
+                    pwrite_all, fd, data, offset + written
+                )
+                written += len(data)
+        finally:
+            os.close(fd)
+        return f'{number}-{written}'
+
+    async def complete_multipart(self, key: str, upload_id: str,
+                                 parts: list[tuple[int, str]]) -> None:
+        pass
+
+    async def abort_multipart(self, key: str, upload_id: str) -> None:
+        await self.delete(key)
@@ -0,0 +1,263 @@
+import contextlib
+from typing import AsyncIterator
+
+import anyio
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
+from botocore.exceptions import ClientError
+
+from src.core.config import settings
+from src.storage.base import ObjectStat, StorageDriver
+
+NOT_FOUND_CODES = {'404', 'NoSuchKey', 'NoSuchUpload', 'NotFound'}
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_COPY_SIZE = 5 * 1024 * 1024 * 1024
+
+
+def is_not_found(error: ClientError) -> bool:
+    return error.response.get('Error', {}).get('Code') in NOT_FOUND_CODES
+
+
+async def read_parts(stream: AsyncIterator[bytes],
+                     part_size: int) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    async for data in stream:
+        buffer += data
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+class S3Storage(StorageDriver):
+    """Объекты хранятся в бакете S3-совместимого хранилища.
+
+    Клиент (и пул HTTP-соединений в нём) создаётся один раз на процесс
+    при первом обращении и закрывается при остановке приложения.
+    """
+
+    min_part_size = MIN_PART_SIZE
+
+    def __init__(self) -> None:
+        self.bucket = settings.s3_bucket
+        self.max_part_size = settings.s3_part_size
+        self._session = get_session()
+        self._exit_stack = contextlib.AsyncExitStack()
+        self._client = None
+        self._lock = anyio.Lock()
+
+    async def get_client(self):
+        if self._client is None:
+            async with self._lock:
+                if self._client is None:
+                    self._client = await self._exit_stack.enter_async_context(
+                        self._session.create_client(
+                            's3',
+                            endpoint_url=settings.s3_endpoint_url,
+                            region_name=settings.s3_region,
+                            aws_access_key_id=settings.s3_access_key_id,
+                            aws_secret_access_key=(
+                                settings.s3_secret_access_key
+                            ),
+                            config=AioConfig(max_pool_connections=(
+                                settings.s3_max_pool_connections
+                            )),
+                        )
+                    )
+        return self._client
+
+    async def close(self) -> None:
+        await self._exit_stack.aclose()
+        self._client = None
+
+    async def put(self, key: str, stream: AsyncIterator[bytes]) -> int:
+        client = await self.get_client()
+        parts = read_parts(stream, settings.s3_part_size)
+        first_part = await anext(parts, b'')
+        second_part = await anext(parts, None)
+        if second_part is None:
+            await client.put_object(Bucket=self.bucket, Key=key,
+                                    Body=first_part)
+            return len(first_part)
+
+        async def iter_all_parts() -> AsyncIterator[bytes]:
+            yield first_part
+            yield second_part
+            async for part in parts:
+                yield part
+
+        upload_id = await self.create_multipart(key, 0)
+        try:
+            completed, size = await self.upload_parts(key, upload_id,
+                                                      iter_all_parts())
+            await self.complete_multipart(key, upload_id, completed)
+        except BaseException:
+            with anyio.CancelScope(shield=True):
+                await self.abort_multipart(key, upload_id)
+            raise
+        return size
+
+    async def upload_parts(
+            self, key: str, upload_id: str, parts: AsyncIterator[bytes]
+    ) -> tuple[list[tuple[int, str]], int]:
+        """Загружает части параллельно; одновременно в памяти находится не
+        больше settings.s3_upload_concurrency частей.
+        """
+        client = await self.get_client()
+        limiter = anyio.Semaphore(settings.s3_upload_concurrency)
+        completed: list[tuple[int, str]] = []
+        size = 0
+
+        async def upload_part(number: int, body: bytes) -> None:
+            try:
+                response = await client.upload_part(
+                    Bucket=self.bucket, Key=key, UploadId=upload_id,
+                    PartNumber=number + 1, Body=body
+                )
+                completed.append((number, response['ETag']))
+            finally:
+                limiter.release()
+
+        async with anyio.create_task_group() as task_group:
+            number = 0
+            async for body in parts:
+                await limiter.acquire()
+                task_group.start_soon(upload_part, number, body)
+                size += len(body)
+                number += 1
+        return sorted(completed), size
+
+    async def get_range(self, key: str, offset: int,
+                        count: int | None = None) -> AsyncIterator[bytes]:
+        if count == 0:
+            return
+        client = await self.get_client()
+        options: dict[str, str] = {}
+        # Диапазон bytes=0- пустого объекта S3 отклоняет с InvalidRange,
+        # поэтому объект целиком читается без заголовка Range.
+        if offset or count is not None:
+            end = '' if count is None else offset + count - 1
+            options['Range'] = f'bytes={offset}-{end}'
+        try:
+            response = await client.get_object(Bucket=self.bucket, Key=key,
+                                               **options)
+        except ClientError as error:
+            if is_not_found(error):
+                raise FileNotFoundError(key) from error
+            raise
+        body = response['Body']
+        async with body:
+            while chunk := await body.read(settings.chunk_size):
+                yield chunk
+
+    async def stat(self, key: str) -> ObjectStat:
+        client = await self.get_client()
+        try:
+            response = await client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as error:
+            if is_not_found(error):
+                raise FileNotFoundError(key) from error
+            raise
+        return ObjectStat(size=response['ContentLength'],
+                          mtime=response['LastModified'].timestamp())
+
+    async def list_keys(self, prefix: str) -> AsyncIterator[str]:
+        client = await self.get_client()
+        paginator = client.get_paginator('list_objects_v2')
+        async for page in paginator.paginate(Bucket=self.bucket,
+                                             Prefix=prefix):
+            for item in page.get('Contents', []):
+                yield item['Key']
+
+    async def delete(self, key: str) -> None:
+        client = await self.get_client()
+        await client.delete_object(Bucket=self.bucket, Key=key)
+
+    async def move(self, source_key: str, target_key: str) -> None:
+        client = await self.get_client()
+        source = {'Bucket': self.bucket, 'Key': source_key}
+        object_stat = await self.stat(source_key)
+        if object_stat.size <= MAX_COPY_SIZE:
+            await client.copy_object(Bucket=self.bucket, Key=target_key,
+                                     CopySource=source)
+        else:
+            await self.copy_multipart(source, target_key, object_stat.size)
+        await self.delete(source_key)
+
+    async def copy_multipart(self, source: dict[str, str], target_key: str,
+                             size: int) -> None:
+        client = await self.get_client()
+        upload_id = await self.create_multipart(target_key, size)
+        part_size = settings.s3_copy_part_size
+        limiter = anyio.Semaphore(settings.s3_upload_concurrency)
+        completed: list[tuple[int, str]] = []
+
+        async def copy_part(number: int) -> None:
+            async with limiter:
+                start = number * part_size
+                end = min(start + part_size, size) - 1
+                response = await client.upload_part_copy(
+                    Bucket=self.bucket, Key=target_key, UploadId=upload_id,
+                    PartNumber=number + 1, CopySource=source,
+                    CopySourceRange=f'bytes={start}-{end}'
+                )
+                completed.append((number, response['CopyPartResult']['ETag']))
+
+        try:
+            async with anyio.create_task_group() as task_group:
+                for number in range(-(-size // part_size)):
+                    task_group.start_soon(copy_part, number)
+            await self.complete_multipart(target_key, upload_id,
+                                          sorted(completed))
+        except BaseException:
+            with anyio.CancelScope(shield=True):
+                await self.abort_multipart(target_key, upload_id)
+            raise
+
+    async def create_multipart(self, key: str, size: int) -> str:
+        client = await self.get_client()
+        response = await client.create_multipart_upload(Bucket=self.bucket,
+                                                        Key=key)
+        return response['UploadId']
+
+    async def put_part(self, key: str, upload_id: str, number: int,
+                       offset: int, stream: AsyncIterator[bytes]) -> str:
+        client = await self.get_client()
+        body = bytearray()
+        async for data in stream:
+            body += data
+        try:
+            response = await client.upload_part(
+                Bucket=self.bucket, Key=key, UploadId=upload_id,
+                PartNumber=number + 1, Body=bytes(body)
+            )
+        except ClientError as error:
+            if is_not_found(error):
+                raise FileNotFoundError(key) from error
+            raise
+        return response['ETag']
+
+    async def complete_multipart(self, key: str, upload_id: str,
+                                 parts: list[tuple[int, str]]) -> None:
+        client = await self.get_client()
+        if not parts:
+            await self.abort_multipart(key, upload_id)
+            await client.put_object(Bucket=self.bucket, Key=key, Body=b'')
+            return
+        await client.complete_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=upload_id,
+            MultipartUpload={'Parts': [
+                {'PartNumber': number + 1, 'ETag': etag}
+                for number, etag in parts
+            ]}
+        )
+
+    async def abort_multipart(self, key: str, upload_id: str) -> None:
+        client = await self.get_client()
+        try:
+            await client.abort_multipart_upload(Bucket=self.bucket, Key=key,
+                                                UploadId=upload_id)
+        except ClientError as error:
+            if not is_not_found(error):
+                raise
@@ -21,6 +21,11 @@ from src.api.v1.register import register
 from src.db.database import Base, get_session
 from src.main import app
 from src.models.base import File, User
+from src.services.directories import add_to_directories
+from src.services.listing import bump_listing_version, listing_cache
+from src.services.object_cache import hot_cache
+from src.services.path_cache import path_cache
+from src.services.user_cache import user_cache
 
 load_dotenv()
 
@@ -55,6 +60,15 @@ async def test_engine(_database_url: str) -> AsyncEngine:
     return create_async_engine(_database_url, echo=True)
 
 
+@pytest.fixture(autouse=True)
+def clear_caches() -> None:
+    # Пользователи и файлы создаются заново в транзакции каждого теста.
+    user_cache.clear()
+    hot_cache.clear()
+    path_cache.clear()
+    listing_cache.clear()
+
+
 @pytest_asyncio.fixture
 async def test_app(db_session: AsyncSession) -> FastAPI:
     async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -90,6 +104,16 @@ class RegisteredUserTwo:
     password = 'test_user_two_password'
 
 
+class FakeClock:
+    """Часы для кэшей с TTL, которые тест переводит вручную."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
 @pytest_asyncio.fixture
 async def registered_client(
         test_app: Callable,
@@ -193,4 +217,12 @@ async def create_files(registered_client: AsyncClient,
          'user_id': RegisteredUserTwo.id}
     ]
     await db_session.execute(insert(File).values(file_infos))
+    for user_id in (RegisteredUserOne.id, RegisteredUserTwo.id):
+        await add_to_directories(
+            user_id, [(file_info['path'], file_info['size'])
+                      for file_info in file_infos
+                      if file_info['user_id'] == user_id],
+            db_session
+        )
+        await bump_listing_version(user_id, db_session)
     await db_session.commit()
@@ -0,0 +1,148 @@
+import gzip
+import io
+import lzma
+import os
+import tarfile
+import zipfile
+import zlib
+from pathlib import Path
+from typing import AsyncIterator
+
+import pytest
+import zstandard
+
+from src.services import archive
+from src.services.archive import ArchiveEntry
+from src.services.compression import DeflateStream, GzipStream, XzStream
+from src.storage.local import LocalStorage
+
+CONTENT = os.urandom(1024) * 300 + os.urandom(100 * 1024)
+FILES = {'docs/a.bin': CONTENT, 'docs/empty.txt': b'', 'b.txt': b'b' * 1000,
+         'photo.jpg': b'jpeg' * 1000}
+
+
+async def iter_content(content: bytes) -> AsyncIterator[bytes]:
+    for offset in range(0, len(content), 7000):
+        yield content[offset:offset + 7000]
+
+
+async def read_all(stream: AsyncIterator[bytes]) -> bytes:
+    return b''.join([chunk async for chunk in stream])
+
+
+async def compress(compressor: DeflateStream, content: bytes) -> bytes:
+    data = [await compressor.compress(chunk)
+            async for chunk in iter_content(content)]
+    return b''.join(data) + await compressor.flush()
+
+
+@pytest.fixture
+async def entries(tmp_path: Path,
+                  monkeypatch: pytest.MonkeyPatch) -> list[ArchiveEntry]:
+    local_storage = LocalStorage(str(tmp_path))
+    monkeypatch.setattr(archive, 'storage', local_storage)
+    for name, content in FILES.items():
+        await local_storage.put(name, iter_content(content))
+    return [ArchiveEntry(name, '/' + name) for name in FILES]
+
+
+@pytest.mark.parametrize('content', [b'', b'x', CONTENT])
+async def test_deflate_stream(content: bytes) -> None:
+    compressor = DeflateStream(6, block_size=16 * 1024, window=3)
+    data = await compress(compressor, content)
+    assert zlib.decompress(data, -zlib.MAX_WBITS) == content
+    assert compressor.compressed_size == len(data)
+    assert compressor.crc == zlib.crc32(content)
+    assert len(data) < len(content) or len(content) < 2
+
+
+async def test_gzip_stream() -> None:
+    data = await compress(GzipStream(1), CONTENT)
+    assert gzip.decompress(data) == CONTENT
+
+
+@pytest.mark.parametrize('content', [b'', b'x', CONTENT])
+async def test_xz_stream_level_0(content: bytes) -> None:
+    data = await compress(XzStream(0), content)
+    assert lzma.decompress(data) == content
+    # Без сжатия добавляются только заголовки xz и чанков LZMA2.
+    assert len(content) <= len(data) < len(content) + 256
+
+
+async def test_xz_stream_store() -> None:
+    compressor = XzStream(6)
+    data = (await compressor.compress(CONTENT)
+            + await compressor.compress(CONTENT, store=True)
+            + await compressor.flush())
+    assert lzma.decompress(data) == CONTENT * 2
+    assert len(CONTENT) < len(data) < len(CONTENT) * 1.5
+
+
+def decompress_tar(data: bytes, archive_format: str) -> tarfile.TarFile:
+    if archive_format == 'tar.zst':
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return tarfile.open(fileobj=io.BytesIO(data))
+
+
+@pytest.mark.parametrize('archive_format, level, skip_compressed', [
+    ('tar', 6, False), ('tar', 6, True), ('tar', 0, False),
+    ('tar.zst', 3, True), ('tar.xz', 1, False),
+])
+async def test_tar_files(entries: list[ArchiveEntry], archive_format: str,
+                         level: int, skip_compressed: bool) -> None:
+    data = await read_all(archive.tar_files(entries, archive_format, level,
+                                            skip_compressed))
+    with decompress_tar(data, archive_format) as tar:
+        assert tar.getnames() == list(FILES)
+        for name, content in FILES.items():
+            assert tar.extractfile(name).read() == content
+
+
+async def test_zip_skip_compressed(entries: list[ArchiveEntry]) -> None:
+    data = await read_all(archive.zip_files(entries, 6, skip_compressed=True))
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.getinfo('photo.jpg').compress_type == (
+            zipfile.ZIP_STORED
+        )
+        assert zip_file.getinfo('b.txt').compress_type == (
+            zipfile.ZIP_DEFLATED
+        )
+
+
+@pytest.mark.parametrize('accept_encoding, archive_format', [
+    (None, 'zip'),
+    ('identity', 'zip'),
+    ('gzip, deflate, br', 'tar'),
+    ('gzip, zstd', 'tar.zst'),
+    ('zstd;q=0.5, gzip', 'tar'),
+    ('*;q=0.1, zstd;q=0', 'tar'),
+])
+def test_negotiate_format(accept_encoding: str | None,
+                          archive_format: str) -> None:
+    assert archive.negotiate_format(accept_encoding) == archive_format
+
+
+@pytest.mark.parametrize('level, compress_type', [
+    (6, zipfile.ZIP_DEFLATED), (0, zipfile.ZIP_STORED)
+])
+async def test_zip_files(entries: list[ArchiveEntry], level: int,
+                         compress_type: int) -> None:
+    data = await read_all(archive.zip_files(entries, level))
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.namelist() == list(FILES)
+        for name, content in FILES.items():
+            assert zip_file.read(name) == content
+            assert zip_file.getinfo(name).compress_type == compress_type
+
+
+async def test_zip64(entries: list[ArchiveEntry],
+                     monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(archive, 'ZIP64_LIMIT', 100)
+    monkeypatch.setattr(archive, 'ZIP_MAX_ENTRIES', 2)
+    data = await read_all(archive.zip_files(entries, 6))
+    assert archive.ZIP64_END_SIGNATURE in data
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.read('docs/a.bin') == CONTENT
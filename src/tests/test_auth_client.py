@@ -1,10 +1,18 @@
+import threading
 from typing import Any, Callable
 
+import anyio
 import pytest
-from fastapi import status
+from fastapi import HTTPException, status
 from httpx import AsyncClient
+from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import select, update
 
 from src.api.v1.auth import login_for_access_token
+from src.core.config import settings
+from src.models.base import User
+from src.services.auth import PasswordHashPool
 from src.tests.conftest import RegisteredUserOne
 
 
@@ -70,3 +78,40 @@ async def test_unregistered_client_post(client: AsyncClient,
               'password': RegisteredUserOne.password}
     )
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+async def test_rehash_on_login(registered_client: AsyncClient,
+                               url_path_for: Callable,
+                               db_session: AsyncSession) -> None:
+    old_context = CryptContext(schemes=['bcrypt'], bcrypt__rounds=4)
+    await db_session.execute(
+        update(User).where(User.username == RegisteredUserOne.username)
+        .values(password=old_context.hash(RegisteredUserOne.password))
+    )
+    response = await registered_client.post(url_path_for(
+        login_for_access_token.__name__),
+        data={'username': RegisteredUserOne.username,
+              'password': RegisteredUserOne.password}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    result = await db_session.execute(
+        select(User.password).where(
+            User.username == RegisteredUserOne.username
+        )
+    )
+    rounds = int(result.scalar().split('$')[2])
+    assert rounds == settings.password_hash_rounds
+
+
+async def test_password_hash_pool_back_pressure() -> None:
+    pool = PasswordHashPool(workers=1, queue_size=1)
+    release = threading.Event()
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(pool.run, release.wait)
+        task_group.start_soon(pool.run, release.wait)
+        await anyio.sleep(0.1)
+        with pytest.raises(HTTPException) as error:
+            await pool.run(release.wait)
+        assert error.value.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        release.set()
+    assert pool.pending == 0
@@ -0,0 +1,146 @@
+import io
+import tarfile
+import zipfile
+from typing import Callable
+
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import select
+
+from src.api.v1.base import upload_files_batch
+from src.models.base import Blob, File
+from src.services import batch
+from src.tests.conftest import RegisteredUserOne
+
+
+def make_tar(members: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for name, content in members.items():
+            tarinfo = tarfile.TarInfo(name)
+            tarinfo.size = len(content)
+            archive.addfile(tarinfo, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def make_zip(members: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, mode='w') as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+async def test_unauthorized_client(
+        client: AsyncClient,
+        url_path_for: Callable
+) -> None:
+    response = await client.post(url_path_for(upload_files_batch.__name__),
+                                 data={'path': '/batch/'},
+                                 files=[('files', ('a.txt', b'a'))])
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+async def test_multipart_batch(
+        registered_client: AsyncClient,
+        url_path_for: Callable,
+        user_one_token: str,
+        create_files: Callable,
+        db_session: AsyncSession
+) -> None:
+    response = await registered_client.post(
+        url_path_for(upload_files_batch.__name__),
+        headers={'Authorization': f'Bearer {user_one_token}'},
+        data={'path': '/user_1/'},
+        files=[('files', ('a.txt', b'same')),
+               ('files', ('nested/b.txt', b'same')),
+               ('files', ('file_1_1.txt', b'conflict')),
+               ('files', ('a.txt', b'duplicate')),
+               ('files', ('../escape.txt', b'bad'))]
+    )
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert (result['created'], result['failed']) == (1, 4)
+    assert [item['status'] for item in result['items']] == [
+        'error', 'created', 'error', 'error', 'error'
+    ]
+    assert result['items'][1]['file']['path'] == '/user_1/nested/b.txt'
+    assert result['items'][2]['detail'] == (
+        'По указанному пути файл с таким именем уже загружен.'
+    )
+
+    files = (await db_session.execute(
+        select(File).where(File.user_id == RegisteredUserOne.id,
+                           File.path.like('/user_1/nested/%'))
+    )).scalars().all()
+    assert [file.size for file in files] == [4]
+    blob = (await db_session.execute(
+        select(Blob).where(Blob.hash == files[0].blob_hash)
+    )).scalar()
+    assert blob.ref_count == 1
+
+
+async def test_archive_batch(
+        registered_client: AsyncClient,
+        url_path_for: Callable,
+        user_one_token: str,
+        db_session: AsyncSession
+) -> None:
+    response = await registered_client.post(
+        url_path_for(upload_files_batch.__name__),
+        headers={'Authorization': f'Bearer {user_one_token}'},
+        data={'path': '/photos/', 'unpack': 'true'},
+        files=[('files', ('one.tar.gz', make_tar({'a/1.jpg': b'one',
+                                                  'a/2.jpg': b'two'}))),
+               ('files', ('two.zip', make_zip({'b/3.jpg': b'one'})))]
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['created'] == 3
+
+    files = (await db_session.execute(
+        select(File.path, File.blob_hash)
+        .where(File.user_id == RegisteredUserOne.id)
+        .order_by(File.path)
+    )).all()
+    assert [file.path for file in files] == [
+        '/photos/a/1.jpg', '/photos/a/2.jpg', '/photos/b/3.jpg'
+    ]
+    blob = (await db_session.execute(
+        select(Blob).where(Blob.hash == files[0].blob_hash)
+    )).scalar()
+    assert blob.ref_count == 2
+
+    response = await registered_client.post(
+        url_path_for(upload_files_batch.__name__),
+        headers={'Authorization': f'Bearer {user_one_token}'},
+        data={'path': '/photos/', 'unpack': 'true'},
+        files=[('files', ('bad.zip', b'not an archive'))]
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_concurrent_conflict(
+        registered_client: AsyncClient,
+        url_path_for: Callable,
+        user_one_token: str,
+        create_files: Callable,
+        monkeypatch
+) -> None:
+    # Конфликт, который появился после проверки путей: его находит только
+    # уникальный индекс при коммите.
+    async def find_no_conflicts(*args) -> None:
+        pass
+
+    monkeypatch.setattr(batch, 'find_conflicts', find_no_conflicts)
+    response = await registered_client.post(
+        url_path_for(upload_files_batch.__name__),
+        headers={'Authorization': f'Bearer {user_one_token}'},
+        data={'path': '/user_1/'},
+        files=[('files', ('new.txt', b'new')),
+               ('files', ('file_1_1.txt', b'conflict'))]
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()['detail'] == (
+        'По указанному пути файл с таким именем уже загружен.'
+    )
@@ -1,5 +1,8 @@
+import io
 import os
 import shutil
+import tarfile
+import zipfile
 from pathlib import Path
 from typing import Callable
 
@@ -7,7 +10,7 @@ import pytest
 from fastapi import status
 from httpx import AsyncClient
 
-from src.api.v1.base import download_files
+from src.api.v1.base import download_archive, download_files, put_file
 from src.services.files import get_user_dir
 from src.tests.conftest import RegisteredUserOne
 
@@ -57,6 +60,125 @@ class Test:
         assert response.status_code == status.HTTP_200_OK
         assert response.content == b'user_1\n'
 
+    async def test_download_headers(
+            self,
+            registered_client: AsyncClient,
+            user_one_token: str,
+            url_path_for: Callable,
+            create_files: Callable
+    ) -> None:
+        headers = {'Authorization': f'Bearer {user_one_token}'}
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            headers=headers,
+            params={'path': 'ffff0101-22ba-4327-b711-db8502bcfc27'}
+        )
+        assert response.headers['content-length'] == '7'
+        assert response.headers['content-type'].startswith('text/plain')
+        assert 'last-modified' in response.headers
+        etag = response.headers['etag']
+
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            headers={**headers, 'If-None-Match': etag},
+            params={'path': 'ffff0101-22ba-4327-b711-db8502bcfc27'}
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b''
+
+    @pytest.mark.parametrize(
+        'range_header, content, content_range',
+        [
+            ('bytes=0-3', b'user', 'bytes 0-3/7'),
+            ('bytes=5-', b'1\n', 'bytes 5-6/7'),
+            ('bytes=-2', b'1\n', 'bytes 5-6/7'),
+            ('bytes=4-100', b'_1\n', 'bytes 4-6/7'),
+        ]
+    )
+    async def test_download_range(
+            self,
+            range_header: str,
+            content: bytes,
+            content_range: str,
+            registered_client: AsyncClient,
+            user_one_token: str,
+            url_path_for: Callable,
+            create_files: Callable
+    ) -> None:
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            headers={'Authorization': f'Bearer {user_one_token}',
+                     'Range': range_header},
+            params={'path': 'ffff0101-22ba-4327-b711-db8502bcfc27'}
+        )
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert response.content == content
+        assert response.headers['content-range'] == content_range
+        assert response.headers['content-length'] == str(len(content))
+
+    async def test_download_multiple_ranges(
+            self,
+            registered_client: AsyncClient,
+            user_one_token: str,
+            url_path_for: Callable,
+            create_files: Callable
+    ) -> None:
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            headers={'Authorization': f'Bearer {user_one_token}',
+                     'Range': 'bytes=0-1, 5-6'},
+            params={'path': 'ffff0101-22ba-4327-b711-db8502bcfc27'}
+        )
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        media_type, _, boundary = (
+            response.headers['content-type'].partition('; boundary=')
+        )
+        assert media_type == 'multipart/byteranges'
+        assert response.headers['content-length'] == str(
+            len(response.content)
+        )
+        parts = response.content.split(f'--{boundary}'.encode())
+        assert parts[-1] == b'--\r\n'
+        assert parts[1].endswith(b'bytes 0-1/7\r\n\r\nus\r\n')
+        assert parts[2].endswith(b'bytes 5-6/7\r\n\r\n1\n\r\n')
+
+    async def test_download_range_conditions(
+            self,
+            registered_client: AsyncClient,
+            user_one_token: str,
+            url_path_for: Callable,
+            create_files: Callable
+    ) -> None:
+        headers = {'Authorization': f'Bearer {user_one_token}'}
+        params = {'path': 'ffff0101-22ba-4327-b711-db8502bcfc27'}
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            headers={**headers, 'Range': 'bytes=7-'},
+            params=params
+        )
+        assert response.status_code == (
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        assert response.headers['content-range'] == 'bytes */7'
+
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            headers={**headers, 'Range': 'bytes=0-3', 'If-Range': '"stale"'},
+            params=params
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content == b'user_1\n'
+        assert response.headers['accept-ranges'] == 'bytes'
+
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            headers={**headers, 'Range': 'bytes=0-3',
+                     'If-Range': response.headers['etag']},
+            params=params
+        )
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert response.content == b'user'
+
     @pytest.mark.parametrize('params', ['tar', 'zip', ])
     async def test__authorized_client_get_2(
             self,
@@ -74,3 +196,138 @@ class Test:
         )
         assert response.status_code == status.HTTP_200_OK
         assert len(response.content) > 0
+
+    async def test_archive_content(
+            self,
+            registered_client: AsyncClient,
+            user_one_token: str,
+            url_path_for: Callable,
+            create_files: Callable
+    ) -> None:
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            headers={'Authorization': f'Bearer {user_one_token}'},
+            params={'path': '/user_1', 'compression': 'zip'}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            assert archive.testzip() is None
+            assert archive.read('user_1/file_1_1.txt') == b'user_1\n'
+
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            headers={'Authorization': f'Bearer {user_one_token}'},
+            params={'path': '/user_1', 'compression': 'tar'}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        with tarfile.open(fileobj=io.BytesIO(response.content)) as archive:
+            member = archive.extractfile('user_1/file_1_1.txt')
+            assert member.read() == b'user_1\n'
+
+    async def test_selection_archive(
+            self,
+            registered_client: AsyncClient,
+            user_one_token: str,
+            url_path_for: Callable,
+            create_files: Callable
+    ) -> None:
+        headers = {'Authorization': f'Bearer {user_one_token}'}
+        response = await registered_client.post(
+            url_path_for(download_archive.__name__),
+            headers=headers,
+            json={'items': ['ffff0101-22ba-4327-b711-db8502bcfc27',
+                            '/user_1/file_1_1.txt', '/user_1/*_3.txt'],
+                  'compression': 'tar'}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        with tarfile.open(fileobj=io.BytesIO(response.content)) as archive:
+            assert archive.getnames() == ['user_1/file_1_1.txt']
+            member = archive.extractfile('user_1/file_1_1.txt')
+            assert member.read() == b'user_1\n'
+
+        response = await registered_client.post(
+            url_path_for(download_archive.__name__),
+            headers=headers,
+            json={'items': ['/user_1/file_1_1.txt', '/user_2/file_2_1.txt']}
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json()['detail'] == (
+            'Файлы не найдены: /user_2/file_2_1.txt.'
+        )
+
+    async def test_selection_pattern_escaping(
+            self,
+            registered_client: AsyncClient,
+            user_one_token: str,
+            url_path_for: Callable
+    ) -> None:
+        headers = {'Authorization': f'Bearer {user_one_token}'}
+        for path in ('escaped/a_b.txt', 'escaped/axb.txt',
+                     'escaped/100%.txt', 'escaped/1000.txt'):
+            response = await registered_client.put(
+                url_path_for(put_file.__name__, path=path),
+                headers=headers,
+                content=b'content'
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+
+        response = await registered_client.post(
+            url_path_for(download_archive.__name__),
+            headers=headers,
+            json={'items': ['/escaped/a_*', '/escaped/10?%.txt'],
+                  'compression': 'tar'}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        with tarfile.open(fileobj=io.BytesIO(response.content)) as archive:
+            assert archive.getnames() == ['escaped/100%.txt',
+                                          'escaped/a_b.txt']
+
+    async def test_recursive_archive(
+            self,
+            registered_client: AsyncClient,
+            user_one_token: str,
+            url_path_for: Callable,
+            create_files: Callable
+    ) -> None:
+        headers = {'Authorization': f'Bearer {user_one_token}'}
+        for path, content in (('user_1/nested/a.txt', b'a'),
+                              ('user_1/nested/deep/b.txt', b'b'),
+                              ('user_10/c.txt', b'c')):
+            response = await registered_client.put(
+                url_path_for(put_file.__name__, path=path),
+                headers=headers,
+                content=content
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            headers=headers,
+            params={'path': '/user_1', 'compression': 'zip'}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            assert archive.namelist() == ['user_1/file_1_1.txt',
+                                          'user_1/nested/a.txt',
+                                          'user_1/nested/deep/b.txt']
+            assert archive.read('user_1/nested/deep/b.txt') == b'b'
+
+    async def test_auto_compression(
+            self,
+            registered_client: AsyncClient,
+            user_one_token: str,
+            url_path_for: Callable,
+            create_files: Callable
+    ) -> None:
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            headers={'Authorization': f'Bearer {user_one_token}',
+                     'Accept-Encoding': 'gzip'},
+            params={'path': '/user_1', 'compression': 'auto'}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers['vary'] == 'Accept-Encoding'
+        assert response.headers['content-type'] == 'application/x-gtar'
+        with tarfile.open(fileobj=io.BytesIO(response.content)) as archive:
+            member = archive.extractfile('user_1/file_1_1.txt')
+            assert member.read() == b'user_1\n'
@@ -1,9 +1,11 @@
+import datetime
+import json
 from typing import Callable
 
 from fastapi import status
 from httpx import AsyncClient
 
-from src.api.v1.base import get_files
+from src.api.v1.base import get_files, get_files_tree, put_file
 from src.tests.conftest import RegisteredUserOne
 
 
@@ -42,3 +44,186 @@ async def test_registered_client(
         'path': '/user_1/file_1_1.txt',
         'size': 1,
     }
+
+
+async def test_pagination(
+        registered_client: AsyncClient,
+        user_one_token: str,
+        url_path_for: Callable,
+        create_files: Callable
+) -> None:
+    headers = {'Authorization': f'Bearer {user_one_token}'}
+    response = await registered_client.get(
+        url_path_for(get_files.__name__),
+        params={'limit': 2, 'sort': '-created_at'},
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [file['name'] for file in response.json()['files']] == [
+        'file_1_3.txt', 'file_1_2.txt'
+    ]
+    next_cursor = response.json()['next_cursor']
+    assert next_cursor is not None
+
+    response = await registered_client.get(
+        url_path_for(get_files.__name__),
+        params={'limit': 2, 'sort': '-created_at', 'cursor': next_cursor},
+        headers=headers
+    )
+    assert [file['name'] for file in response.json()['files']] == [
+        'file_1_1.txt'
+    ]
+    assert response.json()['next_cursor'] is None
+
+    response = await registered_client.get(
+        url_path_for(get_files.__name__),
+        params={'sort': 'path', 'cursor': next_cursor},
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_filters(
+        registered_client: AsyncClient,
+        user_one_token: str,
+        url_path_for: Callable,
+        create_files: Callable
+) -> None:
+    response = await registered_client.get(
+        url_path_for(get_files.__name__),
+        params={'path_prefix': '/user_1/', 'name': 'file_?_[23]*',
+                'created_after': '2023-03-01T12:02:00'},
+        headers={'Authorization': f'Bearer {user_one_token}'}
+    )
+    assert response.json()['files'] == []
+
+    response = await registered_client.get(
+        url_path_for(get_files.__name__),
+        params={'path_prefix': '/user_1/', 'name': 'file_?_*.txt',
+                'created_after': '2023-03-01T12:02:00', 'size_max': 1},
+        headers={'Authorization': f'Bearer {user_one_token}'}
+    )
+    assert [file['name'] for file in response.json()['files']] == [
+        'file_1_2.txt', 'file_1_3.txt'
+    ]
+
+    created_after = datetime.datetime(2023, 3, 1, 12, 2).astimezone()
+    response = await registered_client.get(
+        url_path_for(get_files.__name__),
+        params={'path_prefix': '/user_1/', 'name': 'file_?_*.txt',
+                'created_after': created_after.astimezone(
+                    datetime.timezone.utc
+                ).isoformat().replace('+00:00', 'Z'),
+                'size_max': 1},
+        headers={'Authorization': f'Bearer {user_one_token}'}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [file['name'] for file in response.json()['files']] == [
+        'file_1_2.txt', 'file_1_3.txt'
+    ]
+
+
+async def test_ndjson_listing(
+        registered_client: AsyncClient,
+        user_one_token: str,
+        url_path_for: Callable,
+        create_files: Callable
+) -> None:
+    response = await registered_client.get(
+        url_path_for(get_files.__name__),
+        params={'limit': 1},
+        headers={'Authorization': f'Bearer {user_one_token}',
+                 'Accept': 'application/x-ndjson'}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    files = [json.loads(line) for line in response.text.splitlines()]
+    assert [file['path'] for file in files] == [
+        '/user_1/file_1_1.txt', '/user_1/file_1_2.txt', '/user_1/file_1_3.txt'
+    ]
+    assert files[0] == {
+        'id': 'ffff0101-22ba-4327-b711-db8502bcfc27',
+        'name': 'file_1_1.txt',
+        'created_at': '2023-03-01T12:01:00',
+        'path': '/user_1/file_1_1.txt',
+        'size': 1,
+    }
+
+
+async def test_tree(
+        registered_client: AsyncClient,
+        user_one_token: str,
+        url_path_for: Callable,
+        create_files: Callable
+) -> None:
+    headers = {'Authorization': f'Bearer {user_one_token}'}
+    response = await registered_client.get(
+        url_path_for(get_files_tree.__name__), headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        'path': '/', 'name': '', 'file_count': 3, 'total_size': 3,
+        'children': [{'path': '/user_1', 'name': 'user_1', 'file_count': 3,
+                      'total_size': 3, 'children': []}],
+    }
+
+    response = await registered_client.get(
+        url_path_for(get_files_tree.__name__),
+        params={'path': '/user_1', 'depth': 0},
+        headers=headers
+    )
+    assert response.json()['file_count'] == 3
+
+    response = await registered_client.get(
+        url_path_for(get_files_tree.__name__),
+        params={'path': '/user_2'},
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_listing_etag(
+        registered_client: AsyncClient,
+        user_one_token: str,
+        url_path_for: Callable,
+        create_files: Callable
+) -> None:
+    headers = {'Authorization': f'Bearer {user_one_token}'}
+    response = await registered_client.get(url_path_for(get_files.__name__),
+                                           headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers['etag']
+    files = response.json()
+
+    response = await registered_client.get(
+        url_path_for(get_files.__name__),
+        headers={**headers, 'If-None-Match': f'W/{etag}'}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b''
+
+    response = await registered_client.get(
+        url_path_for(get_files.__name__), params={'limit': 2},
+        headers={**headers, 'If-None-Match': etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['etag'] != etag
+
+    response = await registered_client.get(url_path_for(get_files.__name__),
+                                           headers=headers)
+    assert response.headers['etag'] == etag
+    assert response.json() == files
+
+    response = await registered_client.put(
+        url_path_for(put_file.__name__, path='user_1/file_1_4.txt'),
+        headers=headers,
+        content=b'new'
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    response = await registered_client.get(
+        url_path_for(get_files.__name__),
+        headers={**headers, 'If-None-Match': etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['etag'] != etag
+    assert len(response.json()['files']) == 4
@@ -0,0 +1,32 @@
+from typing import Callable
+
+from fastapi import status
+from httpx import AsyncClient
+
+from src.api.v1.base import download_files, ping
+
+
+async def test_metrics(
+        registered_client: AsyncClient,
+        user_one_token: str,
+        url_path_for: Callable,
+        create_files: Callable
+) -> None:
+    await registered_client.get(url_path_for(ping.__name__))
+    await registered_client.get(
+        url_path_for(download_files.__name__),
+        params={'path': '/user_1', 'compression': 'zip'},
+        headers={'Authorization': f'Bearer {user_one_token}'}
+    )
+    response = await registered_client.get(url_path_for('metrics_endpoint'))
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'].startswith('text/plain')
+    metrics = response.text
+    assert ('http_request_duration_seconds_count{method="GET",'
+            'route="/api/v1/ping",status="200"}') in metrics
+    assert 'http_response_bytes_total{method="GET",route=' in metrics
+    assert 'db_query_duration_seconds_count{operation="SELECT"}' in metrics
+    assert ('storage_operation_duration_seconds_count{backend="local",'
+            'operation="put"}') in metrics
+    assert 'archive_build_duration_seconds_count{format="zip"}' in metrics
+    assert 'user_cache_requests_total{result="miss"}' in metrics
@@ -0,0 +1,84 @@
+from typing import Callable
+
+from fastapi import status
+from httpx import AsyncClient
+
+from src.api.v1.base import download_files, put_file
+from src.services.object_cache import HotObjectCache, hot_cache
+from src.storage.base import ObjectStat
+
+
+def put(cache: HotObjectCache, key: str, size: int) -> bool:
+    if not cache.record_miss(key, size):
+        return False
+    cache.set(key, ObjectStat(size, 0.0), b'x' * size)
+    return cache.get(key) is not None
+
+
+def test_size_limits() -> None:
+    cache = HotObjectCache(max_size=100, max_object_size=40)
+    assert not put(cache, 'big', 41)
+    assert put(cache, 'one', 40)
+    assert put(cache, 'two', 40)
+    assert cache.stats()['bytes'] == 80
+
+    cache.invalidate('one')
+    assert cache.get('one') is None
+    assert cache.stats()['bytes'] == 40
+
+    assert not HotObjectCache(max_size=0, max_object_size=40).record_miss(
+        'key', 1
+    )
+
+
+def test_frequency_admission() -> None:
+    cache = HotObjectCache(max_size=100, max_object_size=50)
+    assert put(cache, 'hot', 50)
+    for _ in range(3):
+        assert cache.get('hot') is not None
+    assert put(cache, 'warm', 50)
+    assert cache.get('hot') is not None
+
+    # Новый объект запрашивался реже любого из кэшированных.
+    assert not put(cache, 'cold', 50)
+    assert cache.get('cold') is None
+
+    for _ in range(2):
+        cache.record_miss('popular', 50)
+    assert put(cache, 'popular', 50)
+    # Вытеснен давно не запрошенный 'warm', а не 'hot'.
+    assert cache.get('warm') is None
+    assert cache.get('hot') is not None
+
+
+async def test_hot_download(
+        registered_client: AsyncClient,
+        url_path_for: Callable,
+        user_one_token: str
+) -> None:
+    headers = {'Authorization': f'Bearer {user_one_token}'}
+    content = b'hot file content\n' * 10
+    response = await registered_client.put(
+        url_path_for(put_file.__name__, path='hot/config.txt'),
+        headers=headers,
+        content=content
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    hits = hot_cache.hits
+    for _ in range(3):
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            params={'path': '/hot/config.txt'},
+            headers=headers
+        )
+        assert response.content == content
+    assert hot_cache.hits - hits == 2
+
+    response = await registered_client.get(
+        url_path_for(download_files.__name__),
+        params={'path': '/hot/config.txt'},
+        headers={**headers, 'Range': 'bytes=17-33'}
+    )
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == content[17:34]
@@ -0,0 +1,65 @@
+import datetime
+import uuid
+from typing import Callable
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.base import File
+from src.services.files import get_file_by_path
+from src.services.path_cache import PathCache, path_cache
+from src.tests.conftest import FakeClock, RegisteredUserOne, RegisteredUserTwo
+
+
+def test_ttl_and_lru() -> None:
+    clock = FakeClock()
+    cache = PathCache(max_size=2, ttl=10, clock=clock)
+    for path in ('/one', '/two', '/three'):
+        cache.set('user', path, {'path': path})
+    assert cache.get('user', '/one') is None
+    assert cache.get('user', '/two') == {'path': '/two'}
+    assert cache.get('other', '/two') is None
+
+    cache.invalidate('user', ['/two'])
+    assert cache.get('user', '/two') is None
+
+    clock.now = 11
+    assert cache.get('user', '/three') is None
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+async def test_resolve_same_path_for_other_user(
+        db_session: AsyncSession,
+        create_files: Callable
+) -> None:
+    path = '/user_1/file_1_1.txt'
+    await db_session.execute(insert(File).values(
+        id=uuid.uuid4(), name='file_1_1.txt',
+        created_at=datetime.datetime(2023, 3, 2), path=path, size=2,
+        user_id=RegisteredUserTwo.id,
+    ))
+    await db_session.commit()
+
+    hits = path_cache.hits
+    for _ in range(2):
+        file = await get_file_by_path(path, RegisteredUserOne.id, db_session)
+        assert file.id == uuid.UUID('ffff0101-22ba-4327-b711-db8502bcfc27')
+        assert file.size == 1
+    assert path_cache.hits - hits == 1
+
+    file = await get_file_by_path(path, RegisteredUserTwo.id, db_session)
+    assert (file.user_id, file.size) == (RegisteredUserTwo.id, 2)
+
+    with pytest.raises(HTTPException):
+        await get_file_by_path('/user_1/missing.txt', RegisteredUserOne.id,
+                               db_session)
+
+    with pytest.raises(IntegrityError):
+        await db_session.execute(insert(File).values(
+            id=uuid.uuid4(), name='file_1_1.txt',
+            created_at=datetime.datetime(2023, 3, 2), path=path, size=3,
+            user_id=RegisteredUserOne.id,
+        ))
@@ -1,9 +1,15 @@
+import asyncio
 from typing import Callable
 
 from fastapi import status
 from httpx import AsyncClient
 
 from src.api.v1.base import ping
+from src.services.health import NOT_AVAILABLE, HealthMonitor
+
+
+async def failing_probe() -> float:
+    raise ConnectionError
 
 
 async def test_unregistered_client(
@@ -12,8 +18,13 @@ async def test_unregistered_client(
 ) -> None:
     response = await client.get(url_path_for(ping.__name__))
     assert response.status_code == status.HTTP_200_OK
-    assert response.json().get('db') is not None
-    # assert isinstance(response.json().get('db'), float)
+    assert isinstance(response.json().get('db'), float)
+    assert isinstance(response.json().get('storage'), float)
+    assert isinstance(response.json().get('storage_fsync'), float)
+    assert response.json().get('disk_free') is not None
+    assert set(response.json().get('db_pool')) == {
+        'size', 'checked_in', 'checked_out', 'overflow'
+    }
 
 
 async def test_registered_client(
@@ -27,4 +38,29 @@ async def test_registered_client(
     )
     assert response.status_code == status.HTTP_200_OK
     assert response.json().get('db') is not None
-    # assert isinstance(response.json().get('db'), float)
+
+
+async def test_cached_results() -> None:
+    monitor = HealthMonitor(interval=60, timeout=1)
+    results = await monitor.get_results()
+    assert await monitor.get_results() is results
+
+    monitor.probes = dict(monitor.probes, db=failing_probe)
+    assert (await monitor.check())['db'] == NOT_AVAILABLE
+
+
+async def test_concurrent_refresh() -> None:
+    monitor = HealthMonitor(interval=60, timeout=1)
+    calls = 0
+
+    async def counting_probe() -> float:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 0.0
+
+    monitor.probes = dict(db=counting_probe)
+    first, second = await asyncio.gather(monitor.get_results(),
+                                         monitor.get_results())
+    assert first is second
+    assert calls == 1
@@ -0,0 +1,142 @@
+import os
+import socket
+import urllib.request
+from pathlib import Path
+from typing import AsyncIterator
+
+import pytest
+import pytest_asyncio
+
+from src.core.config import settings
+from src.storage.base import StorageDriver
+from src.storage.local import LocalStorage
+
+PART_SIZE = 5 * 1024 * 1024
+CONTENT = os.urandom(2 * PART_SIZE + 1024)
+
+
+async def iter_content(content: bytes,
+                       chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    for offset in range(0, len(content), chunk_size):
+        yield content[offset:offset + chunk_size]
+
+
+async def read_all(stream: AsyncIterator[bytes]) -> bytes:
+    return b''.join([chunk async for chunk in stream])
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def local_storage(tmp_path: Path) -> StorageDriver:
+    return LocalStorage(str(tmp_path))
+
+
+@pytest_asyncio.fixture
+async def s3_storage(
+        monkeypatch: pytest.MonkeyPatch
+) -> AsyncIterator[StorageDriver]:
+    moto_server = pytest.importorskip('moto.server')
+    pytest.importorskip('aiobotocore')
+    from src.storage.s3 import S3Storage
+
+    port = get_free_port()
+    endpoint_url = f'http://127.0.0.1:{port}'
+    server = moto_server.ThreadedMotoServer(port=port, verbose=False)
+    server.start()
+    # Состояние moto общее для процесса, поэтому сбрасываем его явно.
+    urllib.request.urlopen(urllib.request.Request(
+        f'{endpoint_url}/moto-api/reset', method='POST'
+    ))
+    for name, value in (('s3_endpoint_url', endpoint_url),
+                        ('s3_bucket', 'bucket'),
+                        ('s3_region', 'us-east-1'),
+                        ('s3_access_key_id', 'testing'),
+                        ('s3_secret_access_key', 'testing'),
+                        ('s3_part_size', PART_SIZE)):
+        monkeypatch.setattr(settings, name, value)
+    storage = S3Storage()
+    client = await storage.get_client()
+    await client.create_bucket(Bucket='bucket')
+    yield storage
+    await storage.close()
+    server.stop()
+
+
+@pytest.fixture(params=['local_storage', 's3_storage'])
+def storage(request: pytest.FixtureRequest) -> StorageDriver:
+    return request.getfixturevalue(request.param)
+
+
+async def test_put_and_get(storage: StorageDriver) -> None:
+    size = await storage.put('blobs/aa/bb/object', iter_content(CONTENT))
+    assert size == len(CONTENT)
+
+    object_stat = await storage.stat('blobs/aa/bb/object')
+    assert object_stat.size == len(CONTENT)
+    assert await read_all(storage.get('blobs/aa/bb/object')) == CONTENT
+    assert await read_all(
+        storage.get_range('blobs/aa/bb/object', PART_SIZE - 10, 20)
+    ) == CONTENT[PART_SIZE - 10:PART_SIZE + 10]
+    assert await read_all(
+        storage.get_range('blobs/aa/bb/object', len(CONTENT) - 5)
+    ) == CONTENT[-5:]
+
+
+async def test_empty_object(storage: StorageDriver) -> None:
+    assert await storage.put('blobs/aa/bb/empty', iter_content(b'')) == 0
+    assert (await storage.stat('blobs/aa/bb/empty')).size == 0
+    assert await read_all(storage.get('blobs/aa/bb/empty')) == b''
+    assert await read_all(storage.get_range('blobs/aa/bb/empty', 0, 0)) == b''
+
+
+async def test_missing_object(storage: StorageDriver) -> None:
+    assert not await storage.exists('blobs/missing')
+    with pytest.raises(FileNotFoundError):
+        await storage.stat('blobs/missing')
+    with pytest.raises(FileNotFoundError):
+        await read_all(storage.get('blobs/missing'))
+    await storage.delete('blobs/missing')
+
+
+async def test_move_list_and_delete(storage: StorageDriver) -> None:
+    await storage.put('blobs/tmp/token', iter_content(b'content'))
+    await storage.put('other/object', iter_content(b''))
+    await storage.move('blobs/tmp/token', 'blobs/aa/bb/object')
+
+    assert not await storage.exists('blobs/tmp/token')
+    assert [key async for key in storage.list_keys('blobs/')] == [
+        'blobs/aa/bb/object'
+    ]
+    assert await read_all(storage.get('blobs/aa/bb/object')) == b'content'
+
+    await storage.delete('blobs/aa/bb/object')
+    assert not await storage.exists('blobs/aa/bb/object')
+
+
+async def test_multipart_upload(storage: StorageDriver) -> None:
+    upload_id = await storage.create_multipart('blobs/tmp/parts',
+                                               len(CONTENT))
+    parts = []
+    # Части можно присылать в любом порядке.
+    for number in reversed(range(3)):
+        offset = number * PART_SIZE
+        part = CONTENT[offset:offset + PART_SIZE]
+        etag = await storage.put_part('blobs/tmp/parts', upload_id, number,
+                                      offset, iter_content(part))
+        parts.append((number, etag))
+    await storage.complete_multipart('blobs/tmp/parts', upload_id,
+                                     sorted(parts))
+    assert await read_all(storage.get('blobs/tmp/parts')) == CONTENT
+
+
+async def test_abort_multipart_upload(storage: StorageDriver) -> None:
+    upload_id = await storage.create_multipart('blobs/tmp/parts', 10)
+    await storage.put_part('blobs/tmp/parts', upload_id, 0, 0,
+                           iter_content(b'0123456789'))
+    await storage.abort_multipart('blobs/tmp/parts', upload_id)
+    assert not await storage.exists('blobs/tmp/parts')
@@ -0,0 +1,161 @@
+import io
+import tarfile
+from typing import Callable
+
+import pytest
+import zstandard
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import select
+
+from src.api.v1.base import download_files, link_file, put_file
+from src.api.v1.uploads import commit_session, create_session, put_chunk
+from src.core.config import settings
+from src.models.base import File
+from src.services.blobs import get_blob_key
+from src.services.compression import looks_compressed, should_compress
+from src.storage.drivers import storage
+
+CONTENT = b''.join(b'2023-03-01 12:00:%02d INFO request handled\n' % (i % 60)
+                   for i in range(5000))
+
+
+@pytest.fixture(autouse=True)
+def storage_compression(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'storage_compression', True)
+
+
+def test_should_compress() -> None:
+    assert should_compress(CONTENT)
+    assert not should_compress(CONTENT[:100])
+    assert not should_compress(zstandard.compress(CONTENT) * 10)
+    assert looks_compressed(b'\x00\x00\x00\x18ftypmp42')
+
+
+async def test_compressed_file(
+        registered_client: AsyncClient,
+        url_path_for: Callable,
+        user_one_token: str,
+        db_session: AsyncSession
+) -> None:
+    headers = {'Authorization': f'Bearer {user_one_token}'}
+    response = await registered_client.put(
+        url_path_for(put_file.__name__, path='logs/app.log'),
+        headers=headers,
+        content=CONTENT
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()['size'] == len(CONTENT)
+
+    file = (await db_session.execute(
+        select(File).where(File.path == '/logs/app.log')
+    )).scalar()
+    assert file.content_encoding == 'zstd'
+    blob_path = storage.get_local_path(
+        get_blob_key(file.blob_hash, file.content_encoding)
+    )
+    assert blob_path.stat().st_size < len(CONTENT) // 10
+
+    params = {'path': '/logs/app.log'}
+    response = await registered_client.get(
+        url_path_for(download_files.__name__), headers=headers, params=params
+    )
+    assert response.content == CONTENT
+    assert response.headers['content-length'] == str(len(CONTENT))
+    assert 'content-encoding' not in response.headers
+    assert response.headers['vary'] == 'Accept-Encoding'
+
+    response = await registered_client.get(
+        url_path_for(download_files.__name__),
+        headers={**headers, 'Range': 'bytes=100000-100009'},
+        params=params
+    )
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == CONTENT[100000:100010]
+
+    response = await registered_client.get(
+        url_path_for(download_files.__name__),
+        headers={**headers, 'Accept-Encoding': 'zstd'},
+        params=params
+    )
+    assert response.headers['content-encoding'] == 'zstd'
+    assert response.headers['content-length'] == str(
+        blob_path.stat().st_size
+    )
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(
+        response.content
+    ) == CONTENT
+
+    response = await registered_client.post(
+        url_path_for(link_file.__name__, sha256=file.blob_hash),
+        headers=headers,
+        json={'path': '/logs/copy.log'}
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    response = await registered_client.get(
+        url_path_for(download_files.__name__),
+        headers=headers,
+        params={'path': '/logs', 'compression': 'tar'}
+    )
+    with tarfile.open(fileobj=io.BytesIO(response.content)) as archive:
+        assert archive.extractfile('logs/copy.log').read() == CONTENT
+        assert archive.getmember('logs/app.log').size == len(CONTENT)
+
+
+async def test_small_file_is_not_compressed(
+        registered_client: AsyncClient,
+        url_path_for: Callable,
+        user_one_token: str,
+        db_session: AsyncSession
+) -> None:
+    response = await registered_client.put(
+        url_path_for(put_file.__name__, path='small.txt'),
+        headers={'Authorization': f'Bearer {user_one_token}'},
+        content=b'small'
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    file = (await db_session.execute(
+        select(File).where(File.path == '/small.txt')
+    )).scalar()
+    assert file.content_encoding is None
+    assert storage.get_local_path(get_blob_key(file.blob_hash)).exists()
+
+
+async def test_upload_session_is_compressed(
+        registered_client: AsyncClient,
+        url_path_for: Callable,
+        user_one_token: str,
+        db_session: AsyncSession
+) -> None:
+    headers = {'Authorization': f'Bearer {user_one_token}'}
+    response = await registered_client.post(
+        url_path_for(create_session.__name__),
+        headers=headers,
+        json={'path': '/logs/chunked.log', 'size': len(CONTENT)}
+    )
+    session_id = response.json()['id']
+    await registered_client.put(
+        url_path_for(put_chunk.__name__, session_id=session_id, number=0),
+        headers=headers,
+        content=CONTENT
+    )
+    response = await registered_client.post(
+        url_path_for(commit_session.__name__, session_id=session_id),
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    file = (await db_session.execute(
+        select(File).where(File.path == '/logs/chunked.log')
+    )).scalar()
+    assert file.content_encoding == 'zstd'
+    assert storage.get_local_path(
+        get_blob_key(file.blob_hash, file.content_encoding)
+    ).stat().st_size < len(CONTENT) // 10
+    response = await registered_client.get(
+        url_path_for(download_files.__name__),
+        headers=headers,
+        params={'path': '/logs/chunked.log'}
+    )
+    assert response.content == CONTENT
@@ -1,18 +1,25 @@
+import base64
 import datetime
+import hashlib
 import os
 import shutil
 import uuid
 from pathlib import Path
 from typing import Callable
 
+import crc32c
+import xxhash
 from fastapi import status
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.expression import select
 
-from src.api.v1.base import upload_files
-from src.models.base import File
-from src.services.files import get_user_dir
+from src.api.v1.base import (check_blob, download_files, get_files_tree,
+                             link_file, put_file, upload_files)
+from src.models.base import Blob, File
+from src.services import files
+from src.services.blobs import get_blob_key
+from src.storage.drivers import storage
 from src.tests.conftest import RegisteredUserOne
 
 
@@ -122,5 +129,215 @@ class TestUpload:
             files={'file': file},
             data={'path': '/user_1/path/'}
         )
-        user_dir = get_user_dir(str(RegisteredUserOne.id))
-        assert Path(user_dir + '/user_1/path/file_1_3.txt').is_file()
+        with open(project_path + '/content/user_1/file_1_3.txt', 'rb') as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+        assert storage.get_local_path(get_blob_key(digest)).is_file()
+
+    async def test_put_raw_body(
+            self,
+            registered_client: AsyncClient,
+            url_path_for: Callable,
+            user_one_token: str,
+            db_session: AsyncSession
+    ) -> None:
+        content = b'raw body\n' * 10000
+        response = await registered_client.put(
+            url_path_for(put_file.__name__, path='user_1/raw/file.bin'),
+            headers={'Authorization': f'Bearer {user_one_token}'},
+            content=content
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json().get('name') == 'file.bin'
+        assert response.json().get('path') == '/user_1/raw/file.bin'
+        assert response.json().get('size') == len(content)
+
+        result = await db_session.execute(
+            select(File).where(File.path == '/user_1/raw/file.bin')
+        )
+        file = result.scalar()
+        assert file.size == len(content)
+        assert file.blob_hash == hashlib.sha256(content).hexdigest()
+        blob_path = storage.get_local_path(get_blob_key(file.blob_hash))
+        assert blob_path.read_bytes() == content
+
+        response = await registered_client.put(
+            url_path_for(put_file.__name__, path='user_1/raw/file.bin'),
+            headers={'Authorization': f'Bearer {user_one_token}'},
+            content=content
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    async def test_put_reserved_prefix(
+            self,
+            registered_client: AsyncClient,
+            url_path_for: Callable,
+            user_one_token: str
+    ) -> None:
+        response = await registered_client.put(
+            url_path_for(put_file.__name__, path='uploads/file.txt'),
+            headers={'Authorization': f'Bearer {user_one_token}'},
+            content=b'content'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert '/uploads/' in response.json()['detail']
+
+    async def test_put_concurrent_conflict(
+            self,
+            registered_client: AsyncClient,
+            url_path_for: Callable,
+            user_one_token: str,
+            monkeypatch
+    ) -> None:
+        url = url_path_for(put_file.__name__, path='user_1/raced.txt')
+        headers = {'Authorization': f'Bearer {user_one_token}'}
+        response = await registered_client.put(url, headers=headers,
+                                               content=b'first')
+        assert response.status_code == status.HTTP_201_CREATED
+
+        # Путь занят после проверки: её пропускаем, остаётся индекс.
+        async def check_nothing(*args) -> None:
+            pass
+
+        monkeypatch.setattr(files, 'check_path', check_nothing)
+        response = await registered_client.put(url, headers=headers,
+                                               content=b'raced')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()['detail'] == (
+            'По указанному пути файл с таким именем уже загружен.'
+        )
+
+    async def test_deduplication(
+            self,
+            registered_client: AsyncClient,
+            url_path_for: Callable,
+            user_one_token: str,
+            db_session: AsyncSession
+    ) -> None:
+        headers = {'Authorization': f'Bearer {user_one_token}'}
+        content = b'duplicated content'
+        digest = hashlib.sha256(content).hexdigest()
+        response = await registered_client.get(
+            url_path_for(check_blob.__name__, sha256=digest),
+            headers=headers
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+        for path in ('dedup/first.txt', 'dedup/second.txt'):
+            response = await registered_client.put(
+                url_path_for(put_file.__name__, path=path),
+                headers=headers,
+                content=content
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+
+        response = await registered_client.get(
+            url_path_for(check_blob.__name__, sha256=digest),
+            headers=headers
+        )
+        assert response.json() == {'sha256': digest, 'size': len(content)}
+
+        response = await registered_client.post(
+            url_path_for(link_file.__name__, sha256=digest),
+            headers=headers,
+            json={'path': '/dedup/third.txt'}
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json().get('size') == len(content)
+
+        result = await db_session.execute(
+            select(Blob).where(Blob.hash == digest)
+        )
+        assert result.scalar().ref_count == 3
+        blob_path = storage.get_local_path(get_blob_key(digest))
+        assert blob_path.read_bytes() == content
+
+    async def test_directory_tree(
+            self,
+            registered_client: AsyncClient,
+            url_path_for: Callable,
+            user_one_token: str
+    ) -> None:
+        headers = {'Authorization': f'Bearer {user_one_token}'}
+        for path, content in (('tree/a/one.txt', b'1'),
+                              ('tree/a/b/two.txt', b'22'),
+                              ('tree/three.txt', b'333')):
+            response = await registered_client.put(
+                url_path_for(put_file.__name__, path=path),
+                headers=headers,
+                content=content
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+
+        response = await registered_client.get(
+            url_path_for(get_files_tree.__name__),
+            params={'path': '/tree', 'depth': 2},
+            headers=headers
+        )
+        tree = response.json()
+        assert (tree['file_count'], tree['total_size']) == (3, 6)
+        [directory_a] = tree['children']
+        assert (directory_a['path'], directory_a['file_count'],
+                directory_a['total_size']) == ('/tree/a', 2, 3)
+        assert directory_a['children'][0]['path'] == '/tree/a/b'
+
+        response = await registered_client.put(
+            url_path_for(put_file.__name__, path='tree/a'),
+            headers=headers,
+            content=b'file over directory'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    async def test_checksums(
+            self,
+            registered_client: AsyncClient,
+            url_path_for: Callable,
+            user_one_token: str,
+            db_session: AsyncSession
+    ) -> None:
+        headers = {'Authorization': f'Bearer {user_one_token}'}
+        content = b'checked content\n' * 1000
+        md5 = base64.b64encode(hashlib.md5(content).digest()).decode()
+        sha256 = hashlib.sha256(content)
+        response = await registered_client.put(
+            url_path_for(put_file.__name__, path='checked/bad.txt'),
+            headers={**headers, 'Content-MD5': md5},
+            content=content + b'corrupted'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = await registered_client.put(
+            url_path_for(put_file.__name__, path='checked/bad.txt'),
+            headers={**headers, 'Digest': 'sha-256=not-base64'},
+            content=content
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        result = await db_session.execute(
+            select(File).where(File.path == '/checked/bad.txt')
+        )
+        assert result.scalar() is None
+
+        digest = base64.b64encode(sha256.digest()).decode()
+        response = await registered_client.put(
+            url_path_for(put_file.__name__, path='checked/file.txt'),
+            headers={**headers, 'Content-MD5': md5,
+                     'Digest': f'SHA-256={digest},unknown=1'},
+            content=content
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        result = await db_session.execute(
+            select(File).where(File.path == '/checked/file.txt')
+        )
+        file = result.scalar()
+        assert file.blob_hash == sha256.hexdigest()
+        assert file.crc32c == f'{crc32c.crc32c(content):08x}'
+        assert file.xxh3 == xxhash.xxh3_64(content).hexdigest()
+
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            params={'path': '/checked/file.txt'},
+            headers=headers
+        )
+        assert response.content == content
+        assert response.headers['etag'] == f'"{sha256.hexdigest()}"'
+        assert response.headers['digest'] == (
+            f'sha-256={digest},crc32c={file.crc32c},xxh3={file.xxh3}'
+        )
@@ -0,0 +1,225 @@
+import datetime
+import hashlib
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Callable
+
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import select, update
+
+from src.api.v1.base import download_files, put_file
+from src.api.v1.uploads import (abort_session, commit_session, create_session,
+                                get_upload_session, put_chunk)
+from src.models.base import File, UploadSession
+from src.services import uploads
+from src.services.blobs import get_blob_key, make_temp_blob_key
+from src.storage.drivers import storage
+
+CONTENT = b'0123456789abcdefghij'
+
+
+async def test_unauthorized_client(
+        client: AsyncClient,
+        url_path_for: Callable
+) -> None:
+    response = await client.post(url_path_for(create_session.__name__),
+                                 json={'path': '/file.txt', 'size': 1})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+class TestUploadSession:
+
+    @classmethod
+    def teardown_class(cls) -> None:
+        root_test_dir = os.getenv('STORAGE_ROOT_DIR')
+        for file_path in Path(root_test_dir).iterdir():
+            shutil.rmtree(file_path)
+
+    async def create(self, client: AsyncClient, url_path_for: Callable,
+                     headers: dict[str, str], path: str) -> dict:
+        response = await client.post(
+            url_path_for(create_session.__name__),
+            headers=headers,
+            json={'path': path, 'size': len(CONTENT), 'chunk_size': 8}
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        return response.json()
+
+    async def test_upload_in_chunks(
+            self,
+            registered_client: AsyncClient,
+            url_path_for: Callable,
+            user_one_token: str,
+            db_session: AsyncSession
+    ) -> None:
+        headers = {'Authorization': f'Bearer {user_one_token}'}
+        upload = await self.create(registered_client, url_path_for, headers,
+                                   '/chunks/file.bin')
+        assert upload['chunks_total'] == 3
+        assert upload['chunks_received'] == []
+
+        for number in (2, 0, 1):
+            response = await registered_client.put(
+                url_path_for(put_chunk.__name__,
+                             session_id=upload['id'], number=number),
+                headers=headers,
+                content=CONTENT[number * 8:(number + 1) * 8]
+            )
+            assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        response = await registered_client.get(
+            url_path_for(get_upload_session.__name__,
+                         session_id=upload['id']),
+            headers=headers
+        )
+        assert response.json()['chunks_received'] == [0, 1, 2]
+
+        response = await registered_client.post(
+            url_path_for(commit_session.__name__, session_id=upload['id']),
+            headers=headers
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json()['path'] == '/chunks/file.bin'
+        assert response.json()['size'] == len(CONTENT)
+
+        digest = hashlib.sha256(CONTENT).hexdigest()
+        blob_path = storage.get_local_path(get_blob_key(digest))
+        assert blob_path.read_bytes() == CONTENT
+        result = await db_session.execute(
+            select(File).where(File.path == '/chunks/file.bin')
+        )
+        file = result.scalar()
+        assert file.size == len(CONTENT)
+        assert file.blob_hash == digest
+        result = await db_session.execute(
+            select(UploadSession).where(UploadSession.id == upload['id'])
+        )
+        assert result.scalar() is None
+
+        response = await registered_client.get(
+            url_path_for(download_files.__name__),
+            headers=headers,
+            params={'path': '/chunks/file.bin'}
+        )
+        assert response.content == CONTENT
+
+    async def test_wrong_chunks(
+            self,
+            registered_client: AsyncClient,
+            url_path_for: Callable,
+            user_one_token: str
+    ) -> None:
+        headers = {'Authorization': f'Bearer {user_one_token}'}
+        upload = await self.create(registered_client, url_path_for, headers,
+                                   '/chunks/partial.bin')
+        for number, content in ((3, CONTENT[:4]), (2, CONTENT[:8])):
+            response = await registered_client.put(
+                url_path_for(put_chunk.__name__,
+                             session_id=upload['id'], number=number),
+                headers=headers,
+                content=content
+            )
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = await registered_client.post(
+            url_path_for(commit_session.__name__, session_id=upload['id']),
+            headers=headers
+        )
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+        response = await registered_client.delete(
+            url_path_for(abort_session.__name__, session_id=upload['id']),
+            headers=headers
+        )
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert not storage.get_local_path(make_temp_blob_key(
+            uuid.UUID(upload['id']).hex
+        )).exists()
+
+    async def test_concurrent_conflict(
+            self,
+            registered_client: AsyncClient,
+            url_path_for: Callable,
+            user_one_token: str,
+            monkeypatch
+    ) -> None:
+        headers = {'Authorization': f'Bearer {user_one_token}'}
+        upload = await self.create(registered_client, url_path_for, headers,
+                                   '/chunks/raced.bin')
+        for number in range(upload['chunks_total']):
+            await registered_client.put(
+                url_path_for(put_chunk.__name__,
+                             session_id=upload['id'], number=number),
+                headers=headers,
+                content=CONTENT[number * 8:(number + 1) * 8]
+            )
+        response = await registered_client.put(
+            url_path_for(put_file.__name__, path='chunks/raced.bin'),
+            headers=headers,
+            content=b'other'
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+        # Путь заняли после проверки: её пропускаем, остаётся индекс.
+        async def check_nothing(*args) -> None:
+            pass
+
+        monkeypatch.setattr(uploads, 'check_path', check_nothing)
+        response = await registered_client.post(
+            url_path_for(commit_session.__name__, session_id=upload['id']),
+            headers=headers
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()['detail'] == (
+            'По указанному пути файл с таким именем уже загружен.'
+        )
+
+        # Собранный объект уже перенесён: сессия удалена, а не сломана.
+        for method, name in (('post', commit_session.__name__),
+                             ('delete', abort_session.__name__)):
+            response = await registered_client.request(
+                method, url_path_for(name, session_id=upload['id']),
+                headers=headers
+            )
+            assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    async def test_expired_sessions(
+            self,
+            registered_client: AsyncClient,
+            url_path_for: Callable,
+            user_one_token: str,
+            db_session: AsyncSession
+    ) -> None:
+        headers = {'Authorization': f'Bearer {user_one_token}'}
+        fresh = await self.create(registered_client, url_path_for, headers,
+                                  '/chunks/fresh.bin')
+        stale = await self.create(registered_client, url_path_for, headers,
+                                  '/chunks/stale.bin')
+        await registered_client.put(
+            url_path_for(put_chunk.__name__, session_id=stale['id'],
+                         number=0),
+            headers=headers,
+            content=CONTENT[:8]
+        )
+        await db_session.execute(
+            update(UploadSession)
+            .where(UploadSession.id == stale['id'])
+            .values(created_at=datetime.datetime(2000, 1, 1))
+        )
+        await db_session.commit()
+
+        assert await uploads.expire_upload_sessions(db_session) == 1
+        stale_key = make_temp_blob_key(uuid.UUID(stale['id']).hex)
+        assert not await storage.exists(stale_key)
+        for upload, expected in ((fresh, status.HTTP_200_OK),
+                                 (stale, status.HTTP_404_NOT_FOUND)):
+            response = await registered_client.get(
+                url_path_for(get_upload_session.__name__,
+                             session_id=upload['id']),
+                headers=headers
+            )
+            assert response.status_code == expected
@@ -0,0 +1,73 @@
+from typing import Callable
+
+from fastapi import status
+from httpx import AsyncClient
+
+from src.api.v1.base import get_files
+from src.api.v1.schemas import CurrentUser
+from src.services.user_cache import UserCache, user_cache
+from src.tests.conftest import FakeClock, RegisteredUserOne
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.data: dict[str, str] = {}
+
+    async def get(self, key: str) -> str | None:
+        return self.data.get(key)
+
+    async def set(self, key: str, value: str, ex: int) -> None:
+        self.data[key] = value
+
+    async def delete(self, key: str) -> None:
+        self.data.pop(key, None)
+
+
+def make_user(username: str) -> CurrentUser:
+    return CurrentUser(username=username, uuid=username)
+
+
+async def test_ttl_and_lru() -> None:
+    clock = FakeClock()
+    cache = UserCache(max_size=2, ttl=10, clock=clock)
+    for username in ('one', 'two', 'three'):
+        await cache.set(make_user(username))
+    assert await cache.get('one') is None
+    assert await cache.get('two') == make_user('two')
+
+    clock.now = 11
+    assert await cache.get('two') is None
+    assert cache.stats() == dict(size=1, hits=1, shared_hits=0, misses=2,
+                                 hit_ratio=1 / 3)
+
+
+async def test_shared_tier_and_invalidation() -> None:
+    shared = FakeRedis()
+    await UserCache(max_size=10, ttl=10, shared=shared).set(make_user('one'))
+    cache = UserCache(max_size=10, ttl=10, shared=shared)
+
+    assert await cache.get('one') == make_user('one')
+    assert await cache.get('one') == make_user('one')
+    assert (cache.shared_hits, cache.hits) == (1, 1)
+
+    await cache.invalidate('one')
+    assert shared.data == {}
+    assert await cache.get('one') is None
+
+
+async def test_current_user_is_cached(
+        registered_client: AsyncClient,
+        user_one_token: str,
+        url_path_for: Callable
+) -> None:
+    headers = {'Authorization': f'Bearer {user_one_token}'}
+    hits, misses = user_cache.hits, user_cache.misses
+    for _ in range(3):
+        response = await registered_client.get(
+            url_path_for(get_files.__name__), headers=headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+    assert user_cache.misses - misses == 1
+    assert user_cache.hits - hits == 2
+    cached_user = await user_cache.get(RegisteredUserOne.username)
+    assert cached_user.uuid == str(RegisteredUserOne.id)